@@ -0,0 +1,78 @@
+"""
+Contention benchmark of `LockFile`: many processes increment a counter in the
+same file under an exclusive lock. Reports the lock throughput and the time
+processes waited for the lock, for blocking waits (woken by the kernel) and for
+waits with a timeout (polling with backoff), and checks that no increment was
+lost.
+
+Usage:
+    python -m benchmarks.benchmark_lock_file [processes] [iterations]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from cvtoolkit.multiprocessing.lock_file import LockFile
+
+
+def worker(path, iterations, timeout, start_event, waits):
+    start_event.wait()
+    wait_times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        with LockFile(path, mode="r+", timeout=timeout) as f:
+            wait_times.append(time.perf_counter() - start)
+            value = int(f.read())
+            f.seek(0)
+            f.write(str(value + 1))
+            f.truncate()
+    waits.put(wait_times)
+
+
+def run(n_processes, iterations, timeout):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "counter.txt")
+        with open(path, "w") as f:
+            f.write("0")
+
+        start_event, waits = multiprocessing.Event(), multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=worker, args=(path, iterations, timeout, start_event, waits)
+            )
+            for _ in range(n_processes)
+        ]
+        for process in processes:
+            process.start()
+        start = time.perf_counter()
+        start_event.set()
+        wait_times = np.concatenate([waits.get() for _ in processes])
+        seconds = time.perf_counter() - start
+        for process in processes:
+            process.join()
+
+        with open(path) as f:
+            if int(f.read()) != n_processes * iterations:
+                raise RuntimeError("Lost increments, the lock did not exclude.")
+    return seconds, wait_times
+
+
+def main(n_processes=32, iterations=200):
+    print(f"{n_processes} processes, {iterations} lock acquisitions each")
+    for name, timeout in (("blocking", None), ("timeout", 60.0)):
+        seconds, wait_times = run(n_processes, iterations, timeout)
+        print(
+            f"{name}: {len(wait_times) / seconds:.0f} acquisitions/s, wait "
+            f"p50 {np.percentile(wait_times, 50) * 1000:.2f} ms, "
+            f"p99 {np.percentile(wait_times, 99) * 1000:.2f} ms, "
+            f"max {wait_times.max() * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
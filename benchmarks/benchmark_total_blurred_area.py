@@ -0,0 +1,67 @@
+"""
+Compare `TotalBlurredArea.update_statistics_based_on_masks` with the previous
+implementation, which made four passes over the masks with a temporary array
+for every `~` and `logical_and`.
+
+Usage:
+    python -m benchmarks.benchmark_total_blurred_area [height] [width] [repeats]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from cvtoolkit.metrics.total_blurred_area import TotalBlurredArea
+
+
+class LegacyTotalBlurredArea(TotalBlurredArea):
+    def update_statistics_based_on_masks(self, true_mask, predicted_mask):
+        self.tp += np.count_nonzero(np.logical_and(true_mask, predicted_mask))
+        self.fp += np.count_nonzero(np.logical_and(~true_mask, predicted_mask))
+        self.tn += np.count_nonzero(np.logical_and(~true_mask, ~predicted_mask))
+        self.fn += np.count_nonzero(np.logical_and(true_mask, ~predicted_mask))
+
+
+def make_masks(height, width, seed=0):
+    rng = np.random.default_rng(seed)
+    true_mask = np.zeros((height, width), dtype=bool)
+    predicted_mask = np.zeros((height, width), dtype=bool)
+    for mask in (true_mask, predicted_mask):
+        for _ in range(50):
+            y, x = rng.integers(0, height - 200), rng.integers(0, width - 200)
+            mask[y : y + rng.integers(10, 200), x : x + rng.integers(10, 200)] = True
+    return true_mask, predicted_mask
+
+
+def measure(metric, true_mask, predicted_mask, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        metric.update_statistics_based_on_masks(true_mask, predicted_mask)
+    seconds = (time.perf_counter() - start) / repeats
+
+    tracemalloc.start()
+    metric.update_statistics_based_on_masks(true_mask, predicted_mask)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main(height=4000, width=8000, repeats=10):
+    true_mask, predicted_mask = make_masks(height, width)
+    print(f"masks of {height}x{width} ({true_mask.nbytes / 1e6:.0f} MB each)")
+
+    legacy, fused = LegacyTotalBlurredArea(), TotalBlurredArea()
+    for name, metric in (("four passes", legacy), ("fused", fused)):
+        seconds, peak = measure(metric, true_mask, predicted_mask, repeats)
+        print(
+            f"{name}: {seconds * 1000:.1f} ms per update, "
+            f"peak temporary memory {peak / 1e6:.1f} MB"
+        )
+    if legacy.get_statistics() != fused.get_statistics():
+        raise RuntimeError("Fused and four-pass statistics differ.")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,119 @@
+"""
+Compare `YoloLabelsDataset.from_yolo_validation_json` with the previous
+implementation, which loaded the whole file with `json.load` and grew the array
+of each image with `np.vstack`.
+
+Usage:
+    python -m benchmarks.benchmark_yolo_validation_json [n_annotations] [n_images]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from cvtoolkit.datasets.yolo_labels_dataset import YoloLabelsDataset
+
+IMAGE_SHAPE = (8000, 4000)
+
+
+def legacy_from_yolo_validation_json(yolo_val_json, image_shape):
+    labels = {}
+    with open(yolo_val_json) as file:
+        annotation_list = json.load(file)
+    for annotation in annotation_list:
+        xmin, ymin, width, height = annotation["bbox"]
+        yolo_box = [
+            annotation["category_id"],
+            (xmin + width / 2) / image_shape[0],
+            (ymin + height / 2) / image_shape[1],
+            width / image_shape[0],
+            height / image_shape[1],
+            annotation["score"],
+        ]
+        if annotation["image_id"] in labels:
+            labels[annotation["image_id"]] = np.vstack(
+                [labels[annotation["image_id"]], yolo_box], dtype="f"
+            )
+        else:
+            labels[annotation["image_id"]] = np.array([yolo_box], dtype="f")
+    return labels
+
+
+def write_validation_json(path, n_annotations, n_images):
+    rng = np.random.default_rng(0)
+    image_indices = rng.integers(n_images, size=n_annotations).tolist()
+    category_ids = rng.integers(4, size=n_annotations).tolist()
+    bboxes = np.column_stack(
+        [
+            rng.uniform(0, IMAGE_SHAPE[0], n_annotations),
+            rng.uniform(0, IMAGE_SHAPE[1], n_annotations),
+            rng.uniform(1, 500, (n_annotations, 2)),
+        ]
+    ).tolist()
+    scores = rng.random(n_annotations).tolist()
+    with open(path, "w") as f:
+        json.dump(
+            [
+                {
+                    "image_id": f"image_{image_index}",
+                    "category_id": category_id,
+                    "bbox": bbox,
+                    "score": score,
+                }
+                for image_index, category_id, bbox, score in zip(
+                    image_indices, category_ids, bboxes, scores
+                )
+            ],
+            f,
+        )
+
+
+def measure(function, *args):
+    """Run `function` once for timing and once to trace peak memory."""
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    result = function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main(n_annotations=200_000, n_images=2_000):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, "predictions.json")
+        write_validation_json(json_path, n_annotations, n_images)
+        size_mb = os.path.getsize(json_path) / 1e6
+        print(f"{n_annotations} annotations, {n_images} images, {size_mb:.1f} MB")
+
+        expected, seconds, peak = measure(
+            legacy_from_yolo_validation_json, json_path, IMAGE_SHAPE
+        )
+        print(f"json.load + vstack: {seconds:.2f}s, peak {peak / 1e6:.1f} MB")
+
+        for storage in ("dict", "columnar"):
+            dataset, seconds, peak = measure(
+                YoloLabelsDataset.from_yolo_validation_json,
+                json_path,
+                IMAGE_SHAPE,
+                0.0,
+                storage,
+            )
+            print(f"streaming ({storage}): {seconds:.2f}s, peak {peak / 1e6:.1f} MB")
+
+        labels = dataset.get_labels()
+        if list(labels.keys()) != list(expected.keys()):
+            raise RuntimeError("Streaming and legacy loaders found different images.")
+        for image_id, bboxes in expected.items():
+            np.testing.assert_array_equal(labels[image_id], bboxes)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
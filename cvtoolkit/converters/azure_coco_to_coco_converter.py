@@ -1,100 +1,257 @@
-import copy
 import json
+import tempfile
+from array import array
+from collections import defaultdict
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from cvtoolkit.helpers.bbox_helpers import box_area, denormalize_boxes
+from cvtoolkit.helpers.json_helpers import iter_json_object
+from cvtoolkit.telemetry.telemetry import get_telemetry
 
 
 class AzureCocoToCocoConverter:
     def __init__(
-        self, azureml_file: str, output_file: str, new_width: float, new_height: float
+        self,
+        azureml_file: str,
+        output_file: str,
+        new_width: float,
+        new_height: float,
+        streaming: bool = False,
+        batch_size: int = 10000,
     ):
+        """
+        Converts an Azure ML COCO export (normalized bboxes, integer image ids) to
+        a regular COCO file (absolute bboxes with area, image ids that match the
+        image file names).
+
+        Parameters
+        ----------
+        azureml_file
+            path to the Azure ML COCO file.
+        output_file
+            path of the converted COCO file.
+        new_width
+            width of the images, used to convert bboxes to absolute values.
+        new_height
+            height of the images, used to convert bboxes to absolute values.
+        streaming
+            if True the input is streamed to the output instead of loaded in
+            memory, so files larger than memory can be converted. The annotations
+            are buffered in a temporary file.
+        batch_size
+            number of annotations that are transformed at once.
+        """
         self._filename = azureml_file
         self._output_file = output_file
         self.new_width = new_width
         self.new_height = new_height
+        self.streaming = streaming
+        self.batch_size = batch_size
 
-        with open(azureml_file) as f:
-            self._input = json.load(f)
+        self._input = None
+        if not streaming:
+            with open(azureml_file) as f:
+                self._input = json.load(f)
 
-    def _add_key(self, key: str, value) -> None:
+    def _transform_annotations(self, annotations: List[dict]) -> None:
         """
-        Adds key to the input file
+        Transforms a batch of annotations in place: adds `iscrowd` and
+        `segmentation`, converts the bbox to absolute values and adds its area.
+        The bbox math is done for the whole batch at once.
+        """
+        get_telemetry().count("coco_conversion", "annotations", len(annotations))
+        bboxes = [annotation["bbox"] for annotation in annotations]
+        normalized = np.array(bboxes, dtype=np.float64)
+        absolute = denormalize_boxes(normalized, (self.new_width, self.new_height))
+        # we must calculate area based on absolute values
+        areas = box_area(absolute, box_format="xyxy")
+        if isinstance(self.new_width, int) or isinstance(self.new_height, int):
+            absolute, areas = self._restore_int_values(bboxes, absolute, areas)
 
-        Parameters
-        ----------
-        key name of key to be added in _input[annotations]
-        value corresponding value for the key
+        for annotation, bbox, area in zip(
+            annotations, absolute.tolist(), areas.tolist()
+        ):
+            annotation["iscrowd"] = 0
+            annotation["segmentation"] = []
+            annotation["bbox"] = bbox
+            annotation["area"] = area
+
+    def _restore_int_values(
+        self, bboxes: List[list], absolute: npt.NDArray, areas: npt.NDArray
+    ) -> Tuple[npt.NDArray, npt.NDArray]:
+        """
+        Multiplying two ints in Python gives an int, which is written to JSON
+        without decimals. Restore those values so the output does not change when
+        the image size is given as int: int values in the input times an int size
+        become ints, and so does the area of a box of only such values. Floats such
+        as `1.0` stay floats, so int-ness is taken from the original values and not
+        from the float array.
 
         Returns
         -------
-
+        The bboxes and areas as object arrays of Python ints and floats.
         """
+        scales = (self.new_width, self.new_height, self.new_width, self.new_height)
+        is_int = np.array(
+            [[isinstance(value, int) for value in bbox] for bbox in bboxes],
+            dtype=bool,
+        ).reshape(-1, 4) & np.array([isinstance(scale, int) for scale in scales])
+        absolute_values = absolute.astype(object)
+        absolute_values[is_int] = np.rint(absolute[is_int]).astype(np.int64)
+        area_values = areas.astype(object)
+        all_int = is_int.all(axis=1)
+        area_values[all_int] = np.rint(areas[all_int]).astype(np.int64)
+        return absolute_values, area_values
 
-        for i, _ in enumerate(self._input["annotations"]):
-            self._input["annotations"][i][key] = value
+    @staticmethod
+    def _update_annotation_ids(annotation: dict, new_image_id: str) -> None:
+        annotation["image_id"] = new_image_id
+        annotation["category_id"] = annotation["category_id"] - 1
 
-    def _calculate_area(self) -> None:
-        anns_copy = copy.deepcopy(self._input["annotations"])
+    @staticmethod
+    def _update_image_id(image: dict) -> None:
+        image["id"] = image["file_name"].split("/")[-1].split(".")[0]
 
-        for i, ann in enumerate(anns_copy):
-            x1, y1, x2, y2 = ann["bbox"]
-            self._input["annotations"][i]["area"] = (x2 - x1) * (y2 - y1)
+    @staticmethod
+    def _update_categories(categories: List[dict]) -> None:
+        if len(categories) == 2:
+            for category in categories:
+                category["id"] = category["id"] - 1
 
-    def _to_absolute(self) -> None:
-        """
-        Converts normalized bbox values to absolute values.
-        """
+    def _batches(self, annotations: Iterable[dict]) -> Iterator[List[dict]]:
+        iterator = iter(annotations)
+        while batch := list(islice(iterator, self.batch_size)):
+            yield batch
 
-        for i, ann in enumerate(self._input["annotations"]):
-            bbox_absolute_values = []
-            for x, y in zip(ann["bbox"][::2], ann["bbox"][1::2]):
-                bbox_absolute_values.append(x * self.new_width)
-                bbox_absolute_values.append(y * self.new_height)
-            self._input["annotations"][i]["bbox"] = bbox_absolute_values
-
-    def _save(self):
-        with open(self._output_file, "w") as f:
-            json.dump(self._input, f)
+    def _convert_in_memory(self) -> None:
+        annotations_per_image = defaultdict(list)
+        for batch in self._batches(self._input["annotations"]):
+            self._transform_annotations(batch)
+            for annotation in batch:
+                annotations_per_image[annotation["image_id"]].append(annotation)
 
-    def _update_categories(self):
-        if len(self._input["categories"]) == 2:
-            for i, _ in enumerate(self._input["categories"]):
-                self._input["categories"][i]["id"] = (
-                    self._input["categories"][i]["id"] - 1
-                )
-            for i, _ in enumerate(self._input["annotations"]):
-                self._input["annotations"][i]["category_id"] = self._input[
-                    "annotations"
-                ][i]["category_id"]
+        self._update_categories(self._input["categories"])
 
-    def _update_ids_and_image_ids(self):
-        new_images = []
+        # Annotations are ordered by image, annotations of unknown images are dropped.
         new_annotations = []
-        for i, image in enumerate(self._input["images"]):
-            # collect corresponding annotations
-            annotations = [
-                annotation
-                for annotation in self._input["annotations"]
-                if annotation["image_id"] == image["id"]
-            ]
-
-            # update id of image
-            new_filename = image["file_name"].split("/")[-1].split(".")[0]
-            image["id"] = new_filename
-            new_images.append(image)
-
-            # update image_id of annotations
+        for image in self._input["images"]:
+            annotations = annotations_per_image.get(image["id"], [])
+            self._update_image_id(image)
             for annotation in annotations:
-                annotation["image_id"] = image["id"]
-                annotation["category_id"] = annotation["category_id"] - 1
+                self._update_annotation_ids(annotation, image["id"])
                 new_annotations.append(annotation)
-
-        self._input["images"] = new_images
         self._input["annotations"] = new_annotations
 
+        with open(self._output_file, "w") as f:
+            json.dump(self._input, f)
+
+    def _convert_streaming(self) -> None:
+        top_level: List[Tuple[str, Any]] = []
+        # Position of every (original) image id in the images list.
+        image_ranks: Dict[Any, int] = {}
+        new_image_ids: List[str] = []
+
+        with open(self._filename) as f_in, tempfile.TemporaryFile() as spool:
+            # Transformed annotations are written to the spool file, one JSON
+            # document per annotation. `ranks` holds the index of the image of
+            # each annotation, or -1 if the images were not read yet.
+            ranks, offsets, pending_image_ids = array("q"), array("q"), []
+            for key, value in iter_json_object(f_in, stream_keys=["annotations"]):
+                if key == "annotations" and isinstance(value, Iterator):
+                    top_level.append((key, None))
+                    for batch in self._batches(value):
+                        self._transform_annotations(batch)
+                        for annotation in batch:
+                            rank = image_ranks.get(annotation["image_id"], -1)
+                            if image_ranks:
+                                if rank < 0:
+                                    continue
+                                self._update_annotation_ids(
+                                    annotation, new_image_ids[rank]
+                                )
+                            else:
+                                pending_image_ids.append(annotation["image_id"])
+                            ranks.append(rank)
+                            offsets.append(spool.tell())
+                            spool.write(json.dumps(annotation).encode())
+                    offsets.append(spool.tell())
+                    continue
+
+                if key == "images":
+                    for rank, image in enumerate(value):
+                        image_ranks.setdefault(image["id"], rank)
+                        self._update_image_id(image)
+                        new_image_ids.append(image["id"])
+                elif key == "categories":
+                    self._update_categories(value)
+                top_level.append((key, value))
+
+            with open(self._output_file, "w") as f_out:
+                f_out.write("{")
+                for i, (key, value) in enumerate(top_level):
+                    f_out.write(f"{', ' if i else ''}{json.dumps(key)}: ")
+                    if key == "annotations" and value is None:
+                        self._write_spooled_annotations(
+                            f_out,
+                            spool,
+                            ranks,
+                            offsets,
+                            pending_image_ids,
+                            image_ranks,
+                            new_image_ids,
+                        )
+                    else:
+                        f_out.write(json.dumps(value))
+                f_out.write("}")
+
+    def _write_spooled_annotations(
+        self,
+        f_out,
+        spool,
+        ranks: array,
+        offsets: array,
+        pending_image_ids: List[Any],
+        image_ranks: Dict[Any, int],
+        new_image_ids: List[str],
+    ) -> None:
+        """
+        Writes the spooled annotations as a JSON list, ordered by image.
+        Annotations that were read before the images still need their ids updated.
+        """
+        rank_array = np.frombuffer(ranks, dtype=np.int64).copy()
+        if pending_image_ids:
+            rank_array = np.array(
+                [image_ranks.get(image_id, -1) for image_id in pending_image_ids],
+                dtype=np.int64,
+            )
+        offset_array = np.frombuffer(offsets, dtype=np.int64)
+        order = np.argsort(rank_array, kind="stable")
+        order = order[rank_array[order] >= 0]
+
+        f_out.write("[")
+        for i, index in enumerate(order):
+            spool.seek(offset_array[index])
+            serialized = spool.read(offset_array[index + 1] - offset_array[index])
+            if pending_image_ids:
+                annotation = json.loads(serialized)
+                self._update_annotation_ids(
+                    annotation, new_image_ids[rank_array[index]]
+                )
+                serialized = json.dumps(annotation).encode()
+            f_out.write(f"{', ' if i else ''}{serialized.decode()}")
+        f_out.write("]")
+
     def convert(self) -> None:
-        self._add_key(key="iscrowd", value=0)
-        self._add_key(key="segmentation", value=[])
-        self._to_absolute()  # we must calculate area based on absolute values
-        self._calculate_area()
-        self._update_categories()
-        self._update_ids_and_image_ids()
-        self._save()
+        """
+        Converts the annotations in a single pass, without copying them, and
+        writes the result to the output file.
+        """
+        with get_telemetry().timer("coco_conversion"):
+            if self.streaming:
+                self._convert_streaming()
+            else:
+                self._convert_in_memory()
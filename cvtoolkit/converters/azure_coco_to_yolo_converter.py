@@ -1,6 +1,10 @@
 import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 from cvtoolkit.converters.bias_category_mapper import BiasCategoryMapper
+from cvtoolkit.helpers.bbox_helpers import xywh_to_cxcywh
+from cvtoolkit.telemetry.telemetry import get_telemetry
 
 
 class AzureCocoToYoloConverter:
@@ -30,7 +34,7 @@ class AzureCocoToYoloConverter:
 
         self._bias_category_mapper = BiasCategoryMapper(self._input["categories"])
 
-    def _write_to_txt(self, image_name, per_image_annotations):
+    def _write_to_txt(self, image_name, per_image_annotations, per_image_centers):
         """
         Writes the original COCO file parsed into YOLO format.
 
@@ -43,12 +47,12 @@ class AzureCocoToYoloConverter:
             Name of the image.
         per_image_annotations:
             Annotations in COCO format.
+        per_image_centers:
+            Center (x, y) of the bbox of each annotation.
         """
         lines = []
-        for annotation in per_image_annotations:
-            x, y, width, height = annotation["bbox"]
-            xc = x + width / 2
-            yc = y + height / 2
+        for annotation, (xc, yc) in zip(per_image_annotations, per_image_centers):
+            _, _, width, height = annotation["bbox"]
 
             grouped_category = self._bias_category_mapper.get_grouped_category(
                 annotation["category_id"]
@@ -62,23 +66,68 @@ class AzureCocoToYoloConverter:
         with open(f"{self._output_dir}/{image_name}.txt", "w") as f:
             f.write("\n".join(lines))
 
-    def convert(self):
+    def _group_annotations_by_image(self):
+        """
+        Index the annotations by image id in a single pass over all annotations,
+        and compute the bbox centers of all annotations at once.
+
+        Returns
+        -------
+        Dicts from image id to annotations and to the corresponding bbox centers.
+        """
+        annotations = self._input["annotations"]
+        centers = xywh_to_cxcywh([annotation["bbox"] for annotation in annotations])[
+            :, :2
+        ].tolist()
+
+        annotations_per_image = defaultdict(list)
+        centers_per_image = defaultdict(list)
+        for annotation, center in zip(annotations, centers):
+            annotations_per_image[annotation["image_id"]].append(annotation)
+            centers_per_image[annotation["image_id"]].append(center)
+        return annotations_per_image, centers_per_image
+
+    def convert(self, num_workers: int = 0):
         """
         Converts a COCO annotation dataset to a YOLOv5 format.
         - The bbox changes from x_min, y_min, width, height to x_center, y_center, width, height.
         - Categories will be grouped into two main cateogires 0=person and 1=license plate.
         - It generates one file per image.
+
+        Parameters
+        ----------
+        num_workers:
+            Number of threads used to write the .txt files. With 0 the files are
+            written one after another.
         """
-        for i, image in enumerate(self._input["images"]):
-            # collect corresponding annotations
-            annotations = [
-                annotation
-                for annotation in self._input["annotations"]
-                if annotation["image_id"] == image["id"]
-            ]
-
-            # write annotations to txt file. image_name is TMXblabla.jpg
-            self._write_to_txt(
-                image_name=image["file_name"].split("/")[-1].split(".")[0],
-                per_image_annotations=annotations,
+        telemetry = get_telemetry()
+        with telemetry.timer("yolo_conversion"):
+            self._convert(num_workers)
+        telemetry.count("yolo_conversion", "images", len(self._input["images"]))
+        telemetry.count(
+            "yolo_conversion", "annotations", len(self._input["annotations"])
+        )
+
+    def _convert(self, num_workers: int):
+        annotations_per_image, centers_per_image = self._group_annotations_by_image()
+        # image_name is TMXblabla.jpg
+        jobs = [
+            (
+                image["file_name"].split("/")[-1].split(".")[0],
+                annotations_per_image.get(image["id"], []),
+                centers_per_image.get(image["id"], []),
             )
+            for image in self._input["images"]
+        ]
+
+        if num_workers > 0:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                # Consume the results so exceptions in the workers are raised.
+                list(executor.map(lambda job: self._write_to_txt(*job), jobs))
+        else:
+            for image_name, annotations, centers in jobs:
+                self._write_to_txt(
+                    image_name=image_name,
+                    per_image_annotations=annotations,
+                    per_image_centers=centers,
+                )
@@ -43,6 +43,9 @@ class BiasCategoryMapper:
             else:
                 category["grouped_category"] = 0
         self._grouped_categories = categories
+        self._grouped_category_by_id = {
+            category["id"]: category["grouped_category"] for category in categories
+        }
 
     def get_all_grouped_categories(self):
         return self._grouped_categories
@@ -61,6 +64,4 @@ class BiasCategoryMapper:
         Grouped category.
 
         """
-        return list(
-            filter(lambda cat: cat["id"] == category_id, self._grouped_categories)
-        )[0]["grouped_category"]
+        return self._grouped_category_by_id[category_id]
@@ -43,3 +43,17 @@ class BatchRunInformation(DBConfigSQLAlchemy.Base):
     trained_yolo_model = Column(String)
     success = Column(Boolean)
     error_code = Column(String)
+
+
+class BatchRunStatistics(DBConfigSQLAlchemy.Base):
+    __tablename__ = "batch_run_statistics"
+    __table_args__ = {"schema": "private_schema_blur"}  # Add the schema here
+
+    run_id = Column(String, primary_key=True)
+    stage = Column(String, primary_key=True)
+    metric = Column(String, primary_key=True)
+    count = Column(Float)
+    total = Column(Float)
+    minimum = Column(Float)
+    maximum = Column(Float)
+    histogram = Column(String)
@@ -0,0 +1,91 @@
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict
+
+from sqlalchemy.pool import QueuePool
+
+
+@dataclass
+class PoolSettings:
+    """
+    Connection pool configuration of DBConfigSQLAlchemy, see the SQLAlchemy
+    documentation of `create_engine` for details.
+
+    With `pool_pre_ping=True` every checkout tests the connection with a round
+    trip first (pessimistic). For many short sessions it is cheaper to disable it
+    and set `pool_recycle` below the idle timeout of the server, so stale
+    connections are replaced before they are used (optimistic).
+    """
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = -1
+    pool_pre_ping: bool = True
+    pool_use_lifo: bool = False
+
+    def engine_kwargs(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class PoolStatistics:
+    """Usage of a connection pool since it was created."""
+
+    size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    n_connections_created: int
+    n_checkouts: int
+    total_wait_seconds: float
+    max_wait_seconds: float
+
+    @property
+    def mean_wait_seconds(self) -> float:
+        return self.total_wait_seconds / self.n_checkouts if self.n_checkouts else 0.0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that counts created connections and measures how long checkouts
+    wait for a connection, including the time to create a new one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._statistics_lock = threading.Lock()
+        self._n_connections_created = 0
+        self._n_checkouts = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        connection = super()._do_get()
+        wait = time.perf_counter() - start
+        with self._statistics_lock:
+            self._n_checkouts += 1
+            self._total_wait_seconds += wait
+            self._max_wait_seconds = max(self._max_wait_seconds, wait)
+        return connection
+
+    def _create_connection(self):
+        connection = super()._create_connection()
+        with self._statistics_lock:
+            self._n_connections_created += 1
+        return connection
+
+    def statistics(self) -> PoolStatistics:
+        with self._statistics_lock:
+            return PoolStatistics(
+                size=self.size(),
+                checked_out=self.checkedout(),
+                checked_in=self.checkedin(),
+                overflow=self.overflow(),
+                n_connections_created=self._n_connections_created,
+                n_checkouts=self._n_checkouts,
+                total_wait_seconds=self._total_wait_seconds,
+                max_wait_seconds=self._max_wait_seconds,
+            )
@@ -1,16 +1,25 @@
-import json
 import logging
-import subprocess  # nosec
-import time
+import threading
 from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Generator, Optional
+from typing import Generator, Optional, Union
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.exc import DatabaseError, SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+
+from cvtoolkit.database.connection_pool import (
+    InstrumentedQueuePool,
+    PoolSettings,
+    PoolStatistics,
+)
+from cvtoolkit.database.token_providers import (
+    CachedTokenProvider,
+    ManagedIdentityTokenProvider,
+    TokenProvider,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +29,16 @@ class DBConfigSQLAlchemy:
 
     Base = declarative_base()
 
-    def __init__(self, db_username: str, db_hostname: str, db_name: str, client_id: str) -> None:
+    def __init__(
+        self,
+        db_username: str,
+        db_hostname: str,
+        db_name: str,
+        client_id: str,
+        token_provider: Optional[TokenProvider] = None,
+        pool_settings: Optional[PoolSettings] = None,
+        scoped_sessions: bool = False,
+    ) -> None:
         """
         Initializes the database configuration.
 
@@ -34,9 +52,22 @@ class DBConfigSQLAlchemy:
             The database name.
         client_id : str
             The Azure Managed Identity client ID.
+        token_provider : Optional[TokenProvider]
+            Provider of the database access tokens. By default tokens are acquired
+            in-process for the managed identity and shared between the processes
+            on this machine through a token cache.
+        pool_settings : Optional[PoolSettings]
+            Configuration of the connection pool, by default `PoolSettings()`.
+        scoped_sessions : bool
+            If True, `managed_session` reuses one session per thread instead of
+            creating a new session for every call. Nested `managed_session` calls
+            share the transaction of the outermost one. Call `remove_session()`
+            when a worker thread is done.
         """
         self.engine: Optional[Engine] = None
-        self.session_maker: Optional[sessionmaker] = None
+        self.session_maker: Optional[Union[sessionmaker, scoped_session]] = None
+        self.pool_settings: PoolSettings = pool_settings or PoolSettings()
+        self.scoped_sessions: bool = scoped_sessions
         self.db_username: str = db_username
         self.db_hostname: str = db_hostname
         self.db_name: str = db_name
@@ -44,95 +75,161 @@ class DBConfigSQLAlchemy:
         self.access_token: Optional[str] = None
         self.token_expiration_time: Optional[datetime] = None
         self.token_renewal_margin: timedelta = timedelta(minutes=5)
-
-    def _run_az_cli(self, command: list[str]) -> dict:
-        """
-        Runs an Azure CLI command and returns the output as a JSON object.
-
-        Parameters
-        ----------
-        command : list[str]
-            The Azure CLI command as a list of arguments.
-
-        Returns
-        -------
-        dict
-            The parsed JSON output from the command.
-
-        Raises
-        ------
-        subprocess.CalledProcessError
-            If the Azure CLI command fails.
-        """
-        try:
-            result = subprocess.run(
-                command, capture_output=True, check=True, text=True  # nosec
+        if token_provider is None:
+            token_provider = CachedTokenProvider(
+                ManagedIdentityTokenProvider(client_id),
+                min_validity=2 * self.token_renewal_margin,
             )
-            return json.loads(result.stdout)
-        except subprocess.CalledProcessError as e:
-            logger.exception(f"Azure CLI command failed: {e}")
-            raise
+        self.token_provider: TokenProvider = token_provider
+        # Shortest time between two background refreshes, also used to retry a
+        # failed refresh.
+        self.token_refresh_min_interval: timedelta = timedelta(seconds=30)
+        self._token_lock = threading.Lock()
+        self._stop_token_refresh = threading.Event()
+        self._token_refresh_thread: Optional[threading.Thread] = None
+        # Depth of nested managed_session calls per thread, for scoped sessions.
+        self._session_depth = threading.local()
 
     def _get_db_access_token(self) -> None:
         """
-        Retrieves and sets the database access token using Azure Managed Identity.
+        Retrieves and sets the database access token from the token provider.
 
         Raises
         ------
         ValueError
             If the access token or expiration time cannot be retrieved.
         """
-        self._run_az_cli(["az", "login", "--identity", "--client-id", self.client_id])
-
-        token_info = self._run_az_cli(
-            ["az", "account", "get-access-token", "--resource-type", "oss-rdbms"]
-        )
-
-        self.access_token = token_info.get("accessToken")
-        expires_on_str = token_info.get("expiresOn")
-
-        if not self.access_token or not expires_on_str:
-            raise ValueError("Failed to retrieve access token from Azure CLI.")
-
-        self.token_expiration_time = (
-            datetime.fromisoformat(expires_on_str) - self.token_renewal_margin
-        )
+        token = self.token_provider.get_token()
+        self.access_token = token.token
+        self.token_expiration_time = token.expires_on - self.token_renewal_margin
         logger.info("Database access token retrieved successfully.")
 
     def _get_db_connection_string(self) -> str:
         """
-        Generates the PostgreSQL connection string with the current access token.
+        Generates the PostgreSQL connection string. It does not contain the access
+        token, which is added for every new connection by `_provide_token`.
 
         Returns
         -------
         str
             The database connection string.
         """
-        if not self.access_token or datetime.now() >= self.token_expiration_time:
-            self._get_db_access_token()
+        return f"postgresql+psycopg2://{self.db_username}@{self.db_hostname}/{self.db_name}"
+
+    def _provide_token(self, dialect, connection_record, cargs, cparams) -> None:
+        """
+        `do_connect` event handler that uses the current access token as password,
+        so new connections of the pool always get a valid token while pooled
+        connections are reused.
+        """
+        self._validate_token_status()
+        cparams["password"] = self.access_token
+
+    def _refresh_token_periodically(self) -> None:
+        """
+        Renews the access token in the background a renewal margin before it
+        expires, so sessions and new connections do not wait for a renewal.
+        """
+        while True:
+            wait = self.token_refresh_min_interval
+            if self.token_expiration_time is not None:
+                wait = max(
+                    wait,
+                    self.token_expiration_time
+                    - self.token_renewal_margin
+                    - datetime.now(),
+                )
+            if self._stop_token_refresh.wait(wait.total_seconds()):
+                return
+            try:
+                with self._token_lock:
+                    self._get_db_access_token()
+            except Exception:
+                logger.exception("Failed to renew the database access token.")
 
-        return f"postgresql+psycopg2://{self.db_username}:{self.access_token}@{self.db_hostname}/{self.db_name}"
+    def _start_token_refresh(self) -> None:
+        if self._token_refresh_thread is not None:
+            return
+        self._stop_token_refresh.clear()
+        self._token_refresh_thread = threading.Thread(
+            target=self._refresh_token_periodically,
+            name="DBTokenRefresh",
+            daemon=True,
+        )
+        self._token_refresh_thread.start()
 
-    def create_connection(self) -> None:
+    def _stop_token_refresh_thread(self) -> None:
+        if self._token_refresh_thread is not None:
+            self._stop_token_refresh.set()
+            self._token_refresh_thread.join()
+            self._token_refresh_thread = None
+
+    def create_connection(self, db_url: Optional[str] = None) -> None:
         """
         Initializes the database connection and session maker.
 
+        Parameters
+        ----------
+        db_url : Optional[str]
+            Connect to this database instead of the Azure PostgreSQL database,
+            without access token, e.g. a SQLite file for local testing.
+
         Raises
         ------
         SQLAlchemyError
             If an error occurs while creating the database engine.
         """
         try:
-            db_url = self._get_db_connection_string()
-            self.engine = create_engine(db_url, pool_pre_ping=True)
+            if db_url is None:
+                self._validate_token_status()
+                self.engine = self._create_engine(self._get_db_connection_string())
+                event.listen(self.engine, "do_connect", self._provide_token)
+                self._start_token_refresh()
+            else:
+                self.engine = self._create_engine(db_url)
             self.session_maker = sessionmaker(
                 bind=self.engine, autoflush=False, autocommit=False
             )
+            if self.scoped_sessions:
+                self.session_maker = scoped_session(self.session_maker)
             logger.info("Successfully created database sessionmaker.")
         except SQLAlchemyError:
             logger.exception("Error creating database sessionmaker.")
             raise
 
+    def _create_engine(self, db_url: str) -> Engine:
+        return create_engine(
+            db_url,
+            poolclass=InstrumentedQueuePool,
+            **self.pool_settings.engine_kwargs(),
+        )
+
+    def get_pool_statistics(self) -> PoolStatistics:
+        """
+        Returns the usage of the connection pool: checked out connections, time
+        spent waiting for a connection, and number of connections created.
+
+        Raises
+        ------
+        RuntimeError
+            If the connection has not been created.
+        """
+        if self.engine is None or not isinstance(
+            self.engine.pool, InstrumentedQueuePool
+        ):
+            raise RuntimeError(
+                "Connection has not been created. Call create_connection() first."
+            )
+        return self.engine.pool.statistics()
+
+    def remove_session(self) -> None:
+        """
+        Closes and forgets the session of the current thread in scoped session
+        mode. Does nothing otherwise.
+        """
+        if isinstance(self.session_maker, scoped_session):
+            self.session_maker.remove()
+
     def _get_session(self):
         if self.session_maker is None:
             raise RuntimeError(
@@ -144,7 +241,14 @@ class DBConfigSQLAlchemy:
     @contextmanager
     def managed_session(self) -> Generator[Session, None, None]:
         """
-        Provides a database session with automatic rollback and retries.
+        Provides a database session that is committed at the end, or rolled back
+        on errors. Use `cvtoolkit.database.retry.run_in_transaction` to retry a
+        transaction after transient errors.
+
+        The access token is not checked here, it is renewed in the background and
+        added when the pool opens a new connection. In scoped session mode the
+        session of the current thread is reused, and a nested call does not
+        commit or close it: only the outermost call ends the transaction.
 
         Yields
         ------
@@ -154,34 +258,47 @@ class DBConfigSQLAlchemy:
         Raises
         ------
         DatabaseError
-            If database connection issues persist after retries.
+            If the database returns an error, e.g. when the connection is lost.
         SQLAlchemyError
             If a general SQLAlchemy error occurs.
         """
-        self._validate_token_status()
         session = self._get_session()
+        if isinstance(self.session_maker, scoped_session):
+            depth = getattr(self._session_depth, "value", 0)
+            if depth:
+                self._session_depth.value = depth + 1
+                try:
+                    yield session
+                finally:
+                    self._session_depth.value = depth
+                return
+            self._session_depth.value = 1
         try:
             yield session
             session.commit()
+        except DatabaseError:
+            # DatabaseError is a SQLAlchemyError, so it has to be handled first.
+            session.rollback()
+            logger.error("Database connection error, rolling back changes.")
+            raise
         except SQLAlchemyError:
             session.rollback()
             logger.error("Database error encountered, rolling back changes.")
             raise
-        except DatabaseError:
-            logger.error("Database connection error.")
-            raise
         finally:
+            self._session_depth.value = 0
             session.close()
 
     def close_connection(self) -> None:
         """
-        Closes the database engine connection.
+        Closes the database engine connection and stops the token renewal.
 
         Raises
         ------
         SQLAlchemyError
             If an error occurs while disposing of the database engine.
         """
+        self._stop_token_refresh_thread()
         if self.engine:
             try:
                 self.engine.dispose()
@@ -192,8 +309,13 @@ class DBConfigSQLAlchemy:
 
     def _validate_token_status(self) -> None:
         """
-        Checks and renews the access token if needed.
+        Checks and renews the access token if needed. Normally the token is
+        renewed in the background before this is necessary.
         """
-        if not self.token_expiration_time or datetime.now() >= self.token_expiration_time:
-            self._get_db_access_token()
-            logger.info("Database access token renewed.")
+        with self._token_lock:
+            if (
+                not self.token_expiration_time
+                or datetime.now() >= self.token_expiration_time
+            ):
+                self._get_db_access_token()
+                logger.info("Database access token renewed.")
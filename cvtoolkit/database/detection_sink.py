@@ -0,0 +1,315 @@
+import contextvars
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy.typing as npt
+from sqlalchemy.orm import Session
+
+from cvtoolkit.database.database_handler import DBConfigSQLAlchemy
+from cvtoolkit.database.detection_writer import (
+    DetectionWriter,
+    ImageMetadata,
+    detection_rows,
+)
+from cvtoolkit.database.retry import run_in_transaction
+from cvtoolkit.database.status_tracker import STATUSES, ImageKey, StatusTracker
+from cvtoolkit.telemetry.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SinkStatistics:
+    """Metrics of a DetectionSink."""
+
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    n_flushes: int = 0
+    n_failed_flushes: int = 0
+    n_detection_rows: int = 0
+    n_status_rows: int = 0
+    n_dropped_rows: int = 0
+    last_flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+    total_flush_seconds: float = 0.0
+
+    @property
+    def mean_flush_seconds(self) -> float:
+        return self.total_flush_seconds / self.n_flushes if self.n_flushes else 0.0
+
+
+class _FlushRequest:
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_CLOSE = object()
+
+
+class DetectionSink:
+    """
+    Buffers DetectionInformation and ImageProcessingStatus rows in a queue and
+    writes them to the database from a background thread, so the caller does not
+    wait for the database.
+
+    The buffer is flushed when it holds `flush_size` detection rows, or when the
+    oldest buffered row is `flush_interval` seconds old. Every flush is a single
+    transaction, which is retried after transient errors with the retry policy of
+    the writer. When the queue is full, `put_detections` and `put_status` block
+    until there is room again (backpressure). `close` flushes everything that is
+    still buffered.
+
+    Example
+    -------
+    with DetectionSink(db_config) as sink:
+        for image, metadata in images:
+            sink.put_detections(model(image), metadata)
+            sink.put_status(..., processing_status="done")
+    """
+
+    def __init__(
+        self,
+        db_config: DBConfigSQLAlchemy,
+        flush_size: int = 5000,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000,
+        put_timeout: Optional[float] = None,
+        writer: Optional[DetectionWriter] = None,
+        status_tracker: Optional[StatusTracker] = None,
+    ):
+        """
+        Parameters
+        ----------
+        db_config: DBConfigSQLAlchemy
+            Database configuration with an open connection.
+        flush_size: int = 5000
+            Number of buffered detection rows that triggers a flush.
+        flush_interval: float = 1.0
+            Maximum number of seconds a row stays in the buffer.
+        max_queue_size: int = 10000
+            Maximum number of queued images and statuses.
+        put_timeout: Optional[float] = None
+            Maximum number of seconds to wait for room in a full queue before
+            raising `queue.Full`. With None, wait indefinitely.
+        writer: Optional[DetectionWriter] = None
+            Writer used for the detection rows, by default a DetectionWriter
+            with `batch_size=flush_size`.
+        status_tracker: Optional[StatusTracker] = None
+            Tracker used for the statuses. Statuses that are not an allowed
+            transition of the tracker are skipped.
+        """
+        self.db_config = db_config
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.writer = writer or DetectionWriter(db_config, batch_size=flush_size)
+        self.status_tracker = status_tracker or StatusTracker(db_config)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._statistics = SinkStatistics()
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        # The flush thread reports into the telemetry of the run that created
+        # the sink.
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._run,),
+            name="DetectionSink",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "DetectionSink":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of queued items that have not been taken by the flush thread."""
+        return self._queue.qsize()
+
+    def get_statistics(self) -> SinkStatistics:
+        """Return a snapshot of the sink metrics."""
+        with self._lock:
+            statistics = SinkStatistics(**vars(self._statistics))
+        statistics.queue_depth = self.queue_depth
+        return statistics
+
+    def _put(self, item: Any) -> None:
+        if self._closed:
+            raise RuntimeError("DetectionSink is closed.")
+        self._queue.put(item, timeout=self.put_timeout)
+        depth = self._queue.qsize()
+        with self._lock:
+            self._statistics.max_queue_depth = max(
+                self._statistics.max_queue_depth, depth
+            )
+
+    def put_detections(
+        self, detections: Optional[npt.NDArray], metadata: ImageMetadata
+    ) -> None:
+        """
+        Queue the detections of one image, see `detection_rows`. The rows are
+        created here, so invalid detections raise in the caller.
+        """
+        self._put(("detections", detection_rows(detections, metadata)))
+
+    def put_status(
+        self,
+        image_customer_name: str,
+        image_upload_date: datetime,
+        image_filename: str,
+        processing_status: str,
+    ) -> None:
+        """
+        Queue the processing status of one image. Several statuses of the same
+        image in one flush are applied in the order they were queued.
+
+        Raises
+        ------
+        ValueError
+            If `processing_status` is not one of the statuses of StatusTracker.
+        """
+        if processing_status not in STATUSES:
+            raise ValueError(
+                f"Unknown status '{processing_status}', expected one of {STATUSES}."
+            )
+        key = ImageKey(image_customer_name, image_upload_date, image_filename)
+        self._put(("status", key, processing_status))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Write everything that was queued before this call, and wait until it is
+        written.
+
+        Returns
+        -------
+        False if the flush did not finish within `timeout` seconds.
+        """
+        request = _FlushRequest()
+        self._put(request)
+        return request.done.wait(timeout)
+
+    def close(self) -> None:
+        """
+        Flush all queued rows and stop the background thread.
+
+        Raises
+        ------
+        RuntimeError
+            If one of the flushes failed; the rows of a failed flush are dropped.
+        """
+        if not self._closed:
+            self._queue.put(_CLOSE)
+            self._closed = True
+            self._thread.join()
+            statistics = self.get_statistics()
+            logger.info(
+                f"DetectionSink closed after {statistics.n_flushes} flushes "
+                f"(mean {statistics.mean_flush_seconds:.3f}s, max "
+                f"{statistics.max_flush_seconds:.3f}s), max queue depth "
+                f"{statistics.max_queue_depth}."
+            )
+        if self._error is not None:
+            raise RuntimeError("DetectionSink failed to write rows.") from self._error
+
+    def _run(self) -> None:
+        rows: List[Dict[str, Any]] = []
+        statuses: Dict[ImageKey, List[str]] = {}
+        deadline: Optional[float] = None
+        while True:
+            timeout = (
+                None if deadline is None else max(0.0, deadline - time.monotonic())
+            )
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, tuple):
+                if item[0] == "detections":
+                    rows.extend(item[1])
+                else:
+                    statuses.setdefault(item[1], []).append(item[2])
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(rows) < self.flush_size and time.monotonic() < deadline:
+                    continue
+
+            if rows or statuses:
+                self._flush(rows, statuses)
+                rows, statuses, deadline = [], {}, None
+            if isinstance(item, _FlushRequest):
+                item.done.set()
+            elif item is _CLOSE:
+                return
+
+    def _write(
+        self,
+        session: Session,
+        rows: List[Dict[str, Any]],
+        statuses: Dict[ImageKey, List[str]],
+    ) -> None:
+        for i in range(0, len(rows), self.writer.batch_size):
+            self.writer.write_batch(session, rows[i : i + self.writer.batch_size])
+        # The tracker applies one transition per image per upsert, so the n-th
+        # statuses of all images go in the n-th upsert.
+        n_rounds = max(
+            (len(image_statuses) for image_statuses in statuses.values()), default=0
+        )
+        for n in range(n_rounds):
+            self.status_tracker.upsert(
+                session,
+                [
+                    (image, image_statuses[n])
+                    for image, image_statuses in statuses.items()
+                    if n < len(image_statuses)
+                ],
+            )
+
+    def _flush(self, rows: List[Dict[str, Any]], statuses: Dict[ImageKey, List[str]]):
+        n_statuses = sum(len(image_statuses) for image_statuses in statuses.values())
+        telemetry = get_telemetry()
+        start = time.perf_counter()
+        try:
+            with telemetry.timer("db_write"):
+                run_in_transaction(
+                    self.db_config,
+                    lambda session: self._write(session, rows, statuses),
+                    self.writer.retry_policy,
+                )
+        except Exception as e:
+            logger.exception(
+                f"Failed to write {len(rows)} detection rows and "
+                f"{n_statuses} statuses, dropping them."
+            )
+            with self._lock:
+                self._statistics.n_failed_flushes += 1
+                self._statistics.n_dropped_rows += len(rows) + n_statuses
+            if self._error is None:
+                self._error = e
+            return
+
+        seconds = time.perf_counter() - start
+        telemetry.count("db_write", "rows", len(rows))
+        telemetry.count("db_write", "status_rows", n_statuses)
+        with self._lock:
+            statistics = self._statistics
+            statistics.n_flushes += 1
+            statistics.n_detection_rows += len(rows)
+            statistics.n_status_rows += n_statuses
+            statistics.last_flush_seconds = seconds
+            statistics.max_flush_seconds = max(statistics.max_flush_seconds, seconds)
+            statistics.total_flush_seconds += seconds
+        logger.debug(
+            f"Flushed {len(rows)} detection rows and {n_statuses} statuses in "
+            f"{seconds:.3f}s."
+        )
@@ -0,0 +1,270 @@
+import csv
+import io
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy.typing as npt
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from cvtoolkit.database.baas_tables import DetectionInformation
+from cvtoolkit.database.database_handler import DBConfigSQLAlchemy
+from cvtoolkit.database.retry import RetryPolicy, run_in_transaction
+from cvtoolkit.telemetry.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+# Columns written for every detection, in COPY order. The id is generated by
+# the database.
+DETECTION_COLUMNS = (
+    "image_customer_name",
+    "image_upload_date",
+    "image_filename",
+    "has_detection",
+    "class_id",
+    "x_norm",
+    "y_norm",
+    "w_norm",
+    "h_norm",
+    "image_width",
+    "image_height",
+    "run_id",
+    "conf_score",
+)
+
+
+@dataclass
+class ImageMetadata:
+    """Information about the image the detections belong to."""
+
+    image_customer_name: str
+    image_upload_date: datetime
+    image_filename: str
+    image_width: int
+    image_height: int
+    run_id: str
+
+
+def detection_rows(
+    detections: Optional[npt.NDArray], metadata: ImageMetadata
+) -> List[Dict[str, Any]]:
+    """
+    Convert the detections of one image to DetectionInformation rows.
+
+    Parameters
+    ----------
+    detections: Optional[npt.NDArray]
+        YOLO labels of shape (n, 6) as (class, x, y, w, h, confidence), or (n, 5)
+        without confidence, as stored by `YoloLabelsDataset`.
+    metadata: ImageMetadata
+        Information about the image.
+
+    Returns
+    -------
+    One row per detection. An image without detections gets a single row with
+    `has_detection=False`, so processed images can be told apart from missing
+    ones.
+    """
+    image_values = {
+        "image_customer_name": metadata.image_customer_name,
+        "image_upload_date": metadata.image_upload_date,
+        "image_filename": metadata.image_filename,
+        "image_width": metadata.image_width,
+        "image_height": metadata.image_height,
+        "run_id": metadata.run_id,
+    }
+    if detections is None or len(detections) == 0:
+        return [
+            {
+                **image_values,
+                "has_detection": False,
+                "class_id": None,
+                "x_norm": None,
+                "y_norm": None,
+                "w_norm": None,
+                "h_norm": None,
+                "conf_score": None,
+            }
+        ]
+
+    has_score = detections.shape[1] >= 6
+    rows = []
+    # tolist() converts all values to Python numbers at once.
+    for detection in detections[:, :6].tolist():
+        rows.append(
+            {
+                **image_values,
+                "has_detection": True,
+                "class_id": int(detection[0]),
+                "x_norm": detection[1],
+                "y_norm": detection[2],
+                "w_norm": detection[3],
+                "h_norm": detection[4],
+                "conf_score": detection[5] if has_score else None,
+            }
+        )
+    return rows
+
+
+def rows_to_csv(rows: Iterable[Dict[str, Any]]) -> io.StringIO:
+    """
+    Serialize rows to CSV in the format of PostgreSQL `COPY ... WITH (FORMAT csv)`:
+    columns in `DETECTION_COLUMNS` order, NULL as an empty unquoted field.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for row in rows:
+        values = []
+        for column in DETECTION_COLUMNS:
+            value = row[column]
+            if value is None:
+                value = ""
+            elif isinstance(value, bool):
+                value = "true" if value else "false"
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        writer.writerow(values)
+    buffer.seek(0)
+    return buffer
+
+
+class DetectionWriter:
+    """
+    Writes DetectionInformation rows in bulk instead of one ORM object at a time.
+
+    Rows are inserted in batches of `batch_size` with a single executemany per
+    batch. With `use_copy=True` and a PostgreSQL database, every batch is streamed
+    with `COPY FROM STDIN` instead, which is the fastest way to load rows into
+    PostgreSQL. Every batch is committed in its own transaction, which is retried
+    after transient errors according to `retry_policy`.
+
+    Example
+    -------
+    writer = DetectionWriter(db_config, batch_size=10000, use_copy=True)
+    writer.write_many(
+        (labels, metadata_per_image[image_id])
+        for image_id, labels in dataset.get_filtered_labels().items()
+    )
+    """
+
+    def __init__(
+        self,
+        db_config: DBConfigSQLAlchemy,
+        batch_size: int = 5000,
+        use_copy: bool = False,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        """
+        Parameters
+        ----------
+        db_config: DBConfigSQLAlchemy
+            Database configuration with an open connection.
+        batch_size: int = 5000
+            Number of rows per INSERT or COPY statement and per transaction.
+        use_copy: bool = False
+            Use `COPY FROM STDIN` if the database is PostgreSQL. Other databases
+            always use INSERT.
+        retry_policy: Optional[RetryPolicy] = None
+            Retry policy of each batch, by default `RetryPolicy()`.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        self.db_config = db_config
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    def write(self, detections: Optional[npt.NDArray], metadata: ImageMetadata) -> int:
+        """
+        Write the detections of one image, see `detection_rows`.
+
+        Returns
+        -------
+        The number of rows written.
+        """
+        return self.write_rows(detection_rows(detections, metadata))
+
+    def write_many(
+        self, items: Iterable[Tuple[Optional[npt.NDArray], ImageMetadata]]
+    ) -> int:
+        """
+        Write the detections of many images. The rows of consecutive images are
+        combined into batches of `batch_size` rows.
+
+        Parameters
+        ----------
+        items: Iterable[Tuple[Optional[npt.NDArray], ImageMetadata]]
+            (detections, metadata) per image.
+
+        Returns
+        -------
+        The number of rows written.
+        """
+        rows = (
+            row
+            for detections, metadata in items
+            for row in detection_rows(detections, metadata)
+        )
+        return self.write_rows(rows)
+
+    def write_rows(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        Write DetectionInformation rows, given as dicts with the keys in
+        `DETECTION_COLUMNS`.
+
+        Returns
+        -------
+        The number of rows written.
+        """
+        telemetry = get_telemetry()
+        n_rows = 0
+        for batch in self._batches(rows):
+            with telemetry.timer("db_write"):
+                run_in_transaction(
+                    self.db_config,
+                    lambda session: self.write_batch(session, batch),
+                    self.retry_policy,
+                )
+            telemetry.count("db_write", "rows", len(batch))
+            n_rows += len(batch)
+        logger.debug(f"Wrote {n_rows} detection rows.")
+        return n_rows
+
+    def _batches(self, rows: Iterable[Dict[str, Any]]) -> Iterator[List[dict]]:
+        iterator = iter(rows)
+        while batch := list(islice(iterator, self.batch_size)):
+            yield batch
+
+    def write_batch(self, session: Session, batch: List[Dict[str, Any]]) -> None:
+        """
+        Write one batch of rows in the transaction of `session`, without
+        committing it.
+        """
+        if self.use_copy and session.get_bind().dialect.name == "postgresql":
+            self._copy_batch(session, batch)
+        else:
+            session.execute(insert(DetectionInformation.__table__), batch)
+
+    @staticmethod
+    def _copy_batch(session: Session, batch: List[Dict[str, Any]]) -> None:
+        table = DetectionInformation.__table__
+        # Respect a schema_translate_map of the engine, like INSERT does.
+        schema_map = (
+            session.connection().get_execution_options().get("schema_translate_map", {})
+        )
+        schema = schema_map.get(table.schema, table.schema)
+        table_name = f"{schema}.{table.name}" if schema else table.name
+        statement = (
+            f"COPY {table_name} ({', '.join(DETECTION_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)"
+        )
+        dbapi_connection = session.connection().connection
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(statement, rows_to_csv(batch))
+        finally:
+            cursor.close()
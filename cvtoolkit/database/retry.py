@@ -0,0 +1,155 @@
+import functools
+import logging
+import random
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional, TypeVar
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+
+if TYPE_CHECKING:
+    from cvtoolkit.database.database_handler import DBConfigSQLAlchemy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# PostgreSQL error classes and codes that are worth retrying: connection
+# exceptions, serialization failures, deadlocks, insufficient resources and
+# server shutdown or startup.
+TRANSIENT_PGCODE_PREFIXES = ("08", "40001", "40P01", "53", "57P01", "57P02", "57P03")
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: the n-th retry waits a random time
+    between 0 and `min(max_delay, initial_delay * multiplier ** (n - 1))` seconds.
+    """
+
+    max_attempts: int = 5
+    initial_delay: float = 0.5
+    max_delay: float = 30.0
+    multiplier: float = 2.0
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after failed attempt number `attempt` (from 1)."""
+        ceiling = min(
+            self.max_delay, self.initial_delay * self.multiplier ** (attempt - 1)
+        )
+        return random.uniform(0, ceiling)  # nosec
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Whether retrying the transaction that raised `error` may succeed, e.g. after a
+    dropped connection, a deadlock or a pool timeout. Constraint violations,
+    invalid SQL and other errors that would fail again are permanent.
+    """
+    if isinstance(error, PoolTimeoutError):
+        return True
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+    pgcode = getattr(error.orig, "pgcode", None)
+    if pgcode:
+        return pgcode.startswith(TRANSIENT_PGCODE_PREFIXES)
+    if isinstance(error.orig, sqlite3.Error):
+        # SQLite also uses OperationalError for e.g. missing tables.
+        return "locked" in str(error.orig) or "busy" in str(error.orig)
+    return isinstance(error, (OperationalError, InterfaceError))
+
+
+def run_in_transaction(
+    db_config: "DBConfigSQLAlchemy",
+    work: Callable[[Session], T],
+    policy: Optional[RetryPolicy] = None,
+    idempotent: bool = False,
+) -> T:
+    """
+    Run `work` in a transaction of `db_config.managed_session()`, and run it
+    again in a new transaction when it fails with a transient error.
+
+    A failed attempt is rolled back completely, so retrying it does not write
+    anything twice. Only when the connection fails during the COMMIT itself it is
+    unknown whether the transaction was written; it is retried only if `work` is
+    idempotent, e.g. an upsert, and raised otherwise.
+
+    Parameters
+    ----------
+    db_config: DBConfigSQLAlchemy
+        Database configuration with an open connection.
+    work: Callable[[Session], T]
+        Function that does the work with the given session. It must not commit.
+    policy: Optional[RetryPolicy] = None
+        Retry policy, by default `RetryPolicy()`.
+    idempotent: bool = False
+        Whether running `work` twice has the same effect as running it once.
+
+    Returns
+    -------
+    The result of `work`.
+    """
+    policy = policy or RetryPolicy()
+    attempt = 1
+    while True:
+        committing = False
+        try:
+            with db_config.managed_session() as session:
+                result = work(session)
+                session.flush()
+                committing = True
+            return result
+        except Exception as e:
+            if not is_transient_error(e) or attempt >= policy.max_attempts:
+                raise
+            if committing and not idempotent:
+                logger.error(
+                    "Connection failed while committing, the transaction might "
+                    "have been written. Not retrying."
+                )
+                raise
+            delay = policy.delay(attempt)
+            logger.warning(
+                f"Transient database error in attempt {attempt} of "
+                f"{policy.max_attempts}, retrying in {delay:.2f}s: {e}"
+            )
+            time.sleep(delay)
+            attempt += 1
+
+
+def retry_transaction(
+    db_config: "DBConfigSQLAlchemy",
+    policy: Optional[RetryPolicy] = None,
+    idempotent: bool = False,
+):
+    """
+    Decorator version of `run_in_transaction`. The session is passed as first
+    argument to the decorated function.
+
+    Example
+    -------
+    @retry_transaction(db_config, idempotent=True)
+    def mark_done(session, image_filename):
+        ...
+
+    mark_done("image.jpg")
+    """
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            return run_in_transaction(
+                db_config,
+                lambda session: func(session, *args, **kwargs),
+                policy,
+                idempotent,
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,229 @@
+import logging
+from datetime import datetime
+from itertools import islice
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    cast,
+)
+
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.orm import Session
+
+from cvtoolkit.database.baas_tables import ImageProcessingStatus
+from cvtoolkit.database.database_handler import DBConfigSQLAlchemy
+from cvtoolkit.database.retry import RetryPolicy, run_in_transaction
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+STATUSES = (QUEUED, PROCESSING, DONE, FAILED)
+
+# Statuses from which an image may move to a status. Failed images can be queued
+# again. An image without status can get any status.
+ALLOWED_TRANSITIONS = {
+    QUEUED: (FAILED,),
+    PROCESSING: (QUEUED,),
+    DONE: (PROCESSING,),
+    FAILED: (PROCESSING,),
+}
+
+
+class ImageKey(NamedTuple):
+    """Primary key of ImageProcessingStatus."""
+
+    image_customer_name: str
+    image_upload_date: datetime
+    image_filename: str
+
+
+# INSERT constructs with ON CONFLICT support, per dialect.
+_INSERTS: Dict[str, Callable[..., Any]] = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+class StatusTracker:
+    """
+    Tracks the processing status of images in ImageProcessingStatus, as a state
+    machine: queued -> processing -> done or failed, and failed -> queued.
+
+    Status changes are bulk upserts of thousands of images per statement with
+    `INSERT ... ON CONFLICT DO UPDATE`; a change that is not an allowed transition
+    is skipped by the database. Workers pull work with `claim_next`, which moves
+    queued images to processing atomically, so two workers never claim the same
+    image. PostgreSQL and SQLite are supported.
+
+    Example
+    -------
+    tracker = StatusTracker(db_config)
+    tracker.set_status(new_images, QUEUED)
+    while images := tracker.claim_next(100):
+        done, failed = process(images)
+        tracker.set_status(done, DONE)
+        tracker.set_status(failed, FAILED)
+    """
+
+    def __init__(
+        self,
+        db_config: DBConfigSQLAlchemy,
+        chunk_size: int = 5000,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        """
+        Parameters
+        ----------
+        db_config: DBConfigSQLAlchemy
+            Database configuration with an open connection.
+        chunk_size: int = 5000
+            Maximum number of images per statement.
+        retry_policy: Optional[RetryPolicy] = None
+            Retry policy of every transaction, by default `RetryPolicy()`.
+
+        Raises
+        ------
+        ValueError
+            If the connection is not open or its database is not PostgreSQL or
+            SQLite.
+        """
+        if db_config.engine is None:
+            raise ValueError("StatusTracker requires an open database connection.")
+        dialect = db_config.engine.dialect.name
+        if dialect not in _INSERTS:
+            raise ValueError(
+                f"Upserts are not supported for {dialect}, expected one of "
+                f"{tuple(_INSERTS)}."
+            )
+        self.db_config = db_config
+        self.chunk_size = chunk_size
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._insert = _INSERTS[dialect]
+
+    def set_status(
+        self, images: Iterable[Tuple[str, datetime, str]], status: str
+    ) -> int:
+        """
+        Set the status of many images in one transaction.
+
+        Returns
+        -------
+        The number of images whose status was inserted or updated.
+        """
+        transitions = [(ImageKey(*image), status) for image in images]
+        return run_in_transaction(
+            self.db_config,
+            lambda session: self.upsert(session, transitions),
+            self.retry_policy,
+            idempotent=True,
+        )
+
+    def upsert(
+        self, session: Session, transitions: Iterable[Tuple[ImageKey, str]]
+    ) -> int:
+        """
+        Apply status transitions in the transaction of `session`, without
+        committing it. Of several transitions of the same image only the last one
+        is applied.
+
+        Returns
+        -------
+        The number of images whose status was inserted or updated.
+        """
+        by_status: Dict[str, Dict[ImageKey, None]] = {status: {} for status in STATUSES}
+        for image, status in transitions:
+            if status not in by_status:
+                raise ValueError(
+                    f"Unknown status '{status}', expected one of {STATUSES}."
+                )
+            for images in by_status.values():
+                images.pop(image, None)
+            by_status[status][image] = None
+
+        insert = self._insert
+        table = ImageProcessingStatus.__table__
+        n_changed = 0
+        for status, images in by_status.items():
+            iterator = iter(images)
+            while chunk := list(islice(iterator, self.chunk_size)):
+                statement = insert(table).values(
+                    [
+                        {**image._asdict(), "processing_status": status}
+                        for image in chunk
+                    ]
+                )
+                statement = statement.on_conflict_do_update(
+                    index_elements=[column.name for column in table.primary_key],
+                    set_={"processing_status": statement.excluded.processing_status},
+                    where=table.c.processing_status.in_(ALLOWED_TRANSITIONS[status]),
+                )
+                n_changed += cast(CursorResult, session.execute(statement)).rowcount
+        return n_changed
+
+    def claim_next(
+        self, n: int, image_customer_name: Optional[str] = None
+    ) -> List[ImageKey]:
+        """
+        Atomically move up to `n` queued images, oldest upload first, to
+        processing and return them.
+
+        On PostgreSQL the candidates are selected with `FOR UPDATE SKIP LOCKED`,
+        so concurrent workers skip each other's rows instead of waiting for them.
+        SQLite allows only one writer at a time, which gives the same guarantee.
+        """
+        return run_in_transaction(
+            self.db_config,
+            lambda session: self._claim_next(session, n, image_customer_name),
+            self.retry_policy,
+        )
+
+    @staticmethod
+    def _claim_next(
+        session: Session, n: int, image_customer_name: Optional[str]
+    ) -> List[ImageKey]:
+        table = ImageProcessingStatus.__table__
+        key_columns = [table.c[field] for field in ImageKey._fields]
+        candidates = select(*key_columns).where(table.c.processing_status == QUEUED)
+        if image_customer_name is not None:
+            candidates = candidates.where(
+                table.c.image_customer_name == image_customer_name
+            )
+        candidates = (
+            candidates.order_by(table.c.image_upload_date)
+            .limit(n)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(table)
+            .where(tuple_(*key_columns).in_(candidates))
+            # Guards against rows that changed after the subquery, e.g. on
+            # databases without row locks.
+            .where(table.c.processing_status == QUEUED)
+            .values(processing_status=PROCESSING)
+            .returning(*key_columns)
+        )
+        claimed = [ImageKey._make(row) for row in session.execute(statement)]
+        logger.debug(f"Claimed {len(claimed)} images.")
+        return claimed
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Return the number of images per status."""
+        table = ImageProcessingStatus.__table__
+        with self.db_config.managed_session() as session:
+            rows = session.execute(
+                select(table.c.processing_status, func.count()).group_by(
+                    table.c.processing_status
+                )
+            )
+            return {row[0]: row[1] for row in rows}
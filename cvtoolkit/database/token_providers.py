@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+import os
+import stat
+import subprocess  # nosec
+import tempfile
+import threading
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from cvtoolkit.multiprocessing.lock_file import FileLock
+
+logger = logging.getLogger(__name__)
+
+# Azure AD resource of Azure Database for PostgreSQL, "oss-rdbms" in the az CLI.
+OSS_RDBMS_RESOURCE = "https://ossrdbms-aad.database.windows.net"
+IMDS_ENDPOINT = "http://169.254.169.254/metadata/identity/oauth2/token"  # nosec
+
+
+@dataclass(frozen=True)
+class AccessToken:
+    """An access token and its (local, naive) expiration time."""
+
+    token: str
+    expires_on: datetime
+
+    def is_valid(self, margin: timedelta = timedelta(0)) -> bool:
+        """Whether the token is still valid for at least `margin`."""
+        return datetime.now() + margin < self.expires_on
+
+
+class TokenProvider(ABC):
+    """Acquires access tokens for the database."""
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies the tokens of this provider in a token cache."""
+        return type(self).__name__
+
+    @abstractmethod
+    def get_token(self) -> AccessToken:
+        """Acquire a new access token."""
+
+
+class AzureCliTokenProvider(TokenProvider):
+    """
+    Acquires tokens with `az login --identity` and `az account get-access-token`.
+    Every call runs two subprocesses, prefer ManagedIdentityTokenProvider.
+    """
+
+    def __init__(self, client_id: str, resource_type: str = "oss-rdbms"):
+        self.client_id = client_id
+        self.resource_type = resource_type
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.client_id}:{self.resource_type}"
+
+    @staticmethod
+    def _run_az_cli(command: list[str]) -> dict:
+        """
+        Runs an Azure CLI command and returns the output as a JSON object.
+
+        Raises
+        ------
+        subprocess.CalledProcessError
+            If the Azure CLI command fails.
+        """
+        try:
+            result = subprocess.run(
+                command, capture_output=True, check=True, text=True  # nosec
+            )
+            return json.loads(result.stdout)
+        except subprocess.CalledProcessError as e:
+            logger.exception(f"Azure CLI command failed: {e}")
+            raise
+
+    def get_token(self) -> AccessToken:
+        self._run_az_cli(["az", "login", "--identity", "--client-id", self.client_id])
+        token_info = self._run_az_cli(
+            ["az", "account", "get-access-token", "--resource-type", self.resource_type]
+        )
+        token = token_info.get("accessToken")
+        expires_on = token_info.get("expiresOn")
+        if not token or not expires_on:
+            raise ValueError("Failed to retrieve access token from Azure CLI.")
+        return AccessToken(token, datetime.fromisoformat(expires_on))
+
+
+class ManagedIdentityTokenProvider(TokenProvider):
+    """
+    Acquires tokens for a user-assigned managed identity in-process, with a single
+    HTTP request to the identity endpoint of the machine.
+
+    The endpoint of App Service and Container Apps (`IDENTITY_ENDPOINT` and
+    `IDENTITY_HEADER`) is used when available, otherwise the Azure Instance
+    Metadata Service of virtual machines and Azure ML compute.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        resource: str = OSS_RDBMS_RESOURCE,
+        timeout: float = 10.0,
+    ):
+        self.client_id = client_id
+        self.resource = resource
+        self.timeout = timeout
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.client_id}:{self.resource}"
+
+    def _request(self) -> urllib.request.Request:
+        params = {"resource": self.resource, "client_id": self.client_id}
+        identity_endpoint = os.environ.get("IDENTITY_ENDPOINT")
+        identity_header = os.environ.get("IDENTITY_HEADER")
+        if identity_endpoint and identity_header:
+            params["api-version"] = "2019-08-01"
+            url, headers = identity_endpoint, {"X-IDENTITY-HEADER": identity_header}
+        else:
+            params["api-version"] = "2018-02-01"
+            url, headers = IMDS_ENDPOINT, {"Metadata": "true"}
+        return urllib.request.Request(
+            f"{url}?{urllib.parse.urlencode(params)}", headers=headers
+        )
+
+    def get_token(self) -> AccessToken:
+        with urllib.request.urlopen(  # nosec
+            self._request(), timeout=self.timeout
+        ) as response:
+            token_info = json.load(response)
+        token = token_info.get("access_token")
+        expires_on = token_info.get("expires_on")
+        if not token or not expires_on:
+            raise ValueError("Failed to retrieve access token from managed identity.")
+        return AccessToken(token, datetime.fromtimestamp(int(expires_on)))
+
+
+class CachedTokenProvider(TokenProvider):
+    """
+    Reuses the tokens of another provider until they are about to expire.
+
+    Tokens are cached in memory and in a file that is shared by all processes of
+    the current user on the machine, so workers on the same node reuse a valid
+    token instead of each acquiring their own. The file is keyed by the
+    `cache_key` of the provider (client id and resource) and guarded by a lock so
+    only one process acquires a new token at a time. The cache folder must be
+    owned by the current user and not be accessible by others, otherwise only
+    the in-memory cache is used. The cache and lock files are created with
+    permissions 0o600.
+    """
+
+    def __init__(
+        self,
+        provider: TokenProvider,
+        cache_dir: Optional[str] = None,
+        min_validity: timedelta = timedelta(minutes=10),
+    ):
+        """
+        Parameters
+        ----------
+        provider: TokenProvider
+            Provider used when there is no valid cached token.
+        cache_dir: Optional[str] = None
+            Folder of the cache file, by default `cvtoolkit-tokens-<uid>` in the
+            temp folder. With an empty string only the in-memory cache is used.
+        min_validity: timedelta = timedelta(minutes=10)
+            A cached token is only used if it is valid for at least this long.
+            Keep it larger than the renewal margin of the caller.
+        """
+        self.provider = provider
+        self.min_validity = min_validity
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                tempfile.gettempdir(), f"cvtoolkit-tokens-{os.getuid()}"
+            )
+        self.cache_path = None
+        if cache_dir:
+            key = hashlib.sha256(provider.cache_key.encode()).hexdigest()[:16]
+            self.cache_path = os.path.join(cache_dir, f"{key}.json")
+        self._token: Optional[AccessToken] = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_key(self) -> str:
+        return self.provider.cache_key
+
+    def _read_cache(self) -> Optional[AccessToken]:
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            return AccessToken(
+                cached["token"], datetime.fromisoformat(cached["expires_on"])
+            )
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_cache(self, token: AccessToken) -> None:
+        directory = os.path.dirname(self.cache_path)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {"token": token.token, "expires_on": token.expires_on.isoformat()},
+                    f,
+                )
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _check_cache_dir(cache_dir: str) -> None:
+        """
+        Raise PermissionError if the cache folder is not a folder of the current
+        user that only this user can access.
+        """
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        # lstat, so a symlink to a folder of someone else is not accepted.
+        cache_dir_stat = os.lstat(cache_dir)
+        if not stat.S_ISDIR(cache_dir_stat.st_mode):
+            raise PermissionError(f"Token cache {cache_dir} is not a folder.")
+        if cache_dir_stat.st_uid != os.getuid():
+            raise PermissionError(
+                f"Token cache {cache_dir} is owned by another user "
+                f"(uid {cache_dir_stat.st_uid})."
+            )
+        if cache_dir_stat.st_mode & 0o077:
+            raise PermissionError(
+                f"Token cache {cache_dir} is accessible by other users (mode "
+                f"{stat.S_IMODE(cache_dir_stat.st_mode):o})."
+            )
+
+    def _get_shared_token(self) -> AccessToken:
+        try:
+            self._check_cache_dir(os.path.dirname(self.cache_path))
+        except OSError as e:
+            logger.warning(f"Not using the token cache: {e}")
+            return self.provider.get_token()
+        with FileLock(self.cache_path + ".lock", permissions=0o600):
+            token = self._read_cache()
+            if token is not None and token.is_valid(self.min_validity):
+                logger.debug("Using access token from the token cache.")
+                return token
+            token = self.provider.get_token()
+            self._write_cache(token)
+            return token
+
+    def get_token(self) -> AccessToken:
+        with self._lock:
+            if self._token is None or not self._token.is_valid(self.min_validity):
+                if self.cache_path:
+                    self._token = self._get_shared_token()
+                else:
+                    self._token = self.provider.get_token()
+            return self._token
@@ -0,0 +1,170 @@
+from collections.abc import Mapping
+from typing import Dict, Hashable, Iterator, List, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+
+class ColumnarLabels(Mapping):
+    """
+    Read-only mapping from image id to YOLO labels, backed by one contiguous
+    array.
+
+    All boxes of all images are stored in a single `(n_boxes, n_columns)` float32
+    array. The rows of image `i` are `boxes[offsets[i]:offsets[i + 1]]`, i.e. the
+    layout is the same as the row pointers of a CSR matrix. Looking up an image
+    returns a view into that array, so no per-image arrays are created or copied.
+
+    Examples
+    --------
+    >>> labels = ColumnarLabels.from_dict({"a": np.ones((2, 6)), "b": np.ones((1, 6))})
+    >>> labels["b"].shape
+    (1, 6)
+    >>> labels.select(labels.boxes[:, 0] > 0).n_boxes
+    3
+    """
+
+    def __init__(
+        self,
+        boxes: npt.NDArray,
+        offsets: npt.NDArray,
+        image_ids: Sequence[Hashable],
+    ):
+        """
+        Parameters
+        ----------
+        boxes: npt.NDArray
+            Array of shape `(n_boxes, n_columns)` with the labels of all images.
+        offsets: npt.NDArray
+            Array of shape `(n_images + 1,)` with the start row of each image in
+            `boxes`, followed by the total number of rows.
+        image_ids: Sequence[Hashable]
+            Image ids, in the same order as `offsets`.
+        """
+        if len(offsets) != len(image_ids) + 1:
+            raise ValueError(
+                f"Expected {len(image_ids) + 1} offsets for {len(image_ids)} images, "
+                f"got {len(offsets)}."
+            )
+        if offsets[-1] != len(boxes):
+            raise ValueError(
+                f"Last offset ({offsets[-1]}) does not match number of boxes "
+                f"({len(boxes)})."
+            )
+        self.boxes = boxes
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.image_ids: List[Hashable] = list(image_ids)
+        self._positions: Dict[Hashable, int] = {
+            image_id: i for i, image_id in enumerate(self.image_ids)
+        }
+
+    @classmethod
+    def from_arrays(
+        cls,
+        image_ids: Sequence[Hashable],
+        arrays: Sequence[npt.NDArray],
+        n_columns: int = None,
+    ) -> "ColumnarLabels":
+        """
+        Pack a sequence of per-image label arrays into one contiguous array.
+
+        Parameters
+        ----------
+        image_ids: Sequence[Hashable]
+            Image ids, one for each array.
+        arrays: Sequence[npt.NDArray]
+            Label arrays of shape `(n_detections, n_columns)`.
+        n_columns: int = None
+            Number of columns, only needed when `arrays` is empty.
+
+        Returns
+        -------
+        ColumnarLabels instance.
+
+        Raises
+        ------
+        ValueError
+            If the arrays do not all have the same number of columns.
+        """
+        widths = {array.shape[1] for array in arrays}
+        if len(widths) > 1:
+            raise ValueError(
+                "Columnar storage requires all label arrays to have the same number "
+                f"of columns, found {sorted(widths)}."
+            )
+        if widths:
+            n_columns = widths.pop()
+        elif n_columns is None:
+            n_columns = 6
+
+        counts = np.fromiter((len(array) for array in arrays), dtype=np.int64)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        boxes = np.empty((offsets[-1], n_columns), dtype=np.float32)
+        for i, array in enumerate(arrays):
+            boxes[offsets[i] : offsets[i + 1]] = array
+
+        return cls(boxes, offsets, image_ids)
+
+    @classmethod
+    def from_dict(cls, labels: Dict[Hashable, npt.NDArray]) -> "ColumnarLabels":
+        """
+        Pack a dict of per-image label arrays into one contiguous array.
+        """
+        return cls.from_arrays(list(labels.keys()), list(labels.values()))
+
+    @property
+    def n_boxes(self) -> int:
+        return len(self.boxes)
+
+    @property
+    def counts(self) -> npt.NDArray:
+        """Number of boxes per image."""
+        return np.diff(self.offsets)
+
+    @property
+    def image_index(self) -> npt.NDArray:
+        """Index (into `image_ids`) of the image each box belongs to."""
+        return np.repeat(np.arange(len(self.image_ids)), self.counts)
+
+    def __getitem__(self, image_id: Hashable) -> npt.NDArray:
+        position = self._positions[image_id]
+        return self.boxes[self.offsets[position] : self.offsets[position + 1]]
+
+    def __contains__(self, image_id: object) -> bool:
+        return image_id in self._positions
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.image_ids)
+
+    def __len__(self) -> int:
+        return len(self.image_ids)
+
+    def select(self, mask: npt.NDArray) -> "ColumnarLabels":
+        """
+        Keep only the boxes for which `mask` is True.
+
+        All images are kept, also the ones that end up without boxes, which matches
+        the behaviour of the per-image filters in `YoloLabelsDataset`.
+
+        Parameters
+        ----------
+        mask: npt.NDArray
+            Boolean array of shape `(n_boxes,)`.
+
+        Returns
+        -------
+        New ColumnarLabels instance with the selected boxes.
+        """
+        kept_before = np.zeros(len(mask) + 1, dtype=np.int64)
+        np.cumsum(mask, out=kept_before[1:])
+        return ColumnarLabels(
+            self.boxes[mask], kept_before[self.offsets], self.image_ids
+        )
+
+    def as_dict(self) -> Dict[Hashable, npt.NDArray]:
+        """
+        Return a dict of per-image views into the contiguous array.
+        """
+        return {image_id: self[image_id] for image_id in self.image_ids}
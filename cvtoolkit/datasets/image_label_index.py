@@ -0,0 +1,255 @@
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cvtoolkit.datasets.label_loader import image_id_from_label_file
+from cvtoolkit.helpers.file_helpers import DirectoryIndex, iter_image_paths
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+
+def image_stem(path: str) -> str:
+    """
+    Return the image id of an image or label file, as `YoloLabelsDataset` derives
+    it from the label file with `image_id_from_label_file`: `x.jpg.txt`, `x.txt`
+    and `x.jpg` all have stem `x`.
+    """
+    return image_id_from_label_file(os.path.basename(path))
+
+
+def _list_label_files(label_folder: str) -> List[str]:
+    # The same files as YoloLabelsDataset.get_txt_files, i.e. glob("*.txt").
+    try:
+        with os.scandir(label_folder) as entries:
+            return [
+                entry.name
+                for entry in entries
+                if entry.name.endswith(".txt") and not entry.name.startswith(".")
+            ]
+    except FileNotFoundError:
+        return []
+
+
+@dataclass
+class PairingReport:
+    """Counts of an ImageLabelIndex."""
+
+    n_images: int
+    n_labels: int
+    n_pairs: int
+    n_images_without_labels: int
+    n_labels_without_images: int
+    n_ambiguous_stems: int
+
+    def __str__(self):
+        return (
+            f"{self.n_pairs} image-label pairs of {self.n_images} images and "
+            f"{self.n_labels} labels: {self.n_images_without_labels} images "
+            f"without labels, {self.n_labels_without_images} labels without "
+            f"images, {self.n_ambiguous_stems} stems with more than one image"
+        )
+
+
+class ImageLabelIndex:
+    """
+    Pairs the images in a directory tree, as found by `iter_image_paths`, with the
+    YOLO label files in a label folder, as found by
+    `YoloLabelsDataset.get_txt_files`, by stem: `day_1/TMX_01.jpg` is paired with
+    `TMX_01.txt`. Both sides are indexed by stem, so pairing is one pass over the
+    images.
+
+    Images without labels, labels without images, and stems of more than one
+    image (in different subfolders), which cannot be paired unambiguously, are
+    reported separately.
+
+    With a `cache_path` the folder listings are saved, and `refresh` only lists
+    again the directories whose mtime changed. Known changes can also be applied
+    directly with `add_images`, `remove_images`, `add_labels` and
+    `remove_labels`.
+
+    Example
+    -------
+    index = ImageLabelIndex("images/", "labels/", cache_path="pairs.json")
+    for image_path, label_path in index.pairs():
+        ...
+    """
+
+    def __init__(
+        self,
+        image_folder: str,
+        label_folder: str,
+        cache_path: Optional[str] = None,
+        num_workers: int = 0,
+    ):
+        """
+        Parameters
+        ----------
+        image_folder: str
+            Root of the directory tree with images.
+        label_folder: str
+            Folder with YOLO label files.
+        cache_path: Optional[str] = None
+            Path of the JSON file the index is saved to. The index of the image
+            directories is kept next to it, in `<cache_path>.images`.
+        num_workers: int = 0
+            Number of threads that walk the image folder, see `iter_image_paths`.
+        """
+        self.image_folder = image_folder
+        self.label_folder = label_folder
+        self.cache_path = cache_path
+        self.num_workers = num_workers
+        self._images: Dict[str, List[str]] = {}
+        self._labels: Dict[str, str] = {}
+        self._label_folder_mtime_ns: Optional[int] = None
+        if cache_path:
+            self._load()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Scan both folders again. With a cache, only directories whose mtime
+        changed are listed, and the cache is updated.
+        """
+        start = time.perf_counter()
+        self._images = {}
+        self.add_images(
+            iter_image_paths(
+                self.image_folder,
+                num_workers=self.num_workers,
+                index_path=f"{self.cache_path}.images" if self.cache_path else None,
+            )
+        )
+
+        try:
+            mtime_ns = os.stat(self.label_folder).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        if mtime_ns is None or mtime_ns != self._label_folder_mtime_ns:
+            self._labels = {}
+            self.add_labels(_list_label_files(self.label_folder))
+            # As in DirectoryIndex, a recently modified folder is listed again.
+            racy_after_ns = time.time_ns() - int(DirectoryIndex.racy_seconds * 1e9)
+            self._label_folder_mtime_ns = (
+                mtime_ns if mtime_ns is not None and mtime_ns < racy_after_ns else None
+            )
+
+        if self.cache_path:
+            self.save()
+        logger.info(f"{self.report()} in {time.perf_counter() - start:.2f}s.")
+
+    def add_images(self, image_paths: Iterable[str]) -> None:
+        for image_path in image_paths:
+            paths = self._images.setdefault(image_stem(image_path), [])
+            if image_path not in paths:
+                paths.append(image_path)
+
+    def remove_images(self, image_paths: Iterable[str]) -> None:
+        for image_path in image_paths:
+            stem = image_stem(image_path)
+            paths = self._images.get(stem, [])
+            if image_path in paths:
+                paths.remove(image_path)
+                if not paths:
+                    del self._images[stem]
+
+    def add_labels(self, label_files: Iterable[str]) -> None:
+        """Add label files, given by name or path, of the label folder."""
+        for label_file in label_files:
+            name = os.path.basename(label_file)
+            self._labels[image_stem(name)] = name
+
+    def remove_labels(self, label_files: Iterable[str]) -> None:
+        for label_file in label_files:
+            self._labels.pop(image_stem(label_file), None)
+
+    def _label_path(self, stem: str) -> str:
+        return os.path.join(self.label_folder, self._labels[stem])
+
+    def pairs(self) -> List[Tuple[str, str]]:
+        """Return the (image path, label path) of every unambiguous pair."""
+        return [
+            (paths[0], self._label_path(stem))
+            for stem, paths in self._images.items()
+            if len(paths) == 1 and stem in self._labels
+        ]
+
+    def label_path(self, image_path: str) -> Optional[str]:
+        """Return the path of the label file of an image, if it has one."""
+        stem = image_stem(image_path)
+        return self._label_path(stem) if stem in self._labels else None
+
+    def images_without_labels(self) -> List[str]:
+        return [
+            path
+            for stem, paths in self._images.items()
+            if stem not in self._labels
+            for path in paths
+        ]
+
+    def labels_without_images(self) -> List[str]:
+        return [
+            self._label_path(stem) for stem in self._labels if stem not in self._images
+        ]
+
+    def ambiguous_stems(self) -> Dict[str, List[str]]:
+        """Return the image paths of stems with more than one image."""
+        return {stem: paths for stem, paths in self._images.items() if len(paths) > 1}
+
+    def report(self) -> PairingReport:
+        n_without_labels = n_pairs = n_ambiguous = 0
+        for stem, paths in self._images.items():
+            if stem not in self._labels:
+                n_without_labels += len(paths)
+            elif len(paths) == 1:
+                n_pairs += 1
+            if len(paths) > 1:
+                n_ambiguous += 1
+        return PairingReport(
+            n_images=sum(len(paths) for paths in self._images.values()),
+            n_labels=len(self._labels),
+            n_pairs=n_pairs,
+            n_images_without_labels=n_without_labels,
+            n_labels_without_images=sum(
+                stem not in self._images for stem in self._labels
+            ),
+            n_ambiguous_stems=n_ambiguous,
+        )
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Save the label listing to `path`, by default the cache path."""
+        path = path or self.cache_path
+        if path is None:
+            raise ValueError("No path to save the index to.")
+        index = {
+            "version": INDEX_VERSION,
+            "image_folder": self.image_folder,
+            "label_folder": self.label_folder,
+            "label_folder_mtime_ns": self._label_folder_mtime_ns,
+            "label_files": list(self._labels.values()),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                index = json.load(f)
+            if index["version"] != INDEX_VERSION:
+                raise ValueError(f"unsupported version {index['version']}")
+            folders = (index["image_folder"], index["label_folder"])
+            if folders != (self.image_folder, self.label_folder):
+                raise ValueError(f"index of {folders}")
+            self.add_labels(index["label_files"])
+            self._label_folder_mtime_ns = index["label_folder_mtime_ns"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring image-label index {self.cache_path}: {e}")
@@ -0,0 +1,307 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
+
+from cvtoolkit.datasets.columnar_labels import ColumnarLabels
+from cvtoolkit.datasets.label_loader import (
+    LoadStatistics,
+    image_id_from_label_file,
+    load_label_files,
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAGIC = b"CVTLBLC1"
+CACHE_VERSION = 1
+CACHE_EXTENSION = ".labelcache"
+_ALIGNMENT = 64
+
+
+def _align(n_bytes: int) -> int:
+    return -(-n_bytes // _ALIGNMENT) * _ALIGNMENT
+
+
+@dataclass
+class LabelFolderManifest:
+    """Names, sizes and modification times of the label files in a folder."""
+
+    names: npt.NDArray
+    sizes: npt.NDArray
+    mtimes: npt.NDArray
+
+    @classmethod
+    def scan(cls, folder_path: str) -> "LabelFolderManifest":
+        """
+        List the `.txt` files in a folder (the same files `glob("*.txt")` finds),
+        sorted by name. Only file metadata is read, not the content.
+        """
+        entries = []
+        with os.scandir(folder_path) as it:
+            for entry in it:
+                if entry.name.endswith(".txt") and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    entries.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        entries.sort()
+        return cls(
+            names=np.array([name.encode() for name, _, _ in entries], dtype=bytes),
+            sizes=np.array([size for _, size, _ in entries], dtype=np.int64),
+            mtimes=np.array([mtime for _, _, mtime in entries], dtype=np.int64),
+        )
+
+    @property
+    def label_files(self) -> List[str]:
+        return [name.decode() for name in self.names]
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, LabelFolderManifest)
+            and np.array_equal(self.names, other.names)
+            and np.array_equal(self.sizes, other.sizes)
+            and np.array_equal(self.mtimes, other.mtimes)
+        )
+
+
+class LabelCache:
+    """
+    Persistent, memory-mappable cache of a folder of YOLO label files.
+
+    The cache is a single binary file with a small JSON header followed by the
+    raw arrays: all boxes as one `(n_boxes, n_columns)` float32 array, the row
+    offsets and image ids of the (non-empty) label files, and a manifest with the
+    name, size and modification time of every label file. When loading, the
+    manifest is compared to the folder and only new or modified files are parsed.
+    On a warm start the boxes are memory-mapped, so label bytes are only read
+    from disk when they are accessed.
+
+    Folders whose label files do not all have the same number of columns are not
+    cached, and neither are folders whose cache file cannot be written, e.g. on a
+    read-only mount. Their labels are still returned.
+
+    Examples
+    --------
+    >>> cache = LabelCache(LabelCache.default_path("labels/"))
+    >>> label_files, labels, _ = cache.load("labels/")
+    """
+
+    def __init__(self, cache_path: str):
+        """
+        Parameters
+        ----------
+        cache_path: str
+            Path of the cache file.
+        """
+        self.cache_path = cache_path
+
+    @staticmethod
+    def default_path(folder_path: str, cache_dir: Optional[str] = None) -> str:
+        """
+        Return the default cache path for a label folder: next to the folder, or,
+        if `cache_dir` is given, in that directory with a name that is unique for
+        the folder.
+        """
+        folder_path = os.path.normpath(folder_path)
+        if cache_dir is None:
+            return folder_path + CACHE_EXTENSION
+        folder_hash = hashlib.sha256(os.path.abspath(folder_path).encode()).hexdigest()[
+            :12
+        ]
+        return os.path.join(
+            cache_dir,
+            f"{os.path.basename(folder_path)}-{folder_hash}{CACHE_EXTENSION}",
+        )
+
+    def load(
+        self,
+        folder_path: str,
+        num_workers: int = 0,
+        executor: str = "thread",
+    ) -> Tuple[
+        List[str],
+        Union[ColumnarLabels, Dict[Hashable, npt.NDArray]],
+        LoadStatistics,
+    ]:
+        """
+        Load the labels of a folder from the cache, (re)building it if needed.
+
+        Parameters
+        ----------
+        folder_path: str
+            Folder with the label files.
+        num_workers: int = 0
+            Number of workers used to parse new or modified label files.
+        executor: str = "thread"
+            Type of worker pool, see `load_label_files`.
+
+        Returns
+        -------
+        Tuple with the names of all label files, the labels and the statistics of
+        the label files that had to be parsed. The labels are a ColumnarLabels, or
+        a dict of per-image arrays if the files differ in number of columns.
+        """
+        manifest = LabelFolderManifest.scan(folder_path)
+        cached = self._read()
+        if cached is not None and cached[0] == manifest:
+            logger.info(f"Loaded labels of {folder_path} from {self.cache_path}.")
+            return manifest.label_files, cached[1], LoadStatistics()
+
+        labels, statistics = self._build(
+            folder_path, manifest, cached, num_workers, executor
+        )
+        if isinstance(labels, ColumnarLabels):
+            try:
+                self._write(manifest, labels)
+            except OSError as e:
+                logger.warning(f"Could not write label cache {self.cache_path}: {e}")
+        return manifest.label_files, labels, statistics
+
+    def _build(
+        self,
+        folder_path: str,
+        manifest: LabelFolderManifest,
+        cached: Optional[Tuple[LabelFolderManifest, ColumnarLabels]],
+        num_workers: int,
+        executor: str,
+    ) -> Tuple[Union[ColumnarLabels, Dict[Hashable, npt.NDArray]], LoadStatistics]:
+        """
+        Collect the labels of all files in the manifest, reusing the cached labels
+        of files whose size and modification time did not change. If the files
+        differ in number of columns, the labels are returned as a dict instead.
+        """
+        reusable: Dict[bytes, Tuple[int, int]] = {}
+        cached_labels: Optional[ColumnarLabels] = None
+        if cached is not None:
+            cached_manifest, cached_labels = cached
+            for name, size, mtime in zip(
+                cached_manifest.names, cached_manifest.sizes, cached_manifest.mtimes
+            ):
+                reusable[bytes(name)] = (int(size), int(mtime))
+
+        to_parse = [
+            name.decode()
+            for name, size, mtime in zip(
+                manifest.names, manifest.sizes, manifest.mtimes
+            )
+            if reusable.get(bytes(name)) != (int(size), int(mtime))
+        ]
+        parsed_ids, parsed_arrays, statistics = load_label_files(
+            folder_path, to_parse, num_workers=num_workers, executor=executor
+        )
+        parsed = dict(zip(parsed_ids, parsed_arrays))
+        to_parse_set = set(to_parse)
+
+        image_ids, arrays = [], []
+        for file in manifest.label_files:
+            image_id = image_id_from_label_file(file)
+            if file in to_parse_set:
+                if image_id in parsed:
+                    image_ids.append(image_id)
+                    arrays.append(parsed[image_id])
+            elif cached_labels is not None and image_id in cached_labels:
+                image_ids.append(image_id)
+                arrays.append(cached_labels[image_id])
+
+        widths = {array.shape[1] for array in arrays}
+        if len(widths) > 1:
+            logger.warning(
+                f"Not caching the labels of {folder_path}: the label files have "
+                f"different numbers of columns {sorted(widths)}."
+            )
+            return dict(zip(image_ids, arrays)), statistics
+
+        logger.info(
+            f"Rebuilt label cache {self.cache_path}: parsed {len(to_parse)} of "
+            f"{len(manifest.names)} files."
+        )
+        return ColumnarLabels.from_arrays(image_ids, arrays), statistics
+
+    def _write(self, manifest: LabelFolderManifest, labels: ColumnarLabels):
+        arrays: Dict[str, npt.NDArray] = {
+            "boxes": np.ascontiguousarray(labels.boxes, dtype=np.float32),
+            "offsets": labels.offsets,
+            "image_ids": np.array(
+                [str(image_id).encode() for image_id in labels.image_ids], dtype=bytes
+            ),
+            "names": manifest.names,
+            "sizes": manifest.sizes,
+            "mtimes": manifest.mtimes,
+        }
+        header: Dict = {"version": CACHE_VERSION, "arrays": {}}
+        position = 0
+        for name, array in arrays.items():
+            header["arrays"][name] = {
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+                "offset": position,
+            }
+            position += _align(array.nbytes)
+        header_bytes = json.dumps(header).encode()
+        data_start = _align(len(CACHE_MAGIC) + 8 + len(header_bytes))
+
+        cache_dir = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(CACHE_MAGIC)
+                f.write(struct.pack("<Q", len(header_bytes)))
+                f.write(header_bytes)
+                for name, array in arrays.items():
+                    f.seek(data_start + header["arrays"][name]["offset"])
+                    f.write(array.tobytes())
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read(self) -> Optional[Tuple[LabelFolderManifest, ColumnarLabels]]:
+        """
+        Memory-map the cache file, or return None if it does not exist or cannot
+        be used.
+        """
+        if not os.path.isfile(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "rb") as f:
+                if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                    raise ValueError("not a label cache file")
+                (header_length,) = struct.unpack("<Q", f.read(8))
+                header = json.loads(f.read(header_length))
+            if header["version"] != CACHE_VERSION:
+                raise ValueError(f"unsupported version {header['version']}")
+            data_start = _align(len(CACHE_MAGIC) + 8 + header_length)
+
+            arrays = {}
+            for name, info in header["arrays"].items():
+                shape = tuple(info["shape"])
+                if int(np.prod(shape)) == 0:
+                    arrays[name] = np.empty(shape, dtype=info["dtype"])
+                else:
+                    arrays[name] = np.memmap(
+                        self.cache_path,
+                        dtype=info["dtype"],
+                        mode="r",
+                        offset=data_start + info["offset"],
+                        shape=shape,
+                    )
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring label cache {self.cache_path}: {e}")
+            return None
+
+        manifest = LabelFolderManifest(
+            names=arrays["names"], sizes=arrays["sizes"], mtimes=arrays["mtimes"]
+        )
+        labels = ColumnarLabels(
+            arrays["boxes"],
+            arrays["offsets"],
+            [image_id.decode() for image_id in arrays["image_ids"]],
+        )
+        return manifest, labels
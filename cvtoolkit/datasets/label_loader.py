@@ -0,0 +1,182 @@
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+logger = logging.getLogger(__name__)
+
+EXECUTORS = ("thread", "process")
+
+
+@dataclass
+class LoadStatistics:
+    """Throughput of loading a folder of label files."""
+
+    n_files: int = 0
+    n_bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.n_files / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.n_bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.n_files} files ({self.n_bytes / 1e6:.1f} MB) in "
+            f"{self.seconds:.2f}s: {self.files_per_second:.0f} files/s, "
+            f"{self.bytes_per_second / 1e6:.1f} MB/s"
+        )
+
+
+def image_id_from_label_file(file: str) -> str:
+    """
+    Return the image id of a label file, i.e. its name without extension.
+    """
+    return Path(os.path.splitext(file)[0]).stem
+
+
+def _line_widths(data: bytes) -> npt.NDArray:
+    """Return the number of values on every non-blank line of `data`."""
+    chars = np.frombuffer(data, dtype=np.uint8)
+    newline = (chars == ord("\n")) | (chars == ord("\r"))
+    separator = newline | np.isin(chars, np.frombuffer(b" \t\x0b\x0c", np.uint8))
+    starts = ~separator
+    starts[1:] &= separator[:-1]
+    widths = np.bincount(np.cumsum(newline)[starts])
+    return widths[widths > 0]
+
+
+def _parse_lines(text: str) -> npt.NDArray:
+    rows = [line.split() for line in text.splitlines() if line.strip()]
+    if len({len(row) for row in rows}) > 1:
+        raise ValueError(
+            "Label file does not have the same number of values on every line."
+        )
+    return np.array(rows, dtype="f").reshape(len(rows), len(rows[0]) if rows else 0)
+
+
+def parse_labels(data: bytes) -> npt.NDArray:
+    """
+    Parse the content of a YOLO label file into an array of shape
+    `(n_lines, n_columns)`. Blank lines are ignored.
+
+    All numbers are converted in one call instead of splitting line by line, and
+    the number of values per line is counted on the raw bytes. Files that this
+    fast path cannot handle are parsed line by line.
+
+    Parameters
+    ----------
+    data: bytes
+        Content of the label file.
+
+    Returns
+    -------
+    Array of dtype float32.
+
+    Raises
+    ------
+    ValueError
+        If the lines do not all have the same number of values.
+    """
+    text = data.decode()
+    widths = _line_widths(data)
+    values = text.split()
+    if len(widths) and (widths == widths[0]).all() and widths.sum() == len(values):
+        return np.array(values, dtype="f").reshape(len(widths), widths[0])
+    return _parse_lines(text)
+
+
+def read_label_file(file_path: str) -> Tuple[int, Optional[npt.NDArray]]:
+    """
+    Read and parse a single label file.
+
+    Returns
+    -------
+    Tuple with the size of the file in bytes and the parsed labels, or None if
+    the file has no labels.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if not data:
+        return 0, None
+    try:
+        labels = parse_labels(data)
+    except ValueError as e:
+        raise ValueError(f"Could not parse {file_path}: {e}") from e
+    return len(data), labels if len(labels) else None
+
+
+def _create_executor(executor: str, num_workers: int) -> Executor:
+    if executor == "thread":
+        return ThreadPoolExecutor(max_workers=num_workers)
+    elif executor == "process":
+        return ProcessPoolExecutor(max_workers=num_workers)
+    raise ValueError(f"Unknown executor '{executor}', expected one of {EXECUTORS}.")
+
+
+def load_label_files(
+    folder_path: str,
+    label_files: Sequence[str],
+    num_workers: int = 0,
+    executor: str = "thread",
+) -> Tuple[List[str], List[npt.NDArray], LoadStatistics]:
+    """
+    Read and parse a list of YOLO label files.
+
+    Parameters
+    ----------
+    folder_path: str
+        Folder that contains the label files.
+    label_files: Sequence[str]
+        Names of the label files.
+    num_workers: int = 0
+        Number of workers. With 0 files are read one after another in the calling
+        thread.
+    executor: str = "thread"
+        "thread" to read files with a thread pool, which works best when reading is
+        I/O bound (e.g. on mounted blob storage), or "process" to also parse them
+        in parallel in a process pool.
+
+    Returns
+    -------
+    Tuple with the image ids and labels of all non-empty files, in the order of
+    `label_files`, and the load statistics.
+    """
+    file_paths = [f"{folder_path}/{file}" for file in label_files]
+    start = time.perf_counter()
+
+    results: Iterator[Tuple[int, Optional[npt.NDArray]]]
+    if num_workers > 0:
+        pool = _create_executor(executor, num_workers)
+        chunksize = max(1, min(256, len(file_paths) // (num_workers * 4)))
+        results = pool.map(read_label_file, file_paths, chunksize=chunksize)
+    else:
+        pool = None
+        results = map(read_label_file, file_paths)
+
+    image_ids, labels = [], []
+    statistics = LoadStatistics()
+    try:
+        for file, (n_bytes, bboxes) in zip(label_files, results):
+            statistics.n_files += 1
+            statistics.n_bytes += n_bytes
+            if bboxes is not None:
+                image_ids.append(image_id_from_label_file(file))
+                labels.append(bboxes)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    statistics.seconds = time.perf_counter() - start
+    logger.info(f"Loaded labels from {folder_path}: {statistics}")
+    return image_ids, labels, statistics
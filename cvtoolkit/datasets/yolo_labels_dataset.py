@@ -1,22 +1,79 @@
 import glob
-import json
 import logging
 import os
-from pathlib import Path
-from typing import Dict, Iterable, Tuple, Union
+from array import array
+from collections import OrderedDict
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 import numpy.typing as npt
 
+from cvtoolkit.datasets.columnar_labels import ColumnarLabels
+from cvtoolkit.datasets.label_cache import LabelCache
+from cvtoolkit.datasets.label_loader import (
+    EXECUTORS,
+    LoadStatistics,
+    load_label_files,
+)
+from cvtoolkit.helpers.bbox_helpers import normalize_boxes, xywh_to_cxcywh
+from cvtoolkit.helpers.json_helpers import JsonContentError, iter_json_array
+from cvtoolkit.telemetry.telemetry import get_telemetry
+
 logger = logging.getLogger(__name__)
 
+STORAGE_BACKENDS = ("dict", "columnar")
+
+Labels = Union[Dict[Hashable, npt.NDArray], ColumnarLabels]
+MaskFunction = Callable[[npt.NDArray], npt.NDArray]
+
+
+def _class_mask(bboxes: npt.NDArray, class_to_keep: Union[int, Iterable[int]]):
+    classes = (
+        list(class_to_keep) if isinstance(class_to_keep, Iterable) else [class_to_keep]
+    )
+    return np.isin(bboxes[:, 0], classes)
+
+
+def _size_mask(bboxes: npt.NDArray, interval: Tuple[int, int], img_area: int):
+    product = bboxes[:, 3] * bboxes[:, 4] * img_area
+    return (product > interval[0]) & (product <= interval[1])
+
+
+def _conf_mask(bboxes: npt.NDArray, conf: float):
+    # Confidence scores are the sixth column, if there are less we don't
+    # have conf scores so we don't filter.
+    if bboxes.shape[1] < 6:
+        return np.ones(len(bboxes), dtype=bool)
+    return bboxes[:, 5] >= conf
+
 
 class YoloLabelsDataset:
+    # Number of filter combinations (and, for columnar storage, single filter
+    # masks) for which the result is kept in memory. With dict storage every
+    # result is a copy of the labels as one array per image, so fewer are kept.
+    filter_cache_size: int = 32
+    dict_filter_cache_size: int = 2
+
     def __init__(
         self,
         folder_path: str,
         image_area: int,
         confidence_threshold: float = 0.0,
+        storage: str = "dict",
+        num_workers: int = 0,
+        executor: str = "thread",
+        cache: Union[bool, str] = False,
     ):
         """
         Create a YoloLabelsDataset from a folder of YOLO annotation files in
@@ -30,12 +87,46 @@ class YoloLabelsDataset:
             Total area of the image (as `width*height`).
         confidence_threshold: float = 0.0
             Minimum confidence score to filter annotations by
+        storage: str = "dict"
+            How labels are stored in memory. "dict" keeps one array per image,
+            "columnar" keeps all boxes in one contiguous array (see
+            `ColumnarLabels`) so filters run as one vectorized operation over the
+            whole dataset. Columnar storage requires all label files to have the
+            same number of columns.
+        num_workers: int = 0
+            Number of workers used to read the label files. With 0 the files are
+            read sequentially.
+        executor: str = "thread"
+            Type of worker pool: "thread" for I/O bound reading (e.g. from mounted
+            blob storage) or "process" to also parallelize parsing.
+        cache: Union[bool, str] = False
+            Keep a binary cache of the labels (see `LabelCache`). If True the cache
+            is stored next to `folder_path`, if a string it is stored in that
+            directory. Only new or modified label files are parsed, and labels in
+            the cache are memory-mapped instead of read into memory. The label
+            files are sorted by name when using a cache.
         """
+        if executor not in EXECUTORS:
+            raise ValueError(
+                f"Unknown executor '{executor}', expected one of {EXECUTORS}."
+            )
         self.folder_path = folder_path
-        self.label_files = self.get_txt_files()
+        self.cache_path: Optional[str] = None
+        if cache:
+            self.cache_path = LabelCache.default_path(
+                folder_path, cache_dir=None if cache is True else str(cache)
+            )
+        # With a cache, the label files are listed when validating the cache.
+        self.label_files = [] if self.cache_path else self.get_txt_files()
         self.image_area = image_area
-        self._labels: Dict[str, npt.NDArray] = {}
-        self._filtered_labels: Dict[str, npt.NDArray] = {}
+        self.storage = self._validate_storage(storage)
+        self.num_workers = num_workers
+        self.executor = executor
+        self.load_statistics = LoadStatistics()
+        self._labels: Labels = {}
+        self._filters: List[Tuple[Hashable, MaskFunction]] = []
+        self._filter_cache: OrderedDict[FrozenSet[Hashable], Labels] = OrderedDict()
+        self._mask_cache: OrderedDict[Hashable, npt.NDArray] = OrderedDict()
         self._prepare_labels(confidence_threshold)
 
     @classmethod
@@ -44,12 +135,16 @@ class YoloLabelsDataset:
         yolo_val_json: str,
         image_shape: Tuple[int, int],
         confidence_threshold: float = 0.0,
+        storage: str = "dict",
     ):
         """
         Create a YoloLabelsDataset from a COCO JSON file (see e.g.
         https://roboflow.com/formats/coco-json). This method can also be used to
         load the JSON file that is generated by the YoloV8 validation mode.
 
+        The file is parsed incrementally, so memory use is bounded by the number of
+        annotations rather than the size of the JSON file.
+
         Parameters
         ----------
         yolo_val_json: str
@@ -58,6 +153,8 @@ class YoloLabelsDataset:
             Shape of the images as (width, height) tuple.
         confidence_threshold: float = 0.0
            Minimum confidence score to filter annotations by
+        storage: str = "dict"
+            How labels are stored in memory, either "dict" or "columnar".
 
         Returns
         -------
@@ -66,51 +163,107 @@ class YoloLabelsDataset:
         dataset = cls.__new__(cls)
         super(YoloLabelsDataset, dataset).__init__()
         dataset.image_area = image_shape[0] * image_shape[1]
-        dataset._labels = {}
-
-        with open(yolo_val_json) as file:
-            json_content = json.load(file)
-            if isinstance(json_content, dict):
-                annotation_list = json_content["annotations"]
-            elif isinstance(json_content, list):
-                annotation_list = json_content
-            else:
-                logger.error("Unknown json content, aborting.")
-                return None
-
-        for annotation in annotation_list:
-            if ("score" in annotation.keys()) and (
-                annotation["score"] < confidence_threshold
-            ):
-                # If a confidence score exists and it is below the threshold, we
-                # skip this annotation
-                continue
-
-            xmin, ymin, width, height = annotation["bbox"]
-            xc = xmin + width / 2
-            yc = ymin + height / 2
-            yolo_box = [
-                annotation["category_id"],
-                xc / image_shape[0],
-                yc / image_shape[1],
-                width / image_shape[0],
-                height / image_shape[1],
-            ]
-            if "score" in annotation.keys():
-                yolo_box.append(annotation["score"])
-
-            if annotation["image_id"] in dataset._labels.keys():
-                dataset._labels[annotation["image_id"]] = np.vstack(
-                    [dataset._labels[annotation["image_id"]], yolo_box], dtype="f"
+        dataset.storage = cls._validate_storage(storage)
+        # Annotations are streamed from the file and appended to flat buffers, the
+        # per-image arrays are only built at the end.
+        image_positions: Dict[Hashable, int] = {}
+        image_index = array("q")
+        values = array("d")
+        has_score = array("b")
+
+        try:
+            for annotation in iter_json_array(yolo_val_json, key="annotations"):
+                score = annotation.get("score", np.nan)
+                if "score" in annotation and score < confidence_threshold:
+                    # If a confidence score exists and it is below the threshold, we
+                    # skip this annotation
+                    continue
+                image_index.append(
+                    image_positions.setdefault(
+                        annotation["image_id"], len(image_positions)
+                    )
                 )
-            else:
-                dataset._labels[annotation["image_id"]] = np.array(
-                    [yolo_box], dtype="f"
+                xmin, ymin, width, height = annotation["bbox"]
+                values.extend(
+                    (annotation["category_id"], xmin, ymin, width, height, score)
                 )
-
-        dataset._filtered_labels = dataset._labels.copy()
+                has_score.append("score" in annotation)
+        except JsonContentError:
+            logger.error("Unknown json content, aborting.")
+            return None
+
+        dataset._set_labels(
+            cls._group_by_image(
+                np.frombuffer(values, dtype=np.float64).reshape(-1, 6),
+                np.frombuffer(image_index, dtype=np.int64),
+                np.frombuffer(has_score, dtype=bool),
+                list(image_positions),
+                image_shape,
+            )
+        )
         return dataset
 
+    @staticmethod
+    def _group_by_image(
+        values: npt.NDArray,
+        image_index: npt.NDArray,
+        has_score: npt.NDArray,
+        image_ids: List[Hashable],
+        image_shape: Tuple[int, int],
+    ) -> Labels:
+        """
+        Convert COCO annotations, given as rows of `(category_id, xmin, ymin, width,
+        height, score)`, to YOLO labels grouped by image.
+
+        Parameters
+        ----------
+        values: npt.NDArray
+            Array of shape `(n_annotations, 6)`.
+        image_index: npt.NDArray
+            Index in `image_ids` of the image of each annotation.
+        has_score: npt.NDArray
+            Whether each annotation has a confidence score.
+        image_ids: List[Hashable]
+            Image ids in order of first appearance.
+        image_shape: Tuple[int, int]
+            Shape of the images as (width, height) tuple.
+
+        Returns
+        -------
+        ColumnarLabels with the rows of each image in their original order.
+        """
+        order = np.argsort(image_index, kind="stable")
+        values = values[order]
+        has_score = has_score[order]
+
+        boxes = np.empty(values.shape, dtype=np.float32)
+        boxes[:, 0] = values[:, 0]
+        boxes[:, 1:5] = normalize_boxes(xywh_to_cxcywh(values[:, 1:5]), image_shape)
+        boxes[:, 5] = values[:, 5]
+
+        offsets = np.zeros(len(image_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(image_index, minlength=len(image_ids)), out=offsets[1:])
+
+        if has_score.all():
+            return ColumnarLabels(boxes, offsets, image_ids)
+        if not has_score.any():
+            return ColumnarLabels(boxes[:, :5], offsets, image_ids)
+        # Only keep the score column for images where all annotations have one.
+        return {
+            image_id: (
+                boxes[start:end] if has_score[start:end].all() else boxes[start:end, :5]
+            )
+            for image_id, start, end in zip(image_ids, offsets[:-1], offsets[1:])
+        }
+
+    @staticmethod
+    def _validate_storage(storage: str) -> str:
+        if storage not in STORAGE_BACKENDS:
+            raise ValueError(
+                f"Unknown storage '{storage}', expected one of {STORAGE_BACKENDS}."
+            )
+        return storage
+
     def __len__(self):
         return len(self.label_files)
 
@@ -123,7 +276,8 @@ class YoloLabelsDataset:
 
         Returns
         -------
-
+        Mapping from image id to labels. With columnar storage this is a
+        `ColumnarLabels` whose values are views into one contiguous array.
         """
         return self._labels
 
@@ -132,19 +286,115 @@ class YoloLabelsDataset:
         return [os.path.basename(file) for file in txt_files]
 
     def get_filtered_labels(self):
-        return self._filtered_labels
+        """
+        Get the labels that pass all filters applied since the last
+        `reset_filter()`.
+
+        Filters are only evaluated here, fused into a single boolean mask. The
+        result is cached per combination of filters (regardless of the order in
+        which they were applied), so requesting the same combination again does not
+        recompute anything. The returned mapping is shared with the cache and
+        should not be modified.
+
+        Returns
+        -------
+        Mapping from image id to filtered labels.
+        """
+        signature = frozenset(filter_signature for filter_signature, _ in self._filters)
+        if signature in self._filter_cache:
+            self._filter_cache.move_to_end(signature)
+            return self._filter_cache[signature]
+
+        filtered_labels = self._evaluate_filters()
+        self._filter_cache[signature] = filtered_labels
+        cache_size = (
+            self.filter_cache_size
+            if isinstance(self._labels, ColumnarLabels)
+            else self.dict_filter_cache_size
+        )
+        while len(self._filter_cache) > cache_size:
+            self._filter_cache.popitem(last=False)
+        return filtered_labels
 
     def _filter_bboxes_by_conf(self, bboxes: npt.NDArray, conf: float):
-        # Confidence scores are the sixth column, if there are less we don't
-        # have conf scores so we don't filter.
         if bboxes.shape[1] < 6:
             return bboxes
         else:
-            return bboxes[bboxes[:, 5] >= conf]
+            return bboxes[_conf_mask(bboxes, conf)]
+
+    def _add_filter(self, signature: Hashable, mask_function: MaskFunction):
+        """
+        Add a filter to the lazy filter chain. `mask_function` maps an array of
+        labels to a boolean array that is True for the rows to keep.
+        """
+        self._filters.append((signature, mask_function))
+        return self
+
+    def _get_mask(
+        self,
+        labels: ColumnarLabels,
+        signature: Hashable,
+        mask_function: MaskFunction,
+    ):
+        """
+        Compute (or get from cache) the mask of a single filter over all boxes of
+        the columnar `labels` of this dataset. This way a filter shared by many
+        combinations in a sweep is only evaluated once.
+        """
+        if signature in self._mask_cache:
+            self._mask_cache.move_to_end(signature)
+            return self._mask_cache[signature]
+
+        mask = mask_function(labels.boxes)
+        self._mask_cache[signature] = mask
+        if len(self._mask_cache) > self.filter_cache_size:
+            self._mask_cache.popitem(last=False)
+        return mask
+
+    def _evaluate_filters(self) -> Labels:
+        """
+        Apply all filters in the chain in one go by combining their masks.
+
+        With columnar storage the combined mask is computed over all boxes of the
+        dataset at once, otherwise it is computed per image. In both cases the
+        labels are only copied once, regardless of the number of filters, and not
+        at all without filters.
+        """
+        if isinstance(self._labels, ColumnarLabels):
+            if not self._filters:
+                return self._labels
+            mask = np.ones(self._labels.n_boxes, dtype=bool)
+            for signature, mask_function in self._filters:
+                mask &= self._get_mask(self._labels, signature, mask_function)
+            return self._labels.select(mask)
+
+        if not self._filters:
+            return dict(self._labels)
+        filtered_labels = {}
+        for image_id, labels in self._labels.items():
+            mask = np.ones(len(labels), dtype=bool)
+            for _, mask_function in self._filters:
+                mask &= mask_function(labels)
+            filtered_labels[image_id] = labels[mask]
+        return filtered_labels
+
+    def _set_labels(self, labels: Labels):
+        """
+        Store the loaded labels using the configured storage backend.
+        """
+        if self.storage == "columnar":
+            if not isinstance(labels, ColumnarLabels):
+                labels = ColumnarLabels.from_dict(labels)
+        elif isinstance(labels, ColumnarLabels):
+            labels = labels.as_dict()
+        self._labels = labels
+        self._filter_cache = OrderedDict()
+        self._mask_cache = OrderedDict()
+        self.reset_filter()
 
     def _prepare_labels(self, confidence_threshold: float = 0.0):
         """
-        Loop through the yolo labels and store them in a dict.
+        Read the yolo labels and store them in a dict.
 
         Each key in the dict is an image, each value is a ndarray of shape
         `(n_detections, 6)`, with the 6 columns being in the yolo format, i.e.
@@ -156,25 +406,54 @@ class YoloLabelsDataset:
         confidence_threshold: float = 0.0
             Minimum confidence score to filter annotations by
         """
-        self._labels = {}
-        for file in self.label_files:
-            with open(f"{self.folder_path}/{file}", "r") as f:
-                lines = f.readlines()
-            if len(lines) == 0:
-                continue
-            filename_no_extension = Path(os.path.splitext(file)[0]).stem
-            bboxes = np.array([line.strip().split() for line in lines], dtype="f")
+        telemetry = get_telemetry()
+        with telemetry.timer("label_loading"):
+            self._load_labels(confidence_threshold)
+        telemetry.count("label_loading", "files", self.load_statistics.n_files)
+        telemetry.count("label_loading", "bytes", self.load_statistics.n_bytes)
+
+    def _load_labels(self, confidence_threshold: float):
+        image_ids: Sequence[Hashable]
+        if self.cache_path:
+            self.label_files, cached_labels, self.load_statistics = LabelCache(
+                self.cache_path
+            ).load(
+                self.folder_path, num_workers=self.num_workers, executor=self.executor
+            )
+            if isinstance(cached_labels, ColumnarLabels):
+                if confidence_threshold and cached_labels.boxes.shape[1] >= 6:
+                    cached_labels = cached_labels.select(
+                        _conf_mask(cached_labels.boxes, confidence_threshold)
+                    )
+                self._set_labels(cached_labels)
+                return
+            # The label files differ in number of columns and were not cached.
+            image_ids = list(cached_labels.keys())
+            bboxes_per_image = list(cached_labels.values())
+        else:
+            image_ids, bboxes_per_image, self.load_statistics = load_label_files(
+                self.folder_path,
+                self.label_files,
+                num_workers=self.num_workers,
+                executor=self.executor,
+            )
+
+        labels: Dict[Hashable, npt.NDArray] = {}
+        for image_id, bboxes in zip(image_ids, bboxes_per_image):
             if confidence_threshold:
                 bboxes = self._filter_bboxes_by_conf(bboxes, confidence_threshold)
-            self._labels[filename_no_extension] = bboxes
+            labels[image_id] = bboxes
 
-        self._filtered_labels = self._labels.copy()
+        self._set_labels(labels)
 
     def reset_filter(self):
         """
         Reset all filters and restore dataset to initial state.
+
+        Cached filter results are kept, so a sweep that resets and re-applies the
+        same filters does not recompute them.
         """
-        self._filtered_labels = self._labels.copy()
+        self._filters = []
 
     def filter_by_size(self, size_to_keep: Tuple[int, int]):
         """
@@ -185,21 +464,12 @@ class YoloLabelsDataset:
         size_to_keep: Tuple[int, int]
             Lower and upper bound for size.
         """
-
-        def _keep_labels_with_area_in_interval(bboxes, interval, img_area):
-            product = bboxes[:, 3] * bboxes[:, 4] * img_area
-            selected_rows = bboxes[
-                (product > interval[0]) & (product <= interval[1]), :
-            ]
-
-            return selected_rows
-
-        for image_id, labels in self._filtered_labels.items():
-            self._filtered_labels[image_id] = _keep_labels_with_area_in_interval(
-                labels, size_to_keep, self.image_area
-            )
-
-        return self
+        size_to_keep = (size_to_keep[0], size_to_keep[1])
+        image_area = self.image_area
+        return self._add_filter(
+            ("size", size_to_keep, image_area),
+            lambda bboxes: _size_mask(bboxes, size_to_keep, image_area),
+        )
 
     def filter_by_size_percentage(self, perc_to_keep: Tuple[float, float]):
         """
@@ -225,27 +495,20 @@ class YoloLabelsDataset:
         class_to_keep: Union[int, Iterable[int]]
             Class or list of classes to keep.
         """
-
-        def _keep_labels_with_class(array, class_id):
-            if isinstance(class_id, set):
-                class_id = list(class_id)
-            return array[np.isin(array[:, 0], class_id), :]
-
-        for image_id, labels in self._filtered_labels.items():
-            self._filtered_labels[image_id] = _keep_labels_with_class(
-                labels, class_id=class_to_keep
-            )
-
-        return self
+        classes = (
+            frozenset(class_to_keep)
+            if isinstance(class_to_keep, Iterable)
+            else frozenset([class_to_keep])
+        )
+        return self._add_filter(
+            ("class", classes), lambda bboxes: _class_mask(bboxes, classes)
+        )
 
     def filter_by_confidence(self, conf_to_keep: float):
         """
         Filter dataset by confidence score.
         """
-
-        for image_id, labels in self._filtered_labels.items():
-            self._filtered_labels[image_id] = self._filter_bboxes_by_conf(
-                labels, conf_to_keep
-            )
-
-        return self
+        return self._add_filter(
+            ("confidence", conf_to_keep),
+            lambda bboxes: _conf_mask(bboxes, conf_to_keep),
+        )
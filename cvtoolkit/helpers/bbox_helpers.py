@@ -0,0 +1,155 @@
+"""
+Batched bounding box operations on arrays of shape `(N, 4)`.
+
+Supported formats:
+- "xyxy": `(x_min, y_min, x_max, y_max)`
+- "xywh": `(x_min, y_min, width, height)`, as used by COCO
+- "cxcywh": `(x_center, y_center, width, height)`, as used by YOLO
+
+In every format the x values are in columns 0 and 2 and the y values in columns 1
+and 3, so normalizing, denormalizing and scaling work for all of them. Image
+shapes are `(width, height)` tuples, as elsewhere in cvtoolkit.
+"""
+
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+BOX_FORMATS = ("xyxy", "xywh", "cxcywh")
+
+
+def _as_boxes(boxes: npt.ArrayLike) -> npt.NDArray:
+    boxes = np.asarray(boxes)
+    if boxes.size and boxes.shape[-1] != 4:
+        raise ValueError(
+            f"Expected boxes with 4 values in the last dimension, got shape "
+            f"{boxes.shape}."
+        )
+    if not np.issubdtype(boxes.dtype, np.floating):
+        boxes = boxes.astype(np.float64)
+    return boxes.reshape(-1, 4)
+
+
+def xyxy_to_xywh(boxes: npt.ArrayLike) -> npt.NDArray:
+    boxes = _as_boxes(boxes)
+    converted = boxes.copy()
+    converted[:, 2:] = boxes[:, 2:] - boxes[:, :2]
+    return converted
+
+
+def xywh_to_xyxy(boxes: npt.ArrayLike) -> npt.NDArray:
+    boxes = _as_boxes(boxes)
+    converted = boxes.copy()
+    converted[:, 2:] = boxes[:, :2] + boxes[:, 2:]
+    return converted
+
+
+def xywh_to_cxcywh(boxes: npt.ArrayLike) -> npt.NDArray:
+    boxes = _as_boxes(boxes)
+    converted = boxes.copy()
+    converted[:, :2] = boxes[:, :2] + boxes[:, 2:] / 2
+    return converted
+
+
+def cxcywh_to_xywh(boxes: npt.ArrayLike) -> npt.NDArray:
+    boxes = _as_boxes(boxes)
+    converted = boxes.copy()
+    converted[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+    return converted
+
+
+def xyxy_to_cxcywh(boxes: npt.ArrayLike) -> npt.NDArray:
+    return xywh_to_cxcywh(xyxy_to_xywh(boxes))
+
+
+def cxcywh_to_xyxy(boxes: npt.ArrayLike) -> npt.NDArray:
+    boxes = _as_boxes(boxes)
+    converted = np.empty_like(boxes)
+    converted[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+    converted[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+    return converted
+
+
+def convert_boxes(
+    boxes: npt.ArrayLike, source_format: str, target_format: str
+) -> npt.NDArray:
+    """
+    Convert boxes between any two of the formats in `BOX_FORMATS`.
+    """
+    for box_format in (source_format, target_format):
+        if box_format not in BOX_FORMATS:
+            raise ValueError(
+                f"Unknown box format '{box_format}', expected one of {BOX_FORMATS}."
+            )
+    if source_format == target_format:
+        return _as_boxes(boxes).copy()
+    if source_format == "xyxy":
+        xywh = xyxy_to_xywh(boxes)
+    elif source_format == "cxcywh":
+        xywh = cxcywh_to_xywh(boxes)
+    else:
+        xywh = _as_boxes(boxes)
+    if target_format == "xyxy":
+        return xywh_to_xyxy(xywh)
+    elif target_format == "cxcywh":
+        return xywh_to_cxcywh(xywh)
+    return xywh
+
+
+def normalize_boxes(
+    boxes: npt.ArrayLike, image_shape: Tuple[float, float]
+) -> npt.NDArray:
+    """
+    Convert absolute (pixel) coordinates to coordinates relative to the image
+    size.
+    """
+    boxes = _as_boxes(boxes)
+    return boxes / np.array(
+        [image_shape[0], image_shape[1], image_shape[0], image_shape[1]]
+    )
+
+
+def denormalize_boxes(
+    boxes: npt.ArrayLike, image_shape: Tuple[float, float]
+) -> npt.NDArray:
+    """
+    Convert coordinates relative to the image size to absolute (pixel)
+    coordinates.
+    """
+    return scale_boxes(boxes, image_shape[0], image_shape[1])
+
+
+def scale_boxes(boxes: npt.ArrayLike, scale_x: float, scale_y: float) -> npt.NDArray:
+    """
+    Multiply the x values by `scale_x` and the y values by `scale_y`, e.g. to
+    map boxes to a resized image.
+    """
+    boxes = _as_boxes(boxes)
+    return boxes * np.array([scale_x, scale_y, scale_x, scale_y])
+
+
+def clip_boxes(boxes: npt.ArrayLike, image_shape: Tuple[float, float]) -> npt.NDArray:
+    """
+    Clip "xyxy" boxes to the image.
+    """
+    boxes = _as_boxes(boxes)
+    return np.clip(
+        boxes,
+        0,
+        np.array([image_shape[0], image_shape[1], image_shape[0], image_shape[1]]),
+    )
+
+
+def box_area(boxes: npt.ArrayLike, box_format: str = "xyxy") -> npt.NDArray:
+    """
+    Area of each box, as an array of shape `(N,)`.
+    """
+    boxes = _as_boxes(boxes)
+    if box_format == "xyxy":
+        return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    elif box_format in ("xywh", "cxcywh"):
+        return boxes[:, 2] * boxes[:, 3]
+    raise ValueError(
+        f"Unknown box format '{box_format}', expected one of {BOX_FORMATS}."
+    )
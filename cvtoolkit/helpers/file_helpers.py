@@ -1,6 +1,28 @@
+import contextvars
+import errno
+import hashlib
+import json
 import logging
 import os
 import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from cvtoolkit.telemetry.telemetry import get_telemetry
 
 logger = logging.getLogger(__name__)
 
@@ -17,16 +39,177 @@ IMG_FORMATS = (
     "webp",
     "pfm",
 )  # include image suffixes
+IMAGE_SUFFIXES = frozenset(f".{ext}" for ext in IMG_FORMATS)
+
+DIRECTORY_INDEX_VERSION = 1
+
+# Block sizes of kernel copies, as in shutil.
+_MIN_BLOCK_SIZE = 8 * 1024 * 1024
+_MAX_BLOCK_SIZE = 2**30
+# Errors of copy_file_range and sendfile when they cannot copy between the given
+# files, e.g. across file systems or on file systems without support.
+_UNSUPPORTED_ERRNOS = {
+    errno.ENOSYS,
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.ENOTSUP,
+    errno.EOPNOTSUPP,
+    errno.EBADF,
+    errno.EPERM,
+}
+
+
+def _scan_directory(path: str) -> Tuple[List[str], List[str]]:
+    """
+    Return the names of the images and of the subdirectories in a directory. Like
+    `os.walk`, symlinks to directories are not followed and unreadable
+    directories are skipped.
+    """
+    images, subdirectories = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink():
+                        subdirectories.append(entry.name)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_SUFFIXES:
+                    images.append(entry.name)
+    except OSError as e:
+        logger.debug(f"Skipping directory {path}: {e}")
+    return images, subdirectories
+
+
+class DirectoryIndex:
+    """
+    JSON file with the mtime, images and subdirectories of every directory of a
+    tree, so a later scan only lists the directories whose mtime changed. The
+    mtime of a directory changes when entries are added, removed or renamed
+    directly in it, so every directory is still stat-ed, but unchanged
+    directories are not listed again.
+    """
+
+    # Directories modified this shortly before a scan are not indexed, as they
+    # might change again within the resolution of their mtime.
+    racy_seconds: float = 2.0
+
+    def __init__(self, path: str, root_folder: str):
+        self.path = path
+        self.root_folder = root_folder
 
+    def load(self) -> Dict[str, list]:
+        """
+        Return the index as `{directory: [mtime_ns, images, subdirectories]}`, or
+        an empty index if the file does not exist or belongs to another folder.
+        """
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                index = json.load(f)
+            if index["version"] != DIRECTORY_INDEX_VERSION:
+                raise ValueError(f"unsupported version {index['version']}")
+            if index["root_folder"] != self.root_folder:
+                raise ValueError(f"index of {index['root_folder']}")
+            return index["directories"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring directory index {self.path}: {e}")
+            return {}
+
+    def save(self, directories: Dict[str, list]) -> None:
+        index = {
+            "version": DIRECTORY_INDEX_VERSION,
+            "root_folder": self.root_folder,
+            "directories": directories,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.path)
+
+
+class _ImageWalker:
+    """Walks directory trees, optionally using and updating a directory index."""
+
+    def __init__(self, index: Optional[Dict[str, list]] = None):
+        self.use_index = index is not None
+        self.index = index or {}
+        self.new_index: Dict[str, list] = {}
+        self.racy_after_ns = time.time_ns() - int(DirectoryIndex.racy_seconds * 1e9)
+
+    def list_directory(self, directory: str) -> Tuple[List[str], List[str]]:
+        if not self.use_index:
+            return _scan_directory(directory)
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return [], []
+        cached = self.index.get(directory)
+        if cached is not None and cached[0] == mtime_ns:
+            images, subdirectories = cached[1], cached[2]
+        else:
+            images, subdirectories = _scan_directory(directory)
+        if mtime_ns < self.racy_after_ns:
+            # Assigning a dict item is atomic, so threads can share new_index.
+            self.new_index[directory] = [mtime_ns, images, subdirectories]
+        return images, subdirectories
+
+    def walk(self, folder: str) -> Iterator[str]:
+        stack = [folder]
+        while stack:
+            directory = stack.pop()
+            images, subdirectories = self.list_directory(directory)
+            for name in images:
+                yield os.path.join(directory, name)
+            stack.extend(
+                os.path.join(directory, name) for name in reversed(subdirectories)
+            )
+
+
+def iter_image_paths(
+    root_folder: str, num_workers: int = 0, index_path: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Yield the paths of all images in a directory tree, matching the file
+    extensions in `IMG_FORMATS` case-insensitively.
+
+    Parameters
+    ----------
+    root_folder: str
+        Root of the directory tree.
+    num_workers: int = 0
+        Number of threads that walk the top-level subdirectories in parallel,
+        which helps on network file systems. The images of one subdirectory are
+        yielded together. With 0 the tree is walked lazily in one thread.
+    index_path: Optional[str] = None
+        Path of a DirectoryIndex. Directories that did not change since the
+        previous scan are not listed again. The index is updated when all paths
+        have been yielded.
+    """
+    index = DirectoryIndex(index_path, root_folder) if index_path else None
+    walker = _ImageWalker(index.load() if index else None)
+    if num_workers > 0:
+        images, subdirectories = walker.list_directory(root_folder)
+        for name in images:
+            yield os.path.join(root_folder, name)
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            for paths in executor.map(
+                lambda folder: list(walker.walk(folder)),
+                [os.path.join(root_folder, name) for name in subdirectories],
+            ):
+                yield from paths
+    else:
+        yield from walker.walk(root_folder)
+    if index:
+        index.save(walker.new_index)
 
-def find_image_paths(root_folder):
-    image_paths = []
-    for foldername, subfolders, filenames in os.walk(root_folder):
-        for filename in filenames:
-            if any(filename.endswith(ext) for ext in IMG_FORMATS):
-                image_path = os.path.join(foldername, filename)
-                image_paths.append(image_path)
-    return image_paths
+
+def find_image_paths(root_folder, num_workers=0, index_path=None):
+    return list(iter_image_paths(root_folder, num_workers, index_path))
 
 
 def delete_file(file_path):
@@ -40,23 +223,375 @@ def delete_file(file_path):
         raise Exception(f"Failed to remove file '{file_path}': {e}")
 
 
+def _kernel_copy(
+    copy_function: Callable[[int, int, int], int],
+    source: BinaryIO,
+    destination: BinaryIO,
+) -> bool:
+    """
+    Copy the rest of `source` to `destination` with `copy_function(source_fd,
+    destination_fd, count)`, which copies in the kernel from the current
+    positions and returns the number of bytes copied.
+
+    Returns
+    -------
+    False if the function is not supported for these files, True otherwise. Some
+    network and FUSE file systems report an unsupported copy by copying nothing,
+    so copying nothing from a non-empty file also counts as unsupported.
+    """
+    source_fd, destination_fd = source.fileno(), destination.fileno()
+    size = os.fstat(source_fd).st_size
+    block_size = min(max(size, _MIN_BLOCK_SIZE), _MAX_BLOCK_SIZE)
+    n_copied = 0
+    while True:
+        try:
+            n_bytes = copy_function(source_fd, destination_fd, block_size)
+        except OSError as e:
+            if n_copied == 0 and e.errno in _UNSUPPORTED_ERRNOS:
+                return False
+            raise
+        if n_bytes == 0:
+            return n_copied > 0
+        n_copied += n_bytes
+
+
+def _copy_contents(source: BinaryIO, destination: BinaryIO) -> None:
+    # Files that report a size of 0, e.g. in /proc, can still have content that
+    # the kernel copies skip.
+    if os.fstat(source.fileno()).st_size == 0:
+        shutil.copyfileobj(source, destination, _MIN_BLOCK_SIZE)
+        return
+    if hasattr(os, "copy_file_range") and _kernel_copy(
+        lambda source_fd, destination_fd, count: os.copy_file_range(
+            source_fd, destination_fd, count
+        ),
+        source,
+        destination,
+    ):
+        return
+    if hasattr(os, "sendfile") and _kernel_copy(
+        lambda source_fd, destination_fd, count: os.sendfile(
+            destination_fd, source_fd, None, count
+        ),
+        source,
+        destination,
+    ):
+        return
+    shutil.copyfileobj(source, destination, _MIN_BLOCK_SIZE)
+
+
+class _DirectoryCreator:
+    """Creates every directory once, also when called from many threads."""
+
+    def __init__(self):
+        self._created: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def makedirs(self, path: str) -> None:
+        if path in self._created:
+            return
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self._created.add(path)
+
+
+def _hashing_copy(
+    source: BinaryIO, destination: BinaryIO, update: Callable[[bytes], None]
+) -> None:
+    while block := source.read(_MIN_BLOCK_SIZE):
+        update(block)
+        destination.write(block)
+
+
+def _copy(
+    source_path: str,
+    destination_path: str,
+    directories: _DirectoryCreator,
+    update: Optional[Callable[[bytes], None]] = None,
+) -> int:
+    """
+    Copy the contents and permission bits of a file, like `shutil.copy`, with the
+    copy done in the kernel where possible. If `update` is given, e.g. the update
+    method of a hash, the contents are copied in user space and passed to it
+    block by block, so the source is only read once.
+
+    Returns
+    -------
+    The number of bytes copied.
+
+    Raises
+    ------
+    shutil.SameFileError
+        If the source and destination are the same file.
+    """
+    with get_telemetry().timer("file_copy"):
+        with open(source_path, "rb") as source:
+            try:
+                destination_stat = os.stat(destination_path)
+            except OSError:
+                pass
+            else:
+                if os.path.samestat(os.fstat(source.fileno()), destination_stat):
+                    raise shutil.SameFileError(
+                        f"{source_path!r} and {destination_path!r} are the same file"
+                    )
+            directories.makedirs(os.path.dirname(destination_path))
+            with open(destination_path, "wb") as destination:
+                if update is None:
+                    _copy_contents(source, destination)
+                else:
+                    _hashing_copy(source, destination, update)
+                n_bytes = destination.tell()
+        shutil.copymode(source_path, destination_path)
+    return n_bytes
+
+
 def copy_file(relative_path, input_path, output_path):
     # We don't use os.path.join because it doesn't work with Azure paths
     source_path = input_path + relative_path
     destination_path = output_path + relative_path
 
-    logger.info(f"Copying {source_path} to {destination_path}..")
-    if os.path.exists(source_path):
-        os.makedirs(os.path.dirname(destination_path), exist_ok=True)
-        shutil.copy(source_path, destination_path)
-        print(f"File '{source_path}' copied to '{destination_path}'")
-
-        if not os.path.exists(destination_path):
-            error_message = f"Failed to move file '{source_path}' to the destination: {destination_path}"
-            logger.error(error_message)
-            raise FileNotFoundError(error_message)
-    else:
+    logger.debug(f"Copying {source_path} to {destination_path}..")
+    try:
+        n_bytes = _copy(source_path, destination_path, _DirectoryCreator())
+    except FileNotFoundError as e:
+        if e.filename != source_path:
+            raise
         logger.info(f"Source file '{source_path}' does not exist.")
+        return
+    telemetry = get_telemetry()
+    telemetry.count("file_copy", "files")
+    telemetry.count("file_copy", "bytes", n_bytes)
+
+
+@dataclass
+class FileCopyResult:
+    """Outcome of copying one file."""
+
+    relative_path: str
+    n_bytes: int = 0
+    error: Optional[Exception] = None
+    checksum: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class CopyReport:
+    """Aggregate outcome of copying many files."""
+
+    n_files: int = 0
+    n_copied: int = 0
+    n_bytes: int = 0
+    seconds: float = 0.0
+    failed: List[FileCopyResult] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    @property
+    def files_per_second(self) -> float:
+        return self.n_copied / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.n_bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def add(self, result: FileCopyResult) -> None:
+        self.n_files += 1
+        if result.ok:
+            self.n_copied += 1
+            self.n_bytes += result.n_bytes
+        else:
+            self.failed.append(result)
+
+    def raise_on_error(self) -> None:
+        """Raise a CopyError if any file failed to copy."""
+        if self.failed:
+            raise CopyError(self)
+
+    def __str__(self):
+        return (
+            f"Copied {self.n_copied} of {self.n_files} files "
+            f"({self.n_bytes / 1e6:.1f} MB) in {self.seconds:.2f}s: "
+            f"{self.files_per_second:.0f} files/s, "
+            f"{self.bytes_per_second / 1e6:.1f} MB/s, {len(self.failed)} failed"
+        )
+
+
+class ChecksumError(Exception):
+    """A copied file does not match its source."""
+
+
+class CopyError(Exception):
+    """One or more files of a bulk copy failed."""
+
+    def __init__(self, report: CopyReport):
+        self.report = report
+        examples = "; ".join(
+            f"{result.relative_path}: {result.error}" for result in report.failed[:5]
+        )
+        super().__init__(
+            f"Failed to copy {len(report.failed)} of {report.n_files} files: "
+            f"{examples}"
+        )
+
+
+def file_checksum(path: str, algorithm: str = "sha256") -> str:
+    """Return the hex digest of the contents of a file."""
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        while block := f.read(_MIN_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _copy_relative(
+    relative_path: str,
+    input_path: str,
+    output_path: str,
+    directories: _DirectoryCreator,
+    checksum: Optional[str] = None,
+) -> FileCopyResult:
+    source_path = input_path + relative_path
+    destination_path = output_path + relative_path
+    try:
+        digest = hashlib.new(checksum) if checksum else None
+        n_bytes = _copy(
+            source_path,
+            destination_path,
+            directories,
+            digest.update if digest is not None else None,
+        )
+        # The checksum is computed from the source while copying, so the copy
+        # is verified by its size instead of reading it back.
+        if digest is not None and os.stat(destination_path).st_size != n_bytes:
+            raise ChecksumError(
+                f"Size of '{destination_path}' does not match its source."
+            )
+    except Exception as e:
+        logger.warning(f"Failed to copy '{source_path}': {e}")
+        return FileCopyResult(relative_path, error=e)
+    return FileCopyResult(
+        relative_path,
+        n_bytes,
+        checksum=digest.hexdigest() if digest is not None else None,
+    )
+
+
+def iter_copy_files(
+    relative_paths: Iterable[str],
+    input_path: str,
+    output_path: str,
+    num_workers: int = 8,
+    checksum: Optional[str] = None,
+) -> Iterator[FileCopyResult]:
+    """
+    Copy many files concurrently and yield the result of every file as soon as
+    it is done, in order of completion. A failing file does not stop the others.
+
+    Workers take the next file whenever they finish one, so a few large or slow
+    files do not hold up the rest. At most a few files per worker are queued, so
+    `relative_paths` can be a lazy iterator over a very large folder.
+
+    Parameters
+    ----------
+    relative_paths: Iterable[str]
+        Paths of the files relative to `input_path` and `output_path`. Like in
+        `copy_file`, the full paths are concatenations (e.g. `input_path +
+        relative_path`), not `os.path.join`, so they work with Azure paths.
+    input_path: str
+        Folder to copy from.
+    output_path: str
+        Folder to copy to.
+    num_workers: int = 8
+        Number of threads that copy files. With 0 the files are copied one after
+        another.
+    checksum: Optional[str] = None
+        Name of a `hashlib` algorithm, e.g. "sha256". If given, the checksum of
+        every source file is computed while it is copied and is part of the
+        result, and a copy whose size does not match its source fails with a
+        ChecksumError. Files are then copied in user space instead of the kernel.
+    """
+    directories = _DirectoryCreator()
+    telemetry = get_telemetry()
+
+    def copy(relative_path: str) -> FileCopyResult:
+        result = _copy_relative(
+            relative_path, input_path, output_path, directories, checksum
+        )
+        if result.ok:
+            telemetry.count("file_copy", "files")
+            telemetry.count("file_copy", "bytes", result.n_bytes)
+        else:
+            telemetry.count("file_copy", "errors")
+        return result
+
+    if num_workers == 0:
+        yield from map(copy, relative_paths)
+        return
+
+    def submit(path: str) -> Future:
+        # Workers run in a copy of the caller's context, so they report into the
+        # telemetry of the caller's run.
+        return executor.submit(contextvars.copy_context().run, copy, path)
+
+    max_pending = 4 * num_workers
+    iterator = iter(relative_paths)
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = {submit(path) for path in islice(iterator, max_pending)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+            for path in islice(iterator, len(done)):
+                pending.add(submit(path))
+
+
+def copy_files(
+    relative_paths: Iterable[str],
+    input_path: str,
+    output_path: str,
+    num_workers: int = 8,
+    raise_on_error: bool = False,
+    checksum: Optional[str] = None,
+) -> CopyReport:
+    """
+    Copy many files concurrently, see `iter_copy_files`.
+
+    Parameters
+    ----------
+    relative_paths: Iterable[str]
+        Paths of the files relative to `input_path` and `output_path`.
+    input_path: str
+        Folder to copy from.
+    output_path: str
+        Folder to copy to.
+    num_workers: int = 8
+        Number of threads that copy files.
+    raise_on_error: bool = False
+        Raise a CopyError after copying all files if any of them failed.
+    checksum: Optional[str] = None
+        Verify the copies with this `hashlib` algorithm, see `iter_copy_files`.
+
+    Returns
+    -------
+    A CopyReport with the totals and the failed files with their errors.
+    """
+    report = CopyReport()
+    start = time.perf_counter()
+    for result in iter_copy_files(
+        relative_paths, input_path, output_path, num_workers, checksum
+    ):
+        report.add(result)
+    report.seconds = time.perf_counter() - start
+    logger.info(str(report))
+    if raise_on_error:
+        report.raise_on_error()
+    return report
 
 
 def delete_folder(folder_path):
@@ -0,0 +1,183 @@
+import json
+import re
+from typing import Any, Collection, Iterator, Optional, TextIO, Tuple
+
+_skip_whitespace = re.compile(r"[ \t\n\r]*").match
+_skip_number_chars = re.compile(r"[0-9.eE+-]*").match
+
+
+class JsonContentError(ValueError):
+    """Raised when a JSON file does not contain the expected type of value."""
+
+
+class _JsonStream:
+    """
+    Incremental reader for a JSON document that is too large to load at once.
+
+    Only the structure that is needed to find and iterate over arrays is parsed
+    by hand; every item is decoded with the standard `json` decoder. At most one
+    chunk plus the item being decoded is held in memory.
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character, or "" at the end."""
+        while True:
+            self._pos = _skip_whitespace(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self._buffer, self._pos)
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self._pos += 1
+
+    def decode_value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number that is followed by nothing but number characters (e.g. "1."
+            # or "2e") might continue in the next chunk.
+            if (
+                isinstance(value, (int, float))
+                and _skip_number_chars(self._buffer, end).end() == len(self._buffer)
+                and not self._eof
+                and self._fill()
+            ):
+                continue
+            self._pos = end
+            return value
+
+    def iter_array(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.decode_value()
+            separator = self.peek()
+            if separator not in (",", "]"):
+                raise self.error("Expecting ',' delimiter or ']'")
+            self._pos += 1
+            if separator == "]":
+                return
+
+    def iter_object(self, stream_keys: Collection[str]) -> Iterator[Tuple[str, Any]]:
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(":")
+            if key in stream_keys and self.peek() == "[":
+                items = self.iter_array()
+                yield key, items
+                # Skip whatever the caller did not consume.
+                for _ in items:
+                    pass
+            else:
+                yield key, self.decode_value()
+            separator = self.peek()
+            if separator not in (",", "}"):
+                raise self.error("Expecting ',' delimiter or '}'")
+            self._pos += 1
+            if separator == "}":
+                return
+
+
+def iter_json_object(
+    file: TextIO, stream_keys: Collection[str] = (), chunk_size: int = 1 << 20
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Iterate over the top-level `(key, value)` pairs of a JSON object without
+    loading the whole document.
+
+    For keys in `stream_keys` whose value is an array, the value is an iterator
+    over the items of that array instead of a list. It has to be consumed (or
+    abandoned) before moving on to the next key.
+
+    Parameters
+    ----------
+    file: TextIO
+        Open text file positioned at the start of the JSON object.
+    stream_keys: Collection[str] = ()
+        Keys of arrays to stream item by item.
+    chunk_size: int = 1 << 20
+        Number of characters to read at once.
+
+    Example
+    -------
+    with open("coco.json") as f:
+        for key, value in iter_json_object(f, stream_keys=["annotations"]):
+            if key == "annotations":
+                for annotation in value:
+                    ...
+    """
+    return _JsonStream(file, chunk_size).iter_object(stream_keys)
+
+
+def iter_json_array(
+    file_path: str, key: Optional[str] = None, chunk_size: int = 1 << 20
+) -> Iterator[Any]:
+    """
+    Iterate over the items of a JSON array without loading the whole file.
+
+    The file either contains the array itself, or an object with the array under
+    `key`, e.g. the "annotations" of a COCO file.
+
+    Parameters
+    ----------
+    file_path: str
+        Path to the JSON file.
+    key: Optional[str] = None
+        Key of the array if the file contains an object.
+    chunk_size: int = 1 << 20
+        Number of characters to read at once.
+
+    Raises
+    ------
+    KeyError
+        If the file contains an object without `key`.
+    JsonContentError
+        If the file contains neither an array nor an object.
+    """
+    with open(file_path) as file:
+        stream = _JsonStream(file, chunk_size)
+        first = stream.peek()
+        if first == "[":
+            yield from stream.iter_array()
+        elif first == "{" and key is not None:
+            for found_key, value in stream.iter_object(stream_keys=[key]):
+                if found_key == key:
+                    yield from value
+                    return
+            raise KeyError(key)
+        else:
+            raise JsonContentError(f"Unexpected JSON content in {file_path}.")
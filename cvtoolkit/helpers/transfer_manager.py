@@ -0,0 +1,297 @@
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from cvtoolkit.helpers.file_helpers import FileCopyResult, iter_copy_files
+
+logger = logging.getLogger(__name__)
+
+
+class ManifestEntry(NamedTuple):
+    """A file that was transferred, with the size and mtime of its source."""
+
+    relative_path: str
+    size: int
+    mtime_ns: int
+    checksum: Optional[str] = None
+
+
+class TransferManifest:
+    """
+    SQLite file with the files that a transfer from `input_path` to
+    `output_path` completed. Keep the manifest on a local disk: SQLite locking
+    is not reliable on network file systems such as blobfuse mounts.
+    """
+
+    def __init__(self, path: str, input_path: str, output_path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS transfer (
+                input_path TEXT NOT NULL,
+                output_path TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS completed_files (
+                relative_path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                checksum TEXT,
+                completed_at REAL NOT NULL
+            );
+            """
+        )
+        row = self._connection.execute(
+            "SELECT input_path, output_path FROM transfer"
+        ).fetchone()
+        if row is None:
+            with self._connection:
+                self._connection.execute(
+                    "INSERT INTO transfer VALUES (?, ?)", (input_path, output_path)
+                )
+        elif row != (input_path, output_path):
+            self._connection.close()
+            raise ValueError(
+                f"Manifest {path} belongs to a transfer from {row[0]} to {row[1]}, "
+                f"not from {input_path} to {output_path}."
+            )
+
+    def entries(self) -> Dict[str, ManifestEntry]:
+        """Return the completed files by relative path."""
+        rows = self._connection.execute(
+            "SELECT relative_path, size, mtime_ns, checksum FROM completed_files"
+        )
+        return {row[0]: ManifestEntry(*row) for row in rows}
+
+    def record(self, entries: Iterable[ManifestEntry]) -> None:
+        """Record completed files, replacing earlier entries of the same files."""
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO completed_files VALUES (?, ?, ?, ?, ?)",
+                [(*entry, now) for entry in entries],
+            )
+
+    def __len__(self) -> int:
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM completed_files"
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+@dataclass
+class TransferReport:
+    """Progress and throughput of a transfer. Skipped files are not timed."""
+
+    n_files: int = 0
+    n_skipped: int = 0
+    n_copied: int = 0
+    n_bytes: int = 0
+    seconds: float = 0.0
+    failed: List[FileCopyResult] = field(default_factory=list)
+
+    @property
+    def n_done(self) -> int:
+        return self.n_skipped + self.n_copied + len(self.failed)
+
+    @property
+    def files_per_second(self) -> float:
+        return self.n_copied / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.n_bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.n_done}/{self.n_files} files done: {self.n_copied} copied "
+            f"({self.n_bytes / 1e6:.1f} MB), {self.n_skipped} skipped, "
+            f"{len(self.failed)} failed in {self.seconds:.1f}s, "
+            f"{self.files_per_second:.0f} files/s, "
+            f"{self.bytes_per_second / 1e6:.1f} MB/s"
+        )
+
+
+class TransferManager:
+    """
+    Resumable bulk copy from `input_path` to `output_path`. Every copied file is
+    recorded in a manifest with the size and mtime of its source, and
+    optionally its checksum. When a transfer is run again, e.g. after a crash,
+    files whose source did not change and whose copy is still there are skipped.
+
+    Example
+    -------
+    manager = TransferManager(input_path, output_path, "transfer.sqlite")
+    report = manager.transfer(relative_paths)
+    """
+
+    def __init__(
+        self,
+        input_path: str,
+        output_path: str,
+        manifest_path: str,
+        num_workers: int = 8,
+        checksum: Optional[str] = None,
+        progress_interval: float = 10.0,
+        commit_size: int = 500,
+    ):
+        """
+        Parameters
+        ----------
+        input_path: str
+            Folder to copy from.
+        output_path: str
+            Folder to copy to.
+        manifest_path: str
+            Path of the SQLite manifest, preferably on a local disk.
+        num_workers: int = 8
+            Number of threads that check and copy files.
+        checksum: Optional[str] = None
+            Name of a `hashlib` algorithm to verify and record the checksum of
+            every copied file with. With a checksum, files recorded without one
+            are copied again.
+        progress_interval: float = 10.0
+            Seconds between progress reports.
+        commit_size: int = 500
+            Number of copied files after which they are recorded in the
+            manifest. At most this many files are copied again after a crash.
+        """
+        self.input_path = input_path
+        self.output_path = output_path
+        self.manifest_path = manifest_path
+        self.num_workers = num_workers
+        self.checksum = checksum
+        self.progress_interval = progress_interval
+        self.commit_size = commit_size
+
+    def _source_stat(self, relative_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.input_path + relative_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _is_done(
+        self,
+        entry: Optional[ManifestEntry],
+        source_stat: Optional[Tuple[int, int]],
+    ) -> bool:
+        if entry is None or source_stat is None:
+            return False
+        if (entry.size, entry.mtime_ns) != source_stat:
+            return False
+        if self.checksum and entry.checksum is None:
+            return False
+        try:
+            return os.path.getsize(self.output_path + entry.relative_path) == entry.size
+        except OSError:
+            return False
+
+    def transfer(
+        self,
+        relative_paths: Iterable[str],
+        progress_callback: Optional[Callable[[TransferReport], None]] = None,
+    ) -> TransferReport:
+        """
+        Copy the files that are not done yet.
+
+        Parameters
+        ----------
+        relative_paths: Iterable[str]
+            Paths of the files relative to `input_path` and `output_path`, which
+            are concatenated like in `copy_file`.
+        progress_callback: Optional[Callable[[TransferReport], None]] = None
+            Called with a copy of the report every `progress_interval` seconds.
+            Progress is logged as well.
+
+        Returns
+        -------
+        The report of the transfer, including the failed files and their errors.
+        """
+        relative_paths = list(dict.fromkeys(relative_paths))
+        report = TransferReport(n_files=len(relative_paths))
+        start = time.perf_counter()
+
+        with TransferManifest(
+            self.manifest_path, self.input_path, self.output_path
+        ) as manifest:
+            entries = manifest.entries()
+            with ThreadPoolExecutor(max_workers=max(self.num_workers, 1)) as executor:
+                source_stats = dict(
+                    zip(
+                        relative_paths,
+                        executor.map(self._source_stat, relative_paths),
+                    )
+                )
+                is_done = executor.map(
+                    lambda path: self._is_done(entries.get(path), source_stats[path]),
+                    relative_paths,
+                )
+                pending = [
+                    path for path, done in zip(relative_paths, is_done) if not done
+                ]
+            report.n_skipped = report.n_files - len(pending)
+            logger.info(
+                f"Skipping {report.n_skipped} of {report.n_files} files that were "
+                "transferred before."
+            )
+
+            completed: List[ManifestEntry] = []
+            last_progress = time.perf_counter()
+            try:
+                for result in iter_copy_files(
+                    pending,
+                    self.input_path,
+                    self.output_path,
+                    self.num_workers,
+                    self.checksum,
+                ):
+                    if result.ok:
+                        report.n_copied += 1
+                        report.n_bytes += result.n_bytes
+                        source_stat = source_stats[result.relative_path]
+                        if source_stat is not None:
+                            completed.append(
+                                ManifestEntry(
+                                    result.relative_path, *source_stat, result.checksum
+                                )
+                            )
+                    else:
+                        report.failed.append(result)
+                    if len(completed) >= self.commit_size:
+                        manifest.record(completed)
+                        completed = []
+
+                    now = time.perf_counter()
+                    if now - last_progress >= self.progress_interval:
+                        last_progress = now
+                        report.seconds = now - start
+                        self._report_progress(report, progress_callback)
+            finally:
+                manifest.record(completed)
+
+        report.seconds = time.perf_counter() - start
+        self._report_progress(report, progress_callback)
+        return report
+
+    @staticmethod
+    def _report_progress(
+        report: TransferReport,
+        progress_callback: Optional[Callable[[TransferReport], None]],
+    ) -> None:
+        logger.info(str(report))
+        if progress_callback is not None:
+            progress_callback(replace(report, failed=list(report.failed)))
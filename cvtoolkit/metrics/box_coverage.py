@@ -0,0 +1,160 @@
+from typing import Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from cvtoolkit.helpers.bbox_helpers import clip_boxes, cxcywh_to_xyxy, denormalize_boxes
+
+
+def yolo_boxes_to_pixels(
+    boxes: npt.ArrayLike, image_shape: Tuple[int, int]
+) -> npt.NDArray:
+    """
+    Convert YOLO labels to integer pixel boxes.
+
+    Parameters
+    ----------
+    boxes: npt.ArrayLike
+        Labels of shape `(n, 5+)` as `(class, x_c, y_c, width, height, ...)`, with
+        normalized coordinates, as stored by `YoloLabelsDataset`.
+    image_shape: Tuple[int, int]
+        Shape of the image as (width, height) tuple.
+
+    Returns
+    -------
+    Array of shape `(n, 4)` with `(x_min, y_min, x_max, y_max)` pixel edges,
+    rounded half up to the nearest pixel and clipped to the image. A box covers the
+    pixels `[y_min:y_max, x_min:x_max]`.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if boxes.size == 0:
+        return np.empty((0, 4), dtype=np.int64)
+    xyxy = denormalize_boxes(cxcywh_to_xyxy(boxes[:, 1:5]), image_shape)
+    return clip_boxes(np.floor(xyxy + 0.5), image_shape).astype(np.int64)
+
+
+def rasterize_boxes(
+    pixel_boxes: npt.NDArray, image_shape: Tuple[int, int]
+) -> npt.NDArray:
+    """
+    Create a boolean mask of shape (height, width) that is True inside any of the
+    pixel boxes.
+    """
+    mask = np.zeros((image_shape[1], image_shape[0]), dtype=bool)
+    for x_min, y_min, x_max, y_max in pixel_boxes:
+        mask[y_min:y_max, x_min:x_max] = True
+    return mask
+
+
+def _coverage(
+    pixel_boxes: npt.NDArray,
+    x_edges: npt.NDArray,
+    y_edges: npt.NDArray,
+    strata: npt.NDArray,
+    n_strata: int,
+) -> npt.NDArray:
+    """
+    Compute which cells of the grid spanned by `x_edges` and `y_edges` are
+    covered by at least one box, separately for each stratum.
+
+    The boxes are added to a 2D difference array (the inverse of an integral
+    image), so the cost depends on the number of boxes and grid cells, not on
+    the number of pixels.
+
+    Returns
+    -------
+    Boolean array of shape `(n_strata, len(y_edges) - 1, len(x_edges) - 1)`.
+    """
+    diff = np.zeros((n_strata, len(y_edges), len(x_edges)), dtype=np.int32)
+    x_min = np.searchsorted(x_edges, pixel_boxes[:, 0])
+    y_min = np.searchsorted(y_edges, pixel_boxes[:, 1])
+    x_max = np.searchsorted(x_edges, pixel_boxes[:, 2])
+    y_max = np.searchsorted(y_edges, pixel_boxes[:, 3])
+    np.add.at(diff, (strata, y_min, x_min), 1)
+    np.add.at(diff, (strata, y_min, x_max), -1)
+    np.add.at(diff, (strata, y_max, x_min), -1)
+    np.add.at(diff, (strata, y_max, x_max), 1)
+    return diff.cumsum(axis=1).cumsum(axis=2)[:, :-1, :-1] > 0
+
+
+def stratified_box_confusion(
+    true_pixel_boxes: npt.NDArray,
+    true_strata: npt.NDArray,
+    predicted_pixel_boxes: npt.NDArray,
+    predicted_strata: npt.NDArray,
+    n_strata: int,
+    image_shape: Tuple[int, int],
+) -> npt.NDArray:
+    """
+    Count the pixels of the confusion matrix between the area covered by true
+    boxes and the area covered by predicted boxes, for several strata at once.
+
+    The counts are computed analytically: the image is split into a grid at the
+    box edges, and every cell of the grid is either fully covered or not covered
+    at all by each set of boxes. No pixel masks are created.
+
+    Parameters
+    ----------
+    true_pixel_boxes: npt.NDArray
+        Ground truth boxes of shape `(n, 4)`, see `yolo_boxes_to_pixels`.
+    true_strata: npt.NDArray
+        Stratum of each ground truth box, in `[0, n_strata)`.
+    predicted_pixel_boxes: npt.NDArray
+        Predicted boxes of shape `(m, 4)`.
+    predicted_strata: npt.NDArray
+        Stratum of each predicted box, in `[0, n_strata)`.
+    n_strata: int
+        Number of strata.
+    image_shape: Tuple[int, int]
+        Shape of the image as (width, height) tuple.
+
+    Returns
+    -------
+    Integer array of shape `(n_strata, 4)` with (tp, fp, tn, fn) per stratum.
+    """
+    width, height = image_shape
+    all_boxes = np.concatenate(
+        [
+            np.asarray(true_pixel_boxes, dtype=np.int64).reshape(-1, 4),
+            np.asarray(predicted_pixel_boxes, dtype=np.int64).reshape(-1, 4),
+        ]
+    )
+    x_edges = np.unique(np.concatenate([[0, width], all_boxes[:, 0::2].ravel()]))
+    y_edges = np.unique(np.concatenate([[0, height], all_boxes[:, 1::2].ravel()]))
+    cell_area = np.outer(np.diff(y_edges), np.diff(x_edges))
+
+    true_covered = _coverage(
+        all_boxes[: len(true_strata)], x_edges, y_edges, true_strata, n_strata
+    )
+    predicted_covered = _coverage(
+        all_boxes[len(true_strata) :], x_edges, y_edges, predicted_strata, n_strata
+    )
+
+    tp = np.einsum("syx,yx->s", true_covered & predicted_covered, cell_area)
+    n_true = np.einsum("syx,yx->s", true_covered, cell_area)
+    n_predicted = np.einsum("syx,yx->s", predicted_covered, cell_area)
+    fp = n_predicted - tp
+    fn = n_true - tp
+    tn = width * height - tp - fp - fn
+    return np.stack([tp, fp, tn, fn], axis=1)
+
+
+def box_confusion(
+    true_pixel_boxes: npt.NDArray,
+    predicted_pixel_boxes: npt.NDArray,
+    image_shape: Tuple[int, int],
+) -> Tuple[int, int, int, int]:
+    """
+    Count (tp, fp, tn, fn) pixels between the area covered by true boxes and
+    the area covered by predicted boxes, see `stratified_box_confusion`.
+    """
+    counts = stratified_box_confusion(
+        true_pixel_boxes,
+        np.zeros(len(true_pixel_boxes), dtype=np.int64),
+        predicted_pixel_boxes,
+        np.zeros(len(predicted_pixel_boxes), dtype=np.int64),
+        1,
+        image_shape,
+    )
+    tp, fp, tn, fn = (int(count) for count in counts[0])
+    return tp, fp, tn, fn
@@ -0,0 +1,170 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+import numpy.typing as npt
+
+from cvtoolkit.datasets.yolo_labels_dataset import YoloLabelsDataset
+from cvtoolkit.metrics.total_blurred_area import TotalBlurredArea
+
+logger = logging.getLogger(__name__)
+
+MaskLoader = Callable[[str], npt.NDArray]
+T = TypeVar("T")
+
+
+def _chunks(items: Sequence[T], chunk_size: int) -> List[Sequence[T]]:
+    return [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def _evaluate_mask_pairs(
+    pairs: Iterable[Tuple[Optional[str], Optional[str]]], loader: MaskLoader
+) -> TotalBlurredArea:
+    """
+    Evaluate a chunk of (true, predicted) mask files. A missing file counts as an
+    empty mask.
+    """
+    metric = TotalBlurredArea()
+    for true_path, predicted_path in pairs:
+        true_mask = loader(true_path) if true_path else None
+        predicted_mask = loader(predicted_path) if predicted_path else None
+        if true_mask is None:
+            true_mask = np.zeros_like(predicted_mask, dtype=bool)
+        if predicted_mask is None:
+            predicted_mask = np.zeros_like(true_mask, dtype=bool)
+        metric.update_statistics_based_on_masks(true_mask, predicted_mask)
+    return metric
+
+
+def _evaluate_box_pairs(
+    pairs: Iterable[Tuple[npt.NDArray, npt.NDArray]], image_shape: Tuple[int, int]
+) -> TotalBlurredArea:
+    metric = TotalBlurredArea()
+    for true_boxes, predicted_boxes in pairs:
+        metric.update_statistics_based_on_boxes(
+            true_boxes, predicted_boxes, image_shape
+        )
+    return metric
+
+
+def _map_reduce(
+    function: Callable[[Sequence[T]], TotalBlurredArea],
+    chunks: List[Sequence[T]],
+    num_workers: Optional[int],
+) -> TotalBlurredArea:
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if num_workers == 0 or len(chunks) <= 1:
+        return sum(map(function, chunks), TotalBlurredArea())
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        return sum(pool.map(function, chunks), TotalBlurredArea())
+
+
+def evaluate_mask_folders(
+    true_folder: str,
+    predicted_folder: str,
+    num_workers: Optional[int] = None,
+    loader: MaskLoader = np.load,
+    suffix: str = ".npy",
+    chunk_size: int = 32,
+) -> TotalBlurredArea:
+    """
+    Compute the TotalBlurredArea statistics of a folder of ground truth masks and
+    a folder of predicted masks, in a process pool.
+
+    Masks are paired by file name. If a mask only exists in one of the folders,
+    the other one is considered empty. Every worker evaluates a chunk of pairs and
+    returns its partial counts, which are added at the end.
+
+    Parameters
+    ----------
+    true_folder: str
+        Folder with the ground truth masks.
+    predicted_folder: str
+        Folder with the predicted masks.
+    num_workers: Optional[int] = None
+        Number of processes, by default one per CPU. With 0 all masks are
+        evaluated in the calling process.
+    loader: MaskLoader = np.load
+        Function that reads a mask file into a boolean array. It must be picklable,
+        i.e. defined at module level.
+    suffix: str = ".npy"
+        Only files with this suffix are evaluated.
+    chunk_size: int = 32
+        Number of mask pairs per task.
+
+    Returns
+    -------
+    TotalBlurredArea with the counts of all mask pairs.
+    """
+    true_files = {f for f in os.listdir(true_folder) if f.endswith(suffix)}
+    predicted_files = {f for f in os.listdir(predicted_folder) if f.endswith(suffix)}
+    pairs = [
+        (
+            f"{true_folder}/{file}" if file in true_files else None,
+            f"{predicted_folder}/{file}" if file in predicted_files else None,
+        )
+        for file in sorted(true_files | predicted_files)
+    ]
+    logger.info(f"Evaluating {len(pairs)} mask pairs.")
+    return _map_reduce(
+        partial(_evaluate_mask_pairs, loader=loader),
+        _chunks(pairs, chunk_size),
+        num_workers,
+    )
+
+
+def evaluate_yolo_datasets(
+    true_dataset: YoloLabelsDataset,
+    predicted_dataset: YoloLabelsDataset,
+    image_shape: Tuple[int, int],
+    num_workers: Optional[int] = None,
+    chunk_size: int = 256,
+) -> TotalBlurredArea:
+    """
+    Compute the TotalBlurredArea statistics of the boxes of a ground truth and a
+    predicted YoloLabelsDataset, in a process pool.
+
+    The filtered labels of both datasets are used. Images are paired by image id;
+    an image without labels in one of the datasets has no boxes there.
+
+    Parameters
+    ----------
+    true_dataset: YoloLabelsDataset
+        Dataset with the ground truth labels.
+    predicted_dataset: YoloLabelsDataset
+        Dataset with the predicted labels.
+    image_shape: Tuple[int, int]
+        Shape of the images as (width, height) tuple.
+    num_workers: Optional[int] = None
+        Number of processes, by default one per CPU. With 0 all images are
+        evaluated in the calling process.
+    chunk_size: int = 256
+        Number of images per task.
+
+    Returns
+    -------
+    TotalBlurredArea with the counts of all images.
+    """
+    true_labels = true_dataset.get_filtered_labels()
+    predicted_labels = predicted_dataset.get_filtered_labels()
+    no_boxes = np.empty((0, 5), dtype=np.float32)
+    image_ids = list(true_labels) + [
+        image_id for image_id in predicted_labels if image_id not in true_labels
+    ]
+    pairs = [
+        (
+            true_labels.get(image_id, no_boxes),
+            predicted_labels.get(image_id, no_boxes),
+        )
+        for image_id in image_ids
+    ]
+    logger.info(f"Evaluating the boxes of {len(pairs)} images.")
+    return _map_reduce(
+        partial(_evaluate_box_pairs, image_shape=image_shape),
+        _chunks(pairs, chunk_size),
+        num_workers,
+    )
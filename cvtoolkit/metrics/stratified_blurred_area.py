@@ -0,0 +1,162 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+from cvtoolkit.metrics.box_coverage import (
+    stratified_box_confusion,
+    yolo_boxes_to_pixels,
+)
+from cvtoolkit.metrics.total_blurred_area import TotalBlurredArea
+
+Stratum = Tuple[Tuple[float, float], Optional[int]]
+
+
+class StratifiedBlurredArea:
+    """
+    TotalBlurredArea statistics per box size bucket and per class, computed in a
+    single pass over each image.
+
+    A box belongs to size bucket `(low, high)` if its area is in the interval
+    `(int(low * image_area), int(high * image_area)]`, the same interval as
+    `YoloLabelsDataset.filter_by_size_percentage`. The statistics of a stratum are
+    the statistics of the ground truth boxes and predicted boxes of that stratum
+    only, as if both had been filtered by size and class. Boxes outside all buckets
+    or with another class are ignored.
+    """
+
+    def __init__(
+        self, bucket_edges: Sequence[float], class_ids: Optional[Sequence[int]] = None
+    ):
+        """
+        Parameters
+        ----------
+        bucket_edges: Sequence[float]
+            Increasing edges of the size buckets, as fraction of the image area,
+            e.g. [0, 0.005, 0.01, 1] for three buckets.
+        class_ids: Optional[Sequence[int]] = None
+            Classes to report separately. With None all classes are counted
+            together, and the class in the stratum keys is None.
+        """
+        if len(bucket_edges) < 2 or np.any(np.diff(bucket_edges) <= 0):
+            raise ValueError(
+                "bucket_edges must contain at least two increasing values."
+            )
+        self.bucket_edges = list(bucket_edges)
+        self.class_ids = list(class_ids) if class_ids is not None else None
+
+        buckets = list(zip(self.bucket_edges[:-1], self.bucket_edges[1:]))
+        classes: List[Optional[int]] = (
+            self.class_ids if self.class_ids is not None else [None]
+        )
+        self.strata: List[Stratum] = [
+            (bucket, class_id) for bucket in buckets for class_id in classes
+        ]
+        self.metrics: Dict[Stratum, TotalBlurredArea] = {
+            stratum: TotalBlurredArea() for stratum in self.strata
+        }
+
+    def _stratum_indices(
+        self, boxes: npt.NDArray, image_shape: Tuple[int, int]
+    ) -> npt.NDArray:
+        """
+        Index in `self.strata` of every box, or -1 if the box is ignored.
+        """
+        image_area = image_shape[0] * image_shape[1]
+        edges = np.array([int(edge * image_area) for edge in self.bucket_edges])
+        sizes = boxes[:, 3] * boxes[:, 4] * image_area
+        bucket = np.searchsorted(edges, sizes, side="left") - 1
+        valid = (bucket >= 0) & (bucket < len(edges) - 1)
+
+        if self.class_ids is None:
+            n_classes, class_index = 1, np.zeros(len(boxes), dtype=np.int64)
+        else:
+            n_classes, class_index = len(self.class_ids), np.full(len(boxes), -1)
+            for i, class_id in enumerate(self.class_ids):
+                class_index[boxes[:, 0] == class_id] = i
+            valid &= class_index >= 0
+
+        return np.where(valid, bucket * n_classes + class_index, -1)
+
+    def update_statistics_based_on_boxes(
+        self,
+        true_boxes: npt.ArrayLike,
+        predicted_boxes: npt.ArrayLike,
+        image_shape: Tuple[int, int],
+    ):
+        """
+        Computes the statistics of every stratum for the ground truth and predicted
+        boxes of one image, see `TotalBlurredArea.update_statistics_based_on_boxes`.
+
+        Parameters
+        ----------
+        true_boxes: npt.ArrayLike
+            YOLO labels of shape (n, 5+) with normalized coordinates.
+        predicted_boxes: npt.ArrayLike
+            YOLO labels of shape (m, 5+).
+        image_shape: Tuple[int, int]
+            Shape of the image as (width, height) tuple.
+        """
+        pixel_boxes, strata = [], []
+        for boxes in (true_boxes, predicted_boxes):
+            boxes = np.asarray(boxes)
+            if boxes.size == 0:
+                boxes = np.empty((0, 5), dtype=np.float32)
+            indices = self._stratum_indices(boxes, image_shape)
+            keep = indices >= 0
+            pixel_boxes.append(yolo_boxes_to_pixels(boxes[keep], image_shape))
+            strata.append(indices[keep])
+
+        counts = stratified_box_confusion(
+            pixel_boxes[0],
+            strata[0],
+            pixel_boxes[1],
+            strata[1],
+            len(self.strata),
+            image_shape,
+        )
+        for stratum, (tp, fp, tn, fn) in zip(self.strata, counts.tolist()):
+            metric = self.metrics[stratum]
+            metric.tp += tp
+            metric.fp += fp
+            metric.tn += tn
+            metric.fn += fn
+
+    def merge(self, other: "StratifiedBlurredArea") -> "StratifiedBlurredArea":
+        """
+        Adds the counts of another accumulator with the same strata to this one.
+
+        Returns
+        -------
+        This accumulator.
+        """
+        if other.strata != self.strata:
+            raise ValueError("Cannot merge statistics with different strata.")
+        for stratum, metric in self.metrics.items():
+            metric.merge(other.metrics[stratum])
+        return self
+
+    def __add__(self, other):
+        if not isinstance(other, StratifiedBlurredArea):
+            return NotImplemented
+        result = StratifiedBlurredArea(self.bucket_edges, self.class_ids)
+        return result.merge(self).merge(other)
+
+    def __radd__(self, other):
+        # Makes sum() work on a list of accumulators.
+        if other == 0:
+            return StratifiedBlurredArea(self.bucket_edges, self.class_ids).merge(self)
+        return NotImplemented
+
+    def get_statistics(self) -> Dict[Stratum, dict]:
+        """
+        Return the statistics of every stratum, in the format of
+        `TotalBlurredArea.get_statistics`.
+
+        Returns
+        -------
+        Dict from `((low, high), class_id)` to the statistics of that stratum.
+        """
+        return {
+            stratum: metric.get_statistics() for stratum, metric in self.metrics.items()
+        }
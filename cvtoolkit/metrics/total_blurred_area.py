@@ -1,10 +1,63 @@
 import logging
+from typing import Tuple
 
 import numpy as np
+import numpy.typing as npt
 
+from cvtoolkit.metrics.box_coverage import box_confusion, yolo_boxes_to_pixels
 
 logger = logging.getLogger(__name__)
 
+# Number of pixels processed at once, bounds the temporary memory per update.
+_CHUNK_SIZE = 1 << 20
+
+
+def count_confusion(
+    true_mask: npt.NDArray, predicted_mask: npt.NDArray
+) -> Tuple[int, int, int, int]:
+    """
+    Count true positive, false positive, true negative and false negative pixels
+    of a pair of binary masks.
+
+    Only the intersection is counted explicitly, the other counts are derived from
+    the number of pixels in each mask and the total number of pixels. The
+    intersection is computed in fixed-size chunks in a reused buffer, so the
+    temporary memory does not depend on the mask size.
+
+    Parameters
+    ----------
+    true_mask: npt.NDArray
+        Boolean mask of any shape, e.g. (height, width) or (batch, height, width).
+    predicted_mask: npt.NDArray
+        Boolean mask with the same shape as `true_mask`.
+
+    Returns
+    -------
+    Tuple (tp, fp, tn, fn).
+    """
+    if true_mask.shape != predicted_mask.shape:
+        raise ValueError(
+            f"Mask shapes do not match: {true_mask.shape} and {predicted_mask.shape}."
+        )
+    true_flat = np.asarray(true_mask, dtype=bool).reshape(-1)
+    predicted_flat = np.asarray(predicted_mask, dtype=bool).reshape(-1)
+
+    n_true = int(np.count_nonzero(true_flat))
+    n_predicted = int(np.count_nonzero(predicted_flat))
+    tp = 0
+    if n_true and n_predicted:
+        buffer = np.empty(min(_CHUNK_SIZE, true_flat.size), dtype=bool)
+        for start in range(0, true_flat.size, _CHUNK_SIZE):
+            end = min(start + _CHUNK_SIZE, true_flat.size)
+            chunk = buffer[: end - start]
+            np.logical_and(true_flat[start:end], predicted_flat[start:end], out=chunk)
+            tp += int(np.count_nonzero(chunk))
+
+    fp = n_predicted - tp
+    fn = n_true - tp
+    tn = true_flat.size - tp - fp - fn
+    return tp, fp, tn, fn
+
 
 class TotalBlurredArea:
     def __init__(self):
@@ -13,23 +66,85 @@ class TotalBlurredArea:
         self.tn = 0
         self.fn = 0
 
+    def merge(self, other: "TotalBlurredArea") -> "TotalBlurredArea":
+        """
+        Adds the counts of another accumulator, e.g. one that was filled in another
+        process, to this one.
+
+        Returns
+        -------
+        This accumulator.
+        """
+        self.tp += other.tp
+        self.fp += other.fp
+        self.tn += other.tn
+        self.fn += other.fn
+        return self
+
+    def __add__(self, other):
+        if not isinstance(other, TotalBlurredArea):
+            return NotImplemented
+        return TotalBlurredArea().merge(self).merge(other)
+
+    def __radd__(self, other):
+        # Makes sum() work on a list of accumulators.
+        if other == 0:
+            return TotalBlurredArea().merge(self)
+        return NotImplemented
+
     def update_statistics_based_on_masks(self, true_mask, predicted_mask):
         """
-        Computes statistics for a given pair of binary masks.
+        Computes statistics for a given pair of binary masks, or for a batch of
+        pairs at once.
 
         Parameters
         ----------
-        true_mask numpy array of shape (height, width)
-        predicted_mask numpy array of shape (height, width)
+        true_mask numpy array of shape (height, width) or (batch, height, width)
+        predicted_mask numpy array with the same shape as true_mask
 
         Returns
         -------
 
         """
-        self.tp += np.count_nonzero(np.logical_and(true_mask, predicted_mask))
-        self.fp += np.count_nonzero(np.logical_and(~true_mask, predicted_mask))
-        self.tn += np.count_nonzero(np.logical_and(~true_mask, ~predicted_mask))
-        self.fn += np.count_nonzero(np.logical_and(true_mask, ~predicted_mask))
+        tp, fp, tn, fn = count_confusion(true_mask, predicted_mask)
+        self.tp += tp
+        self.fp += fp
+        self.tn += tn
+        self.fn += fn
+
+    def update_statistics_based_on_boxes(
+        self,
+        true_boxes: npt.ArrayLike,
+        predicted_boxes: npt.ArrayLike,
+        image_shape: Tuple[int, int],
+    ):
+        """
+        Computes statistics for the areas covered by the ground truth and predicted
+        boxes of one image, as if both had been rasterized to binary masks.
+
+        The areas are computed analytically from the box edges, no masks are
+        created. Box edges are rounded to the nearest pixel, see
+        `cvtoolkit.metrics.box_coverage.yolo_boxes_to_pixels`.
+
+        Parameters
+        ----------
+        true_boxes: npt.ArrayLike
+            YOLO labels of shape (n, 5+) with normalized coordinates, e.g. the
+            arrays of a `YoloLabelsDataset`.
+        predicted_boxes: npt.ArrayLike
+            YOLO labels of shape (m, 5+), e.g. (m, 6) with confidence scores.
+        image_shape: Tuple[int, int]
+            Shape of the image as (width, height) tuple.
+        """
+        tp, fp, tn, fn = box_confusion(
+            yolo_boxes_to_pixels(true_boxes, image_shape),
+            yolo_boxes_to_pixels(predicted_boxes, image_shape),
+            image_shape,
+        )
+        self.tp += tp
+        self.fp += fp
+        self.tn += tn
+        self.fn += fn
 
     def get_statistics(self):
         """
@@ -1,59 +1,251 @@
+import fcntl
 import logging
 import os
+import time
+from typing import IO, Optional
 
 logger = logging.getLogger(__name__)
 
+# Suffix of the lock file next to the file that LockFile locks.
+LOCK_SUFFIX = ".flock"
+# Suffix the previous, rename based, LockFile gave a file while it was locked.
+LEGACY_LOCK_SUFFIX = ".lock"
+
+
+class LockTimeout(TimeoutError):
+    """A lock could not be acquired in time."""
+
+
+class FileLock:
+    """
+    Inter-process lock on a lock file with `flock`, exclusive (one holder) or
+    shared (any number of holders, e.g. readers). The lock is held by the open
+    file, so it is released by the operating system when the holding process
+    dies and never goes stale. Threads that use their own FileLock exclude each
+    other as well. A FileLock is not reentrant.
+
+    The lock file is created if needed and is never removed: removing it would
+    let a waiting process lock the removed file while a new process locks a new
+    one.
+
+    Examples
+    --------
+    with FileLock("data.json.flock"):
+        ...
+
+    lock = FileLock("data.json.flock", shared=True)
+    if lock.acquire(timeout=5):
+        try:
+            ...
+        finally:
+            lock.release()
+    """
+
+    # Bounds of the exponential backoff while polling for a lock with a timeout.
+    min_poll_interval: float = 0.0005
+    max_poll_interval: float = 0.05
+
+    def __init__(self, lock_path: str, shared: bool = False, permissions: int = 0o666):
+        """
+        Parameters
+        ----------
+        lock_path: str
+            Path of the lock file.
+        shared: bool = False
+            Take a shared instead of an exclusive lock.
+        permissions: int = 0o666
+            Permission bits of the lock file if it is created, before the umask.
+        """
+        self.lock_path = lock_path
+        self.shared = shared
+        self.permissions = permissions
+        self._fd: Optional[int] = None
+
+    @property
+    def locked(self) -> bool:
+        """Whether this FileLock holds the lock."""
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Acquire the lock.
+
+        Parameters
+        ----------
+        blocking: bool = True
+            Wait for the lock. If False, only try once.
+        timeout: Optional[float] = None
+            Maximum number of seconds to wait, or None to wait as long as it takes.
+            Waiting without a timeout is done by the kernel, which wakes the
+            waiter as soon as the lock is released; with a timeout the lock is
+            polled with exponential backoff.
+
+        Returns
+        -------
+        Whether the lock was acquired.
+        """
+        if self._fd is not None:
+            raise RuntimeError(f"{self.lock_path} is already locked by this FileLock.")
+        operation = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, self.permissions)
+        try:
+            if blocking and timeout is None:
+                fcntl.flock(fd, operation)
+            elif not self._poll(fd, operation, timeout if blocking else 0):
+                os.close(fd)
+                return False
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def _poll(self, fd: int, operation: int, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        interval = self.min_poll_interval
+        while True:
+            try:
+                fcntl.flock(fd, operation | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                time.sleep(min(interval, remaining))
+                interval = min(interval * 2, self.max_poll_interval)
+
+    def release(self) -> None:
+        """Release the lock. Closing the lock file releases it."""
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        os.close(fd)
+
+    def __enter__(self):
+        if not self.acquire():
+            raise LockTimeout(f"Could not lock {self.lock_path}.")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
 
 class LockFile:
     """
     Locks a file in case of multiprocess/multithread to avoid two processes accessing the same file.
 
+    The lock is a FileLock on `<file_path>.flock`, so processes wait for each other
+    instead of failing, readers can share the lock, and the lock of a crashed
+    process is released automatically.
+
+    The previous LockFile locked a file by renaming it to `<file_path>.lock`. The
+    two versions do not exclude each other, so do not run them on the same files
+    at the same time. With `legacy_stale_after`, files that the previous version
+    left renamed after a crash are renamed back; only enable it once no process
+    of the previous version can still hold the file.
+
     Examples
     --------
     with LockFile(file_path) as locked_file:
         for line in locked_file:
             print(line)
+
+    with LockFile(file_path, shared=True, timeout=10) as locked_file:
+        ...
     """
 
-    def __init__(self, file_path: str):
+    def __init__(
+        self,
+        file_path: str,
+        shared: bool = False,
+        blocking: bool = True,
+        timeout: Optional[float] = None,
+        mode: str = "r",
+        legacy_stale_after: Optional[float] = None,
+    ):
         """
         Parameters
         ----------
         file_path
             Path of the file to be locked.
+        shared
+            Take a shared lock, which other shared locks can hold at the same time.
+        blocking
+            Wait for the lock. If False, raise LockTimeout if the file is locked.
+        timeout
+            Maximum number of seconds to wait for the lock before raising
+            LockTimeout, or None to wait as long as it takes.
+        mode
+            Mode the file is opened in.
+        legacy_stale_after
+            Seconds after which a file renamed by the previous LockFile is
+            considered abandoned and renamed back, or None to never rename it
+            back.
         """
         self.file_path = file_path
-        self.locked_file_path = self.file_path + ".lock"
+        self.locked_file_path = self.file_path + LEGACY_LOCK_SUFFIX
+        self.blocking = blocking
+        self.timeout = timeout
+        self.mode = mode
+        self.legacy_stale_after = legacy_stale_after
+        self.lock = FileLock(self.file_path + LOCK_SUFFIX, shared=shared)
+        self._file: Optional[IO] = None
+
+    def _recover_legacy_lock(self) -> None:
+        if self.legacy_stale_after is None:
+            return
+        if os.path.exists(self.file_path) or not os.path.exists(self.locked_file_path):
+            return
+        # Renaming a file updates its ctime.
+        age = time.time() - os.stat(self.locked_file_path).st_ctime
+        if age < self.legacy_stale_after:
+            return
+        try:
+            os.rename(self.locked_file_path, self.file_path)
+            logger.warning(
+                f"Recovered {self.file_path}, which was left locked as "
+                f"{self.locked_file_path} {age:.0f}s ago."
+            )
+        except FileNotFoundError:
+            pass
 
     def __enter__(self):
         """
-        Entering the with clause the file is renamed adding .lock postfix to avoid access.
+        Entering the with clause the lock is acquired and the file is opened.
 
         Returns
         -------
         Locked file object.
         """
+        if not self.lock.acquire(self.blocking, self.timeout):
+            raise LockTimeout(f"Could not lock {self.file_path}.")
         try:
-            os.rename(self.file_path, self.locked_file_path)
-            src = open(self.locked_file_path, "r")
-            return src
+            self._recover_legacy_lock()
+            self._file = open(self.file_path, self.mode)
+            return self._file
         except FileNotFoundError as e:
-            logger.error(f"File {self.locked_file_path} not found: {e}")
+            self.lock.release()
+            logger.error(f"File {self.file_path} not found: {e}")
             raise e
         except Exception as e:
-            logger.error(f"Error occurred while reading {self.locked_file_path}: {e}")
+            self.lock.release()
+            logger.error(f"Error occurred while reading {self.file_path}: {e}")
             raise e
 
     def __exit__(self, exc_type, exc_value, traceback):
         """
-        Exiting the with clause the file is renamed back to the original name.
+        Exiting the with clause the file is closed and the lock is released.
         """
         try:
-            os.rename(self.locked_file_path, self.file_path)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
         except Exception as e:
-            logging.error(f"Error occurred while unlocking file {self.file_path}: {e}")
+            logger.error(f"Error occurred while closing file {self.file_path}: {e}")
+        finally:
+            self.lock.release()
 
         if exc_type is not None:
-            logging.error(
+            logger.error(
                 f"An exception occurred within the 'with' block: {exc_type}, {exc_value}"
             )
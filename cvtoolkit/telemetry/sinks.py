@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, insert
+
+from cvtoolkit.database.baas_tables import BatchRunStatistics
+from cvtoolkit.database.database_handler import DBConfigSQLAlchemy
+from cvtoolkit.database.retry import RetryPolicy, run_in_transaction
+from cvtoolkit.telemetry.telemetry import TelemetrySink
+
+logger = logging.getLogger(__name__)
+
+
+def statistics_rows(run_id: str, statistics: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Flatten the statistics of a run to one row per (stage, metric), in the
+    format of BatchRunStatistics. For a counter `count` is its value, for a
+    histogram the number of observations.
+    """
+    rows = []
+    for stage, values in statistics["stages"].items():
+        for metric, value in values["counters"].items():
+            rows.append(
+                {
+                    "run_id": run_id,
+                    "stage": stage,
+                    "metric": metric,
+                    "count": value,
+                    "total": value,
+                    "minimum": None,
+                    "maximum": None,
+                    "histogram": None,
+                }
+            )
+        for metric, histogram in values["histograms"].items():
+            rows.append(
+                {
+                    "run_id": run_id,
+                    "stage": stage,
+                    "metric": metric,
+                    "count": histogram["count"],
+                    "total": histogram["total"],
+                    "minimum": histogram["min"],
+                    "maximum": histogram["max"],
+                    "histogram": json.dumps(
+                        {
+                            "bounds": histogram["bounds"],
+                            "bucket_counts": histogram["bucket_counts"],
+                        }
+                    ),
+                }
+            )
+    return rows
+
+
+class JsonSidecarSink(TelemetrySink):
+    """Writes the statistics of a run to `<folder>/<run_id>.telemetry.json`."""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+
+    def path(self, run_id: str) -> str:
+        return os.path.join(self.folder, f"{run_id}.telemetry.json")
+
+    def export(self, run_id: str, statistics: Dict[str, Any]) -> None:
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(statistics, f, indent=2)
+            os.replace(tmp_path, self.path(run_id))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        logger.info(f"Telemetry of run {run_id} written to {self.path(run_id)}.")
+
+
+class DatabaseSink(TelemetrySink):
+    """
+    Writes the statistics of a run to the BatchRunStatistics table, next to the
+    BatchRunInformation of the run. Exporting a run again replaces its rows.
+    """
+
+    def __init__(
+        self, db_config: DBConfigSQLAlchemy, retry_policy: Optional[RetryPolicy] = None
+    ):
+        self.db_config = db_config
+        self.retry_policy = retry_policy
+
+    def export(self, run_id: str, statistics: Dict[str, Any]) -> None:
+        rows = statistics_rows(run_id, statistics)
+        table = BatchRunStatistics.__table__
+
+        def write(session):
+            session.execute(delete(table).where(table.c.run_id == run_id))
+            if rows:
+                session.execute(insert(table), rows)
+
+        run_in_transaction(self.db_config, write, self.retry_policy, idempotent=True)
+
+
+class AzureMonitorSink(TelemetrySink):
+    """
+    Sends the statistics of a run to Azure Monitor (Application Insights) as one
+    trace per stage and metric, with the values as custom dimensions. Requires
+    `opencensus-ext-azure`.
+    """
+
+    def __init__(self, connection_string: str):
+        from opencensus.ext.azure.log_exporter import AzureLogHandler
+
+        self._handler = AzureLogHandler(connection_string=connection_string)
+        self._logger = logging.getLogger(f"{__name__}.azure_monitor")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+
+    def export(self, run_id: str, statistics: Dict[str, Any]) -> None:
+        self._logger.addHandler(self._handler)
+        try:
+            for row in statistics_rows(run_id, statistics):
+                self._logger.info(
+                    f"Telemetry {row['stage']}.{row['metric']}",
+                    extra={"custom_dimensions": row},
+                )
+            self._handler.flush()
+        finally:
+            self._logger.removeHandler(self._handler)
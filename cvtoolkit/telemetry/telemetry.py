@@ -0,0 +1,291 @@
+"""
+Lightweight run-scoped instrumentation: timers, counters and histograms per
+processing stage.
+
+Library code reports into the telemetry of the current run:
+
+    with get_telemetry().timer("file_copy"):
+        ...
+    get_telemetry().count("file_copy", "bytes", n_bytes)
+
+Outside of a run `get_telemetry()` returns a no-op instance, so instrumentation
+costs next to nothing. A pipeline starts a run with `run_telemetry`, which rolls
+the statistics up and hands them to its sinks when the run ends:
+
+    with run_telemetry(run_id, sinks=[JsonSidecarSink(output_folder)]):
+        ...
+
+The current run is held in a context variable, so runs in different threads
+record their telemetry separately, and a run started inside another run
+records its own until it ends. New threads start without a run; the threads
+that cvtoolkit starts report into the run of the code that started them. To
+do the same in your own threads, run them with `contextvars.copy_context().run`.
+Worker processes record their own telemetry, which can be combined with
+`Telemetry.merge`.
+"""
+
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the duration histogram buckets, in seconds.
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+
+
+class Histogram:
+    """
+    Count, sum, minimum, maximum and bucket counts of observed values. The last
+    bucket counts the values above the largest bound.
+    """
+
+    def __init__(self, bounds: Sequence[float] = DURATION_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.bucket_counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def merge(self, other: "Histogram") -> None:
+        if other.bounds != self.bounds:
+            raise ValueError("Cannot merge histograms with different buckets.")
+        for i, count in enumerate(other.bucket_counts):
+            self.bucket_counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        if other.minimum is not None:
+            self.minimum = (
+                other.minimum
+                if self.minimum is None
+                else min(self.minimum, other.minimum)
+            )
+        if other.maximum is not None:
+            self.maximum = (
+                other.maximum
+                if self.maximum is None
+                else max(self.maximum, other.maximum)
+            )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "min": self.minimum,
+            "max": self.maximum,
+            "bounds": list(self.bounds),
+            "bucket_counts": list(self.bucket_counts),
+        }
+
+
+class TelemetrySink(ABC):
+    """Receives the rolled up statistics of a run."""
+
+    @abstractmethod
+    def export(self, run_id: str, statistics: Dict[str, Any]) -> None:
+        """
+        Export the statistics of a run, as returned by `Telemetry.snapshot`.
+        """
+
+
+class Telemetry:
+    """Timers, counters and histograms per stage of one run."""
+
+    enabled = True
+
+    def __init__(self, run_id: str, sinks: Sequence[TelemetrySink] = ()):
+        self.run_id = run_id
+        self.sinks = list(sinks)
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._histograms: Dict[str, Dict[str, Histogram]] = {}
+
+    def count(self, stage: str, name: str, value: float = 1) -> None:
+        """Add `value` to counter `name` of `stage`."""
+        with self._lock:
+            counters = self._counters.setdefault(stage, {})
+            counters[name] = counters.get(name, 0) + value
+
+    def observe(
+        self,
+        stage: str,
+        name: str,
+        value: float,
+        bounds: Sequence[float] = DURATION_BUCKETS,
+    ) -> None:
+        """Add `value` to histogram `name` of `stage`."""
+        with self._lock:
+            histograms = self._histograms.setdefault(stage, {})
+            if name not in histograms:
+                histograms[name] = Histogram(bounds)
+            histograms[name].observe(value)
+
+    @contextmanager
+    def timer(self, stage: str, name: str = "seconds") -> Iterator[None]:
+        """
+        Measure the duration of the block in histogram `name` of `stage`. The
+        duration is also recorded when the block raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, name, time.perf_counter() - start)
+
+    def merge(self, statistics: Dict[str, Any]) -> None:
+        """
+        Add the statistics of another Telemetry, e.g. of a worker process, as
+        returned by its `snapshot`.
+        """
+        for stage, values in statistics.get("stages", {}).items():
+            for name, value in values.get("counters", {}).items():
+                self.count(stage, name, value)
+            for name, data in values.get("histograms", {}).items():
+                other = Histogram(data["bounds"])
+                other.bucket_counts = list(data["bucket_counts"])
+                other.count = data["count"]
+                other.total = data["total"]
+                other.minimum = data["min"]
+                other.maximum = data["max"]
+                with self._lock:
+                    histograms = self._histograms.setdefault(stage, {})
+                    if name not in histograms:
+                        histograms[name] = Histogram(other.bounds)
+                    histograms[name].merge(other)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the statistics so far as JSON serializable dict:
+        `{"run_id", "start_time", "end_time", "stages": {stage: {"counters",
+        "histograms"}}}`.
+        """
+        with self._lock:
+            stages: Dict[str, Dict[str, Any]] = {}
+            for stage in sorted(set(self._counters) | set(self._histograms)):
+                stages[stage] = {
+                    "counters": dict(self._counters.get(stage, {})),
+                    "histograms": {
+                        name: histogram.to_dict()
+                        for name, histogram in self._histograms.get(stage, {}).items()
+                    },
+                }
+        return {
+            "run_id": self.run_id,
+            "start_time": self.start_time,
+            "end_time": time.time(),
+            "stages": stages,
+        }
+
+    def export(self) -> Dict[str, Any]:
+        """
+        Hand the statistics to all sinks. A failing sink is logged and does not
+        stop the others.
+
+        Returns
+        -------
+        The exported statistics.
+        """
+        statistics = self.snapshot()
+        for sink in self.sinks:
+            try:
+                sink.export(self.run_id, statistics)
+            except Exception:
+                logger.exception(
+                    f"Failed to export telemetry of run {self.run_id} to "
+                    f"{type(sink).__name__}."
+                )
+        return statistics
+
+
+class NoOpTelemetry(Telemetry):
+    """Telemetry that records nothing, used outside of a run."""
+
+    enabled = False
+
+    def __init__(self):
+        super().__init__(run_id="")
+
+    def count(self, stage: str, name: str, value: float = 1) -> None:
+        pass
+
+    def observe(self, stage, name, value, bounds=DURATION_BUCKETS) -> None:
+        pass
+
+    @contextmanager
+    def timer(self, stage: str, name: str = "seconds") -> Iterator[None]:
+        yield
+
+    def merge(self, statistics: Dict[str, Any]) -> None:
+        pass
+
+
+_NO_OP = NoOpTelemetry()
+_current: contextvars.ContextVar[Telemetry] = contextvars.ContextVar(
+    "cvtoolkit_telemetry", default=_NO_OP
+)
+
+
+def get_telemetry() -> Telemetry:
+    """Return the telemetry of the current run, or a no-op telemetry."""
+    return _current.get()
+
+
+def set_telemetry(telemetry: Optional[Telemetry]) -> None:
+    """
+    Make `telemetry` the telemetry of the current run in the current context,
+    e.g. thread; None disables it.
+    """
+    _current.set(telemetry if telemetry is not None else _NO_OP)
+
+
+@contextmanager
+def run_telemetry(
+    run_id: str, sinks: Sequence[TelemetrySink] = ()
+) -> Iterator[Telemetry]:
+    """
+    Record telemetry for run `run_id` while the block runs, and export it to
+    `sinks` at the end, also when the block raises.
+    """
+    telemetry = Telemetry(run_id, sinks)
+    token = _current.set(telemetry)
+    try:
+        yield telemetry
+    finally:
+        _current.reset(token)
+        telemetry.export()
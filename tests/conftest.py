@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from cvtoolkit.database import baas_tables  # noqa: F401, registers the tables
+from cvtoolkit.database.database_handler import DBConfigSQLAlchemy
+from cvtoolkit.database.token_providers import AccessToken, TokenProvider
+
+
+class FakeTokenProvider(TokenProvider):
+    """Returns fake tokens without any network access."""
+
+    def __init__(self, token: str = "fake-token", lifetime=timedelta(hours=1)):  # nosec
+        self.token = token
+        self.lifetime = lifetime
+        self.n_calls = 0
+
+    def get_token(self) -> AccessToken:
+        self.n_calls += 1
+        return AccessToken(self.token, datetime.now() + self.lifetime)
+
+
+def _sqlite_db_config(db_url, **engine_kwargs):
+    db_config = DBConfigSQLAlchemy(
+        db_username="test",
+        db_hostname="localhost",
+        db_name="test",
+        client_id="test",
+        token_provider=FakeTokenProvider(),
+    )
+    db_config.engine = create_engine(
+        db_url,
+        connect_args={"check_same_thread": False},
+        execution_options={"schema_translate_map": {"private_schema_blur": None}},
+        **engine_kwargs,
+    )
+    DBConfigSQLAlchemy.Base.metadata.create_all(db_config.engine)
+    db_config.session_maker = sessionmaker(
+        bind=db_config.engine, autoflush=False, autocommit=False
+    )
+    return db_config
+
+
+@pytest.fixture
+def sqlite_db_config():
+    """
+    DBConfigSQLAlchemy backed by an in-memory SQLite database, as a local
+    stand-in for the PostgreSQL database. The tables are created without their
+    schema, and the access tokens are fake. All sessions share one connection.
+    """
+    db_config = _sqlite_db_config("sqlite://", poolclass=StaticPool)
+    yield db_config
+    db_config.close_connection()
+
+
+@pytest.fixture
+def sqlite_file_db_config(tmp_path):
+    """
+    Like `sqlite_db_config`, but backed by a file with a pool of connections, so
+    concurrent sessions use separate connections and transactions.
+    """
+    db_config = _sqlite_db_config(f"sqlite:///{tmp_path / 'test.db'}")
+    yield db_config
+    db_config.close_connection()
+
+
+class FaultInjector:
+    """
+    Makes the next statements or commits of an engine fail with a (transient)
+    OperationalError, like a dropped connection.
+    """
+
+    def __init__(self, engine):
+        self.n_statement_failures = 0
+        self.n_commit_failures = 0
+        self.statement_prefix = ""
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "commit", self._commit)
+
+    def fail_statements(self, n: int, statement_prefix: str = ""):
+        self.n_statement_failures = n
+        self.statement_prefix = statement_prefix
+
+    def fail_commits(self, n: int):
+        self.n_commit_failures = n
+
+    def _before_cursor_execute(self, conn, cursor, statement, *args):
+        if self.n_statement_failures and statement.startswith(self.statement_prefix):
+            self.n_statement_failures -= 1
+            raise OperationalError(statement, None, Exception("connection lost"))
+
+    def _commit(self, conn):
+        if self.n_commit_failures:
+            self.n_commit_failures -= 1
+            raise OperationalError("COMMIT", None, Exception("connection lost"))
+
+
+@pytest.fixture
+def fault_injector(sqlite_db_config):
+    return FaultInjector(sqlite_db_config.engine)
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from cvtoolkit.converters.azure_coco_to_coco_converter import AzureCocoToCocoConverter
+
+test_coco_file = "tests/data/coco/azure_coco.json"
+# Output of the converter before it was rewritten as a single-pass transform.
+expected_coco_file = "tests/data/coco/expected_coco.json"
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize("batch_size", [2, 10000])
+def test_convert_matches_reference(tmp_path, streaming, batch_size):
+    output_file = tmp_path / "coco.json"
+    AzureCocoToCocoConverter(
+        test_coco_file,
+        str(output_file),
+        new_width=1920,
+        new_height=1080,
+        streaming=streaming,
+        batch_size=batch_size,
+    ).convert()
+
+    with open(expected_coco_file, "rb") as f:
+        assert output_file.read_bytes() == f.read()
+
+
+def test_convert_streaming_annotations_before_images(tmp_path):
+    with open(test_coco_file) as f:
+        coco = json.load(f)
+    reordered = {"annotations": coco.pop("annotations"), **coco}
+    input_file = tmp_path / "azure_coco.json"
+    input_file.write_text(json.dumps(reordered))
+
+    output_file = tmp_path / "coco.json"
+    AzureCocoToCocoConverter(
+        str(input_file), str(output_file), 1920, 1080, streaming=True
+    ).convert()
+
+    with open(expected_coco_file) as f:
+        assert json.loads(output_file.read_text()) == json.load(f)
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from cvtoolkit.converters.azure_coco_to_yolo_converter import AzureCocoToYoloConverter
+
+test_coco_file = "tests/data/coco/azure_coco.json"
+
+
+@pytest.mark.parametrize("num_workers", [0, 4])
+@pytest.mark.parametrize(
+    "tagged_data, expected_folder",
+    [
+        (False, "tests/data/coco/expected_yolo"),
+        (True, "tests/data/coco/expected_yolo_tagged"),
+    ],
+)
+def test_convert(tmp_path, num_workers, tagged_data, expected_folder):
+    AzureCocoToYoloConverter(
+        test_coco_file, str(tmp_path), tagged_data=tagged_data
+    ).convert(num_workers=num_workers)
+
+    assert sorted(os.listdir(tmp_path)) == sorted(os.listdir(expected_folder))
+    for file in os.listdir(expected_folder):
+        with open(os.path.join(expected_folder, file), "rb") as f:
+            expected = f.read()
+        assert (tmp_path / file).read_bytes() == expected
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from cvtoolkit.helpers.bbox_helpers import (
+    BOX_FORMATS,
+    box_area,
+    clip_boxes,
+    convert_boxes,
+    denormalize_boxes,
+    normalize_boxes,
+)
+
+xyxy_boxes = np.array([[10, 20, 50, 100], [0, 0, 1280, 720]], dtype=float)
+
+
+@pytest.mark.parametrize("source_format", BOX_FORMATS)
+@pytest.mark.parametrize("target_format", BOX_FORMATS)
+def test_convert_boxes_round_trip(source_format, target_format):
+    boxes = convert_boxes(xyxy_boxes, "xyxy", source_format)
+    converted = convert_boxes(boxes, source_format, target_format)
+    np.testing.assert_allclose(
+        convert_boxes(converted, target_format, "xyxy"), xyxy_boxes
+    )
+
+
+def test_convert_boxes_values():
+    np.testing.assert_array_equal(
+        convert_boxes(xyxy_boxes[:1], "xyxy", "cxcywh"), [[30, 60, 40, 80]]
+    )
+    np.testing.assert_array_equal(
+        convert_boxes(xyxy_boxes[:1], "xyxy", "xywh"), [[10, 20, 40, 80]]
+    )
+
+
+def test_normalize_and_area():
+    normalized = normalize_boxes(xyxy_boxes, (1280, 720))
+    np.testing.assert_array_equal(normalized[1], [0, 0, 1, 1])
+    np.testing.assert_allclose(denormalize_boxes(normalized, (1280, 720)), xyxy_boxes)
+    np.testing.assert_array_equal(box_area(xyxy_boxes), [3200, 1280 * 720])
+    np.testing.assert_array_equal(
+        box_area(convert_boxes(xyxy_boxes, "xyxy", "cxcywh"), "cxcywh"),
+        [3200, 1280 * 720],
+    )
+
+
+def test_clip_boxes():
+    np.testing.assert_array_equal(
+        clip_boxes([[-5, 10, 700, 800]], (640, 480)), [[0, 10, 640, 480]]
+    )
+
+
+def test_rejects_rows_that_are_not_boxes():
+    yolo_rows = np.array([[0, 0.5, 0.5, 0.1, 0.1, 0.9]])
+    with pytest.raises(ValueError):
+        convert_boxes(yolo_rows, "cxcywh", "xyxy")
+    assert convert_boxes(np.empty((0, 4)), "cxcywh", "xyxy").shape == (0, 4)
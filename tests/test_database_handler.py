@@ -0,0 +1,121 @@
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from conftest import FakeTokenProvider
+from sqlalchemy import text
+
+from cvtoolkit.database.connection_pool import PoolSettings
+from cvtoolkit.database.database_handler import DBConfigSQLAlchemy
+
+
+def _db_config(token_provider):
+    return DBConfigSQLAlchemy(
+        db_username="user",
+        db_hostname="localhost",
+        db_name="db",
+        client_id="client",
+        token_provider=token_provider,
+    )
+
+
+def test_token_is_provided_per_connection():
+    db_config = _db_config(FakeTokenProvider(token="secret"))  # nosec
+    assert "secret" not in db_config._get_db_connection_string()
+
+    cparams = {"host": "localhost"}
+    db_config._provide_token(None, None, [], cparams)
+    assert cparams == {"host": "localhost", "password": "secret"}
+
+
+def test_token_is_refreshed_in_the_background():
+    provider = FakeTokenProvider(lifetime=timedelta(seconds=1.2))
+    db_config = _db_config(provider)
+    db_config.token_renewal_margin = timedelta(seconds=0.2)
+    db_config.token_refresh_min_interval = timedelta(seconds=0.05)
+    db_config._validate_token_status()
+    db_config._start_token_refresh()
+    try:
+        # The first token is renewed after 1.2 - 2 * 0.2 seconds.
+        for _ in range(100):
+            if provider.n_calls > 1:
+                break
+            time.sleep(0.02)
+        assert provider.n_calls == 2
+        db_config._validate_token_status()
+        assert provider.n_calls == 2
+    finally:
+        db_config.close_connection()
+    assert db_config._token_refresh_thread is None
+
+
+def test_pool_statistics(tmp_path):
+    db_config = _db_config(FakeTokenProvider())
+    db_config.pool_settings = PoolSettings(pool_size=2, max_overflow=1)
+    db_config.create_connection(db_url=f"sqlite:///{tmp_path / 'test.db'}")
+    try:
+        with db_config.managed_session() as first, db_config.managed_session() as second:
+            first.execute(text("SELECT 1"))
+            second.execute(text("SELECT 1"))
+            statistics = db_config.get_pool_statistics()
+            assert statistics.checked_out == 2
+        with db_config.managed_session() as session:
+            session.execute(text("SELECT 1"))
+
+        statistics = db_config.get_pool_statistics()
+        assert statistics.checked_out == 0
+        assert statistics.n_checkouts == 3
+        assert statistics.n_connections_created == 2
+        assert statistics.size == 2
+    finally:
+        db_config.close_connection()
+    # No token is needed for an explicit database URL.
+    assert db_config.token_provider.n_calls == 0
+
+
+def test_scoped_sessions(tmp_path):
+    db_config = _db_config(FakeTokenProvider())
+    db_config.scoped_sessions = True
+    db_config.create_connection(db_url=f"sqlite:///{tmp_path / 'test.db'}")
+    sessions = []
+
+    def use_session():
+        with db_config.managed_session() as session:
+            sessions.append(session)
+        with db_config.managed_session() as session:
+            sessions.append(session)
+        db_config.remove_session()
+
+    try:
+        use_session()
+        thread = threading.Thread(target=use_session)
+        thread.start()
+        thread.join()
+    finally:
+        db_config.close_connection()
+    assert sessions[0] is sessions[1]
+    assert sessions[2] is sessions[3]
+    assert sessions[0] is not sessions[2]
+
+
+def test_nested_scoped_sessions_share_the_outer_transaction(tmp_path):
+    db_config = _db_config(FakeTokenProvider())
+    db_config.scoped_sessions = True
+    db_config.create_connection(db_url=f"sqlite:///{tmp_path / 'test.db'}")
+    try:
+        with db_config.managed_session() as session:
+            session.execute(text("CREATE TABLE numbers (value INTEGER)"))
+        with pytest.raises(ValueError):
+            with db_config.managed_session() as outer:
+                outer.execute(text("INSERT INTO numbers VALUES (1)"))
+                with db_config.managed_session() as inner:
+                    assert inner is outer
+                    inner.execute(text("INSERT INTO numbers VALUES (2)"))
+                # The inner block did not commit or close the outer transaction.
+                assert outer.in_transaction()
+                raise ValueError("roll back both inserts")
+        with db_config.managed_session() as session:
+            assert session.scalar(text("SELECT COUNT(*) FROM numbers")) == 0
+    finally:
+        db_config.close_connection()
@@ -0,0 +1,143 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from cvtoolkit.database.baas_tables import DetectionInformation, ImageProcessingStatus
+from cvtoolkit.database.detection_sink import DetectionSink
+from cvtoolkit.database.detection_writer import DetectionWriter, ImageMetadata
+from cvtoolkit.database.retry import RetryPolicy
+from cvtoolkit.database.status_tracker import (
+    DONE,
+    PROCESSING,
+    QUEUED,
+    ImageKey,
+    StatusTracker,
+)
+from cvtoolkit.telemetry.telemetry import run_telemetry
+
+upload_date = datetime(2024, 5, 1)
+
+
+def _metadata(image_filename):
+    return ImageMetadata("customer", upload_date, image_filename, 1920, 1080, "run")
+
+
+def _count(db_config, table):
+    with db_config.managed_session() as session:
+        return session.scalar(select(func.count()).select_from(table))
+
+
+class BlockingWriter(DetectionWriter):
+    def __init__(self, db_config):
+        super().__init__(db_config)
+        self.release = threading.Event()
+
+    def write_batch(self, session, batch):
+        self.release.wait()
+        super().write_batch(session, batch)
+
+
+def test_close_flushes_everything(sqlite_db_config):
+    with DetectionSink(sqlite_db_config, flush_size=4, flush_interval=60) as sink:
+        for i in range(5):
+            sink.put_detections(np.random.rand(3, 6).astype("f"), _metadata(f"{i}"))
+            sink.put_status("customer", upload_date, f"{i}", "processing")
+            sink.put_status("customer", upload_date, f"{i}", "done")
+
+    assert _count(sqlite_db_config, DetectionInformation) == 15
+    with sqlite_db_config.managed_session() as session:
+        statuses = session.scalars(select(ImageProcessingStatus.processing_status))
+        assert list(statuses) == ["done"] * 5
+    statistics = sink.get_statistics()
+    assert statistics.n_detection_rows == 15
+    assert statistics.n_flushes >= 2
+    assert statistics.queue_depth == 0
+
+
+def test_flush_interval(sqlite_db_config):
+    with DetectionSink(sqlite_db_config, flush_interval=0.05) as sink:
+        sink.put_detections(None, _metadata("a"))
+        for _ in range(100):
+            if sink.get_statistics().n_flushes:
+                break
+            time.sleep(0.01)
+        assert _count(sqlite_db_config, DetectionInformation) == 1
+
+
+def test_backpressure(sqlite_db_config):
+    writer = BlockingWriter(sqlite_db_config)
+    sink = DetectionSink(
+        sqlite_db_config, max_queue_size=2, put_timeout=0.05, writer=writer
+    )
+    sink.put_detections(None, _metadata("0"))
+    sink.flush(timeout=0)
+    # The flush thread is now blocked in the writer, so the queue fills up.
+    sink.put_detections(None, _metadata("1"))
+    sink.put_detections(None, _metadata("2"))
+    with pytest.raises(queue.Full):
+        sink.put_detections(None, _metadata("3"))
+    assert sink.get_statistics().max_queue_depth == 2
+
+    writer.release.set()
+    sink.close()
+    assert _count(sqlite_db_config, DetectionInformation) == 3
+
+
+class FailingWriter(DetectionWriter):
+    def write_batch(self, session, batch):
+        raise OperationalError("INSERT", {}, Exception("connection lost"))
+
+
+def test_failed_flush_is_raised_on_close(sqlite_db_config):
+    writer = FailingWriter(
+        sqlite_db_config, retry_policy=RetryPolicy(max_attempts=2, initial_delay=0)
+    )
+    sink = DetectionSink(sqlite_db_config, writer=writer)
+    with pytest.raises(IndexError):
+        sink.put_detections(np.ones((1, 4)), _metadata("a"))
+    sink.put_detections(np.ones((1, 6)), _metadata("a"))
+    assert sink.flush(timeout=5)
+    assert sink.get_statistics().n_failed_flushes == 1
+    with pytest.raises(RuntimeError):
+        sink.close()
+
+
+def test_statuses_in_one_flush_are_applied_in_order(sqlite_db_config):
+    tracker = StatusTracker(sqlite_db_config)
+    tracker.set_status([ImageKey("customer", upload_date, "a")], QUEUED)
+    with DetectionSink(sqlite_db_config, flush_interval=60) as sink:
+        sink.put_status("customer", upload_date, "a", PROCESSING)
+        sink.put_status("customer", upload_date, "a", DONE)
+    assert tracker.count_by_status() == {DONE: 1}
+    assert sink.get_statistics().n_status_rows == 2
+
+
+def test_unknown_status_is_raised_in_caller(sqlite_db_config):
+    with DetectionSink(sqlite_db_config, flush_interval=60) as sink:
+        sink.put_detections(np.ones((1, 6)), _metadata("a"))
+        with pytest.raises(ValueError):
+            sink.put_status("customer", upload_date, "a", "skipped")
+    statistics = sink.get_statistics()
+    assert statistics.n_detection_rows == 1
+    assert statistics.n_dropped_rows == 0
+
+
+def test_failed_flush_is_timed_like_the_writer(sqlite_db_config):
+    writer = FailingWriter(
+        sqlite_db_config, retry_policy=RetryPolicy(max_attempts=1, initial_delay=0)
+    )
+    with run_telemetry("run") as telemetry:
+        sink = DetectionSink(sqlite_db_config, writer=writer)
+        sink.put_detections(np.ones((1, 6)), _metadata("a"))
+        sink.flush(timeout=5)
+        with pytest.raises(RuntimeError):
+            sink.close()
+    db_write = telemetry.snapshot()["stages"]["db_write"]
+    assert db_write["histograms"]["seconds"]["count"] == 1
+    assert db_write["counters"] == {}
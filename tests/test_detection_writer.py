@@ -0,0 +1,76 @@
+import csv
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from cvtoolkit.database.baas_tables import DetectionInformation
+from cvtoolkit.database.detection_writer import (
+    DETECTION_COLUMNS,
+    DetectionWriter,
+    ImageMetadata,
+    detection_rows,
+    rows_to_csv,
+)
+
+
+def _metadata(image_filename):
+    return ImageMetadata(
+        image_customer_name="customer",
+        image_upload_date=datetime(2024, 5, 1, 12, 30),
+        image_filename=image_filename,
+        image_width=1920,
+        image_height=1080,
+        run_id="run",
+    )
+
+
+def test_detection_rows():
+    detections = np.array(
+        [[0, 0.5, 0.5, 0.1, 0.2, 0.9], [1, 0.1, 0.2, 0.3, 0.4, 0.5]], dtype="f"
+    )
+    rows = detection_rows(detections, _metadata("a.jpg"))
+    assert len(rows) == 2
+    assert rows[1]["class_id"] == 1 and rows[1]["has_detection"]
+    assert rows[0]["conf_score"] == pytest.approx(0.9)
+
+    rows = detection_rows(detections[:, :5], _metadata("a.jpg"))
+    assert rows[0]["conf_score"] is None
+
+    rows = detection_rows(np.empty((0, 6)), _metadata("b.jpg"))
+    assert len(rows) == 1
+    assert not rows[0]["has_detection"] and rows[0]["class_id"] is None
+
+
+def test_rows_to_csv():
+    rows = detection_rows(np.empty((0, 6)), _metadata("b.jpg"))
+    (line,) = csv.reader(rows_to_csv(rows))
+    values = dict(zip(DETECTION_COLUMNS, line))
+    assert values["has_detection"] == "false"
+    assert values["image_upload_date"] == "2024-05-01T12:30:00"
+    assert values["class_id"] == ""
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 1000])
+def test_write_many(sqlite_db_config, batch_size):
+    rng = np.random.default_rng(0)
+    items = [
+        (rng.random((n, 6)).astype("f"), _metadata(f"{i}.jpg"))
+        for i, n in enumerate([4, 0, 2])
+    ]
+    # use_copy falls back to INSERT on SQLite.
+    writer = DetectionWriter(sqlite_db_config, batch_size=batch_size, use_copy=True)
+    assert writer.write_many(items) == 7
+
+    with sqlite_db_config.managed_session() as session:
+        written = session.scalars(
+            select(DetectionInformation).order_by(DetectionInformation.id)
+        ).all()
+        filenames = [row.image_filename for row in written]
+        has_detection = [row.has_detection for row in written]
+        first = written[0]
+        assert first.x_norm == pytest.approx(items[0][0][0, 1])
+        assert first.image_upload_date == datetime(2024, 5, 1, 12, 30)
+    assert filenames == ["0.jpg"] * 4 + ["1.jpg"] + ["2.jpg"] * 2
+    assert has_detection.count(False) == 1
@@ -0,0 +1,184 @@
+import errno
+import hashlib
+import os
+import shutil
+import stat
+from unittest import mock
+
+import pytest
+
+from cvtoolkit.helpers.file_helpers import (
+    CopyError,
+    _scan_directory,
+    copy_file,
+    copy_files,
+    find_image_paths,
+    iter_copy_files,
+    iter_image_paths,
+)
+
+
+def _write(path, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+@pytest.fixture
+def source_folder(tmp_path):
+    folder = str(tmp_path / "source")
+    for i in range(20):
+        _write(f"{folder}/day_{i % 3}/image_{i}.jpg", bytes([i]) * (1000 * i))
+    return folder
+
+
+def _relative_paths():
+    return [f"/day_{i % 3}/image_{i}.jpg" for i in range(20)]
+
+
+def test_copy_file(source_folder, tmp_path):
+    output_path = str(tmp_path / "output")
+    os.chmod(f"{source_folder}/day_1/image_1.jpg", 0o600)
+    copy_file("/day_1/image_1.jpg", source_folder, output_path)
+
+    with open(f"{output_path}/day_1/image_1.jpg", "rb") as f:
+        assert f.read() == bytes([1]) * 1000
+    mode = os.stat(f"{output_path}/day_1/image_1.jpg").st_mode
+    assert stat.S_IMODE(mode) == 0o600
+
+    # A missing source is skipped.
+    copy_file("/missing.jpg", source_folder, output_path)
+    assert not os.path.exists(f"{output_path}/missing.jpg")
+
+
+@pytest.mark.parametrize("num_workers", [0, 4])
+def test_copy_files(source_folder, tmp_path, num_workers):
+    output_path = str(tmp_path / "output")
+    relative_paths = _relative_paths() + ["/day_0/missing.jpg"]
+    report = copy_files(relative_paths, source_folder, output_path, num_workers)
+
+    assert (report.n_files, report.n_copied) == (21, 20)
+    assert report.n_bytes == sum(1000 * i for i in range(20))
+    assert [result.relative_path for result in report.failed] == ["/day_0/missing.jpg"]
+    assert isinstance(report.failed[0].error, FileNotFoundError)
+    for relative_path in _relative_paths():
+        with open(source_folder + relative_path, "rb") as f_in:
+            with open(output_path + relative_path, "rb") as f_out:
+                assert f_in.read() == f_out.read()
+
+    with pytest.raises(CopyError, match="missing.jpg"):
+        report.raise_on_error()
+
+
+def test_copy_files_creates_each_directory_once(source_folder, tmp_path):
+    with mock.patch("os.makedirs", wraps=os.makedirs) as makedirs:
+        copy_files(_relative_paths(), source_folder, str(tmp_path / "output"), 0)
+    created = [call.args[0] for call in makedirs.call_args_list]
+    for day in range(3):
+        assert created.count(str(tmp_path / "output" / f"day_{day}")) == 1
+
+
+def test_iter_copy_files_is_lazy(source_folder, tmp_path):
+    consumed = []
+
+    def relative_paths():
+        for path in _relative_paths():
+            consumed.append(path)
+            yield path
+
+    results = iter_copy_files(
+        relative_paths(), source_folder, str(tmp_path / "output"), num_workers=1
+    )
+    next(results)
+    assert len(consumed) < 20
+    assert len(list(results)) == 19
+
+
+def test_copy_files_with_checksum_reads_source_once(source_folder, tmp_path):
+    output_path = str(tmp_path / "output")
+    with mock.patch("builtins.open", wraps=open) as opened:
+        results = list(
+            iter_copy_files(
+                ["/day_2/image_5.jpg"], source_folder, output_path, checksum="sha256"
+            )
+        )
+    assert [call.args[1] for call in opened.call_args_list] == ["rb", "wb"]
+    assert results[0].ok
+    assert results[0].checksum == hashlib.sha256(bytes([5]) * 5000).hexdigest()
+    with open(f"{output_path}/day_2/image_5.jpg", "rb") as f:
+        assert f.read() == bytes([5]) * 5000
+
+
+@pytest.mark.parametrize("unsupported", ["copy_file_range", "sendfile"])
+def test_copy_files_falls_back(source_folder, tmp_path, unsupported):
+    def fail(*args):
+        raise OSError(errno.EXDEV, "cross-device link")
+
+    output_path = str(tmp_path / "output")
+    with mock.patch(f"os.{unsupported}", fail, create=True):
+        report = copy_files(_relative_paths(), source_folder, output_path)
+    assert report.ok
+    with open(f"{output_path}/day_2/image_5.jpg", "rb") as f:
+        assert f.read() == bytes([5]) * 5000
+
+
+def test_copy_files_falls_back_when_nothing_is_copied(source_folder, tmp_path):
+    # Some network and FUSE file systems copy nothing instead of failing.
+    output_path = str(tmp_path / "output")
+    with mock.patch("os.copy_file_range", lambda *args: 0, create=True):
+        with mock.patch("os.sendfile", lambda *args: 0, create=True):
+            report = copy_files(_relative_paths(), source_folder, output_path)
+    assert report.ok
+    with open(f"{output_path}/day_2/image_5.jpg", "rb") as f:
+        assert f.read() == bytes([5]) * 5000
+
+
+def test_copy_file_to_itself(source_folder):
+    with pytest.raises(shutil.SameFileError):
+        copy_file("/day_1/image_1.jpg", source_folder, source_folder)
+    with open(f"{source_folder}/day_1/image_1.jpg", "rb") as f:
+        assert f.read() == bytes([1]) * 1000
+
+
+@pytest.fixture
+def image_tree(tmp_path):
+    root = str(tmp_path / "images")
+    names = ["a.jpg", "b.JPG", "c.png", "labels.txt", "jpg"]
+    for folder in ["", "/day_1", "/day_1/camera", "/day_2"]:
+        for name in names:
+            _write(f"{root}{folder}/{name}", b"")
+    os.symlink(f"{root}/day_1", f"{root}/link")
+    # Directories that were modified a while ago can be indexed.
+    for folder, _, _ in os.walk(root):
+        os.utime(folder, ns=(0, 10**18))
+    expected = sorted(
+        os.path.join(folder, name)
+        for folder in [root, f"{root}/day_1", f"{root}/day_1/camera", f"{root}/day_2"]
+        for name in ["a.jpg", "b.JPG", "c.png"]
+    )
+    return root, expected
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_find_image_paths(image_tree, num_workers):
+    root, expected = image_tree
+    assert sorted(find_image_paths(root, num_workers=num_workers)) == expected
+
+
+def test_iter_image_paths_with_index(image_tree, tmp_path):
+    root, expected = image_tree
+    index_path = str(tmp_path / "index.json")
+    assert sorted(iter_image_paths(root, index_path=index_path)) == expected
+
+    with mock.patch(
+        "cvtoolkit.helpers.file_helpers._scan_directory", wraps=_scan_directory
+    ) as scan_directory:
+        assert sorted(iter_image_paths(root, index_path=index_path)) == expected
+        assert scan_directory.call_count == 0
+
+        _write(f"{root}/day_2/d.jpeg", b"")
+        paths = sorted(iter_image_paths(root, num_workers=2, index_path=index_path))
+        assert paths == sorted(expected + [f"{root}/day_2/d.jpeg"])
+        assert [call.args for call in scan_directory.call_args_list] == [
+            (f"{root}/day_2",)
+        ]
@@ -0,0 +1,105 @@
+import os
+from unittest import mock
+
+import pytest
+
+from cvtoolkit.datasets.image_label_index import ImageLabelIndex, image_stem
+from cvtoolkit.datasets.yolo_labels_dataset import YoloLabelsDataset
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+
+
+@pytest.fixture
+def folders(tmp_path):
+    image_folder, label_folder = str(tmp_path / "images"), str(tmp_path / "labels")
+    for image in [
+        "day_1/a.jpg",
+        "day_1/b.JPG",
+        "day_2/c.png",
+        "day_2/a.jpg",
+        "d.jpg",
+        "f.1.jpg",
+    ]:
+        _touch(f"{image_folder}/{image}")
+    for label in [
+        "a.txt",
+        "b.txt",
+        "c.txt",
+        "e.txt",
+        "f.1.txt",
+        ".hidden.txt",
+        "notes.md",
+    ]:
+        _touch(f"{label_folder}/{label}")
+    for folder in [image_folder, f"{image_folder}/day_1", f"{image_folder}/day_2"]:
+        os.utime(folder, ns=(0, 10**18))
+    os.utime(label_folder, ns=(0, 10**18))
+    return image_folder, label_folder
+
+
+def test_pairing(folders):
+    image_folder, label_folder = folders
+    index = ImageLabelIndex(image_folder, label_folder)
+
+    assert sorted(index.pairs()) == [
+        (f"{image_folder}/day_1/b.JPG", f"{label_folder}/b.txt"),
+        (f"{image_folder}/day_2/c.png", f"{label_folder}/c.txt"),
+        (f"{image_folder}/f.1.jpg", f"{label_folder}/f.1.txt"),
+    ]
+    assert index.images_without_labels() == [f"{image_folder}/d.jpg"]
+    assert index.labels_without_images() == [f"{label_folder}/e.txt"]
+    assert {stem: sorted(paths) for stem, paths in index.ambiguous_stems().items()} == {
+        "a": [f"{image_folder}/day_1/a.jpg", f"{image_folder}/day_2/a.jpg"]
+    }
+    report = index.report()
+    assert (report.n_images, report.n_labels, report.n_pairs) == (6, 5, 3)
+    assert report.n_ambiguous_stems == 1
+
+    index.remove_images([f"{image_folder}/day_2/a.jpg"])
+    index.add_labels(["d.txt"])
+    index.remove_labels([f"{label_folder}/e.txt"])
+    assert index.label_path(f"{image_folder}/day_1/a.jpg") == f"{label_folder}/a.txt"
+    assert len(index.pairs()) == 5
+    assert index.images_without_labels() == index.labels_without_images() == []
+
+
+def test_refresh_with_cache(folders, tmp_path):
+    image_folder, label_folder = folders
+    cache_path = str(tmp_path / "cache" / "pairs.json")
+    ImageLabelIndex(image_folder, label_folder, cache_path=cache_path)
+
+    with mock.patch(
+        "cvtoolkit.datasets.image_label_index._list_label_files"
+    ) as list_label_files, mock.patch(
+        "cvtoolkit.helpers.file_helpers._scan_directory"
+    ) as scan_directory:
+        index = ImageLabelIndex(image_folder, label_folder, cache_path=cache_path)
+        assert list_label_files.call_count == scan_directory.call_count == 0
+    assert index.report().n_pairs == 3
+
+    _touch(f"{image_folder}/day_1/e.jpg")
+    index.refresh()
+    assert (f"{image_folder}/day_1/e.jpg", f"{label_folder}/e.txt") in index.pairs()
+
+
+def test_multi_dot_names_use_dataset_image_ids(tmp_path):
+    image_folder, label_folder = str(tmp_path / "images"), str(tmp_path / "labels")
+    for image in ["x.jpg", "a.b.jpg"]:
+        _touch(f"{image_folder}/{image}")
+    os.makedirs(label_folder)
+    for label in ["x.jpg.txt", "a.b.txt"]:
+        with open(f"{label_folder}/{label}", "w") as f:
+            f.write("0 0.5 0.5 0.1 0.1\n")
+
+    index = ImageLabelIndex(image_folder, label_folder)
+    assert sorted(index.pairs()) == [
+        (f"{image_folder}/a.b.jpg", f"{label_folder}/a.b.txt"),
+        (f"{image_folder}/x.jpg", f"{label_folder}/x.jpg.txt"),
+    ]
+    dataset = YoloLabelsDataset(label_folder, image_area=100)
+    assert sorted(dataset.get_labels()) == sorted(
+        image_stem(label_path) for _, label_path in index.pairs()
+    )
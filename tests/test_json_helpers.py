@@ -0,0 +1,45 @@
+import io
+import json
+
+import pytest
+
+from cvtoolkit.helpers.json_helpers import iter_json_array, iter_json_object
+
+NUMBERS = [1.25, 2.5e3, 3.75, -0.5, 10, 1e-7, -12e10] * 20
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 7, 11, 38])
+def test_iter_json_array_numbers(tmp_path, chunk_size):
+    json_file = tmp_path / "numbers.json"
+    json_file.write_text(json.dumps(NUMBERS))
+    assert list(iter_json_array(str(json_file), chunk_size=chunk_size)) == NUMBERS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 13])
+def test_iter_json_object_scalar_values(chunk_size):
+    document = {
+        "width": 1920,
+        "ratio": 1.25,
+        "scale": 2.5e-3,
+        "annotations": [{"bbox": [0.0, 0.5, 1.0, 0.75]}, {"bbox": [1, 2, 3, 4]}],
+        "flag": True,
+        "name": "coco",
+        "last": -7.5,
+    }
+    stream = iter_json_object(
+        io.StringIO(json.dumps(document)),
+        stream_keys=["annotations"],
+        chunk_size=chunk_size,
+    )
+    result = {
+        key: list(value) if key == "annotations" else value for key, value in stream
+    }
+    assert result == document
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 20])
+def test_iter_json_array_under_key(tmp_path, chunk_size):
+    json_file = tmp_path / "coco.json"
+    json_file.write_text(json.dumps({"info": {}, "annotations": NUMBERS[:10]}))
+    items = iter_json_array(str(json_file), key="annotations", chunk_size=chunk_size)
+    assert list(items) == NUMBERS[:10]
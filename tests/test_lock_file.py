@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from cvtoolkit.multiprocessing.lock_file import FileLock, LockFile, LockTimeout
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = str(tmp_path / "data.txt")
+    with open(path, "w") as f:
+        f.write("0")
+    return path
+
+
+def _increment(path, n):
+    for _ in range(n):
+        with LockFile(path, mode="r+") as f:
+            value = int(f.read())
+            f.seek(0)
+            f.write(str(value + 1))
+            f.truncate()
+
+
+def _hold_and_crash(lock_path):
+    FileLock(lock_path).acquire()
+    os._exit(1)
+
+
+def test_lock_file_reads_locked_file(data_file):
+    with LockFile(data_file) as f:
+        assert f.read() == "0"
+        assert not FileLock(data_file + ".flock").acquire(blocking=False)
+    assert FileLock(data_file + ".flock").acquire(blocking=False)
+
+
+def test_shared_and_exclusive_locks(tmp_path):
+    lock_path = str(tmp_path / "file.flock")
+    readers = [FileLock(lock_path, shared=True) for _ in range(2)]
+    assert all(reader.acquire(blocking=False) for reader in readers)
+    writer = FileLock(lock_path)
+    assert not writer.acquire(blocking=False)
+
+    start = time.monotonic()
+    assert not writer.acquire(timeout=0.1)
+    assert time.monotonic() - start >= 0.1
+
+    for reader in readers:
+        reader.release()
+    assert writer.acquire(timeout=0.1)
+    assert not FileLock(lock_path, shared=True).acquire(blocking=False)
+    writer.release()
+
+
+def test_lock_file_timeout(data_file):
+    with FileLock(data_file + ".flock"):
+        with pytest.raises(LockTimeout):
+            with LockFile(data_file, timeout=0.05):
+                pass
+        with pytest.raises(LockTimeout):
+            with LockFile(data_file, blocking=False):
+                pass
+
+
+def test_missing_file_releases_lock(tmp_path):
+    path = str(tmp_path / "missing.txt")
+    with pytest.raises(FileNotFoundError):
+        with LockFile(path):
+            pass
+    assert FileLock(path + ".flock").acquire(blocking=False)
+
+
+def test_lock_of_crashed_process_is_released(tmp_path):
+    lock_path = str(tmp_path / "file.flock")
+    process = multiprocessing.Process(target=_hold_and_crash, args=(lock_path,))
+    process.start()
+    process.join()
+    assert FileLock(lock_path).acquire(timeout=1)
+
+
+def test_recovers_legacy_lock(data_file):
+    os.rename(data_file, data_file + ".lock")
+    with pytest.raises(FileNotFoundError):
+        with LockFile(data_file):
+            pass
+    # A file that was renamed recently may still be held by the old LockFile.
+    with pytest.raises(FileNotFoundError):
+        with LockFile(data_file, legacy_stale_after=60):
+            pass
+    with LockFile(data_file, legacy_stale_after=0) as f:
+        assert f.read() == "0"
+    assert os.path.exists(data_file)
+
+
+def test_mutual_exclusion_between_processes(data_file):
+    processes = [
+        multiprocessing.Process(target=_increment, args=(data_file, 50))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    with open(data_file) as f:
+        assert f.read() == "200"
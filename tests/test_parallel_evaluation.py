@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pytest
+
+from cvtoolkit.datasets.yolo_labels_dataset import YoloLabelsDataset
+from cvtoolkit.metrics.parallel_evaluation import (
+    evaluate_mask_folders,
+    evaluate_yolo_datasets,
+)
+from cvtoolkit.metrics.total_blurred_area import TotalBlurredArea
+
+img_shape = (64, 48)
+
+
+def _write_labels(folder, labels):
+    os.makedirs(folder)
+    for image_id, lines in labels.items():
+        with open(f"{folder}/{image_id}.txt", "w") as f:
+            f.write("\n".join(" ".join(str(v) for v in line) for line in lines))
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_evaluate_mask_folders(tmp_path, num_workers):
+    rng = np.random.default_rng(0)
+    os.makedirs(tmp_path / "true")
+    os.makedirs(tmp_path / "predicted")
+    expected = TotalBlurredArea()
+    for i in range(5):
+        true_mask = rng.random((img_shape[1], img_shape[0])) > 0.5
+        predicted_mask = rng.random((img_shape[1], img_shape[0])) > 0.5
+        np.save(tmp_path / "true" / f"{i}.npy", true_mask)
+        if i == 4:
+            # Missing prediction counts as an empty mask.
+            predicted_mask[:] = False
+        else:
+            np.save(tmp_path / "predicted" / f"{i}.npy", predicted_mask)
+        expected.update_statistics_based_on_masks(true_mask, predicted_mask)
+
+    result = evaluate_mask_folders(
+        str(tmp_path / "true"),
+        str(tmp_path / "predicted"),
+        num_workers=num_workers,
+        chunk_size=2,
+    )
+    assert result.get_statistics() == expected.get_statistics()
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_evaluate_yolo_datasets(tmp_path, num_workers):
+    true_labels = {
+        "a": [[0, 0.5, 0.5, 0.2, 0.2], [1, 0.1, 0.1, 0.1, 0.1]],
+        "b": [[0, 0.3, 0.6, 0.4, 0.2]],
+    }
+    predicted_labels = {
+        "a": [[0, 0.45, 0.5, 0.2, 0.3, 0.9]],
+        "c": [[1, 0.7, 0.7, 0.1, 0.2, 0.8]],
+    }
+    _write_labels(tmp_path / "true", true_labels)
+    _write_labels(tmp_path / "predicted", predicted_labels)
+    image_area = img_shape[0] * img_shape[1]
+    true_dataset = YoloLabelsDataset(str(tmp_path / "true"), image_area)
+    predicted_dataset = YoloLabelsDataset(str(tmp_path / "predicted"), image_area)
+
+    expected = TotalBlurredArea()
+    for image_id in ["a", "b", "c"]:
+        expected.update_statistics_based_on_boxes(
+            np.array(true_labels.get(image_id, []), dtype=np.float32),
+            np.array(predicted_labels.get(image_id, []), dtype=np.float32),
+            img_shape,
+        )
+
+    result = evaluate_yolo_datasets(
+        true_dataset,
+        predicted_dataset,
+        img_shape,
+        num_workers=num_workers,
+        chunk_size=1,
+    )
+    assert result.get_statistics() == expected.get_statistics()
+    assert result.tp > 0 and result.fp > 0 and result.fn > 0
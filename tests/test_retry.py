@@ -0,0 +1,106 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from cvtoolkit.database.baas_tables import DetectionInformation
+from cvtoolkit.database.detection_writer import DetectionWriter
+from cvtoolkit.database.retry import (
+    RetryPolicy,
+    is_transient_error,
+    retry_transaction,
+    run_in_transaction,
+)
+
+fast_retries = RetryPolicy(max_attempts=3, initial_delay=0)
+
+
+def _rows(n):
+    return [
+        {
+            "image_customer_name": "customer",
+            "image_upload_date": None,
+            "image_filename": f"{i}.jpg",
+            "has_detection": False,
+            "class_id": None,
+            "x_norm": None,
+            "y_norm": None,
+            "w_norm": None,
+            "h_norm": None,
+            "image_width": 1920,
+            "image_height": 1080,
+            "run_id": "run",
+            "conf_score": None,
+        }
+        for i in range(n)
+    ]
+
+
+def _count(session):
+    return session.scalar(select(func.count()).select_from(DetectionInformation))
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(initial_delay=1, max_delay=5, multiplier=2)
+    assert all(0 <= policy.delay(1) <= 1 for _ in range(100))
+    assert all(0 <= policy.delay(10) <= 5 for _ in range(100))
+
+
+def test_is_transient_error():
+    assert is_transient_error(OperationalError("SELECT 1", None, Exception()))
+    assert not is_transient_error(IntegrityError("INSERT", None, Exception()))
+    assert not is_transient_error(ValueError())
+    assert not is_transient_error(
+        OperationalError("SELECT", None, sqlite3.OperationalError("no such table"))
+    )
+    assert is_transient_error(
+        OperationalError("SELECT", None, sqlite3.OperationalError("database is locked"))
+    )
+
+
+def test_writer_retries_failed_batches(sqlite_db_config, fault_injector):
+    writer = DetectionWriter(sqlite_db_config, batch_size=4, retry_policy=fast_retries)
+    fault_injector.fail_statements(2, "INSERT")
+    assert writer.write_rows(_rows(10)) == 10
+
+    with sqlite_db_config.managed_session() as session:
+        assert _count(session) == 10
+
+
+def test_gives_up_after_max_attempts(sqlite_db_config, fault_injector):
+    writer = DetectionWriter(sqlite_db_config, retry_policy=fast_retries)
+    fault_injector.fail_statements(3, "INSERT")
+    with pytest.raises(OperationalError):
+        writer.write_rows(_rows(2))
+    with sqlite_db_config.managed_session() as session:
+        assert _count(session) == 0
+
+
+def test_permanent_errors_are_not_retried(sqlite_db_config):
+    calls = []
+
+    @retry_transaction(sqlite_db_config, fast_retries)
+    def fail(session):
+        calls.append(session)
+        raise IntegrityError("INSERT", None, Exception())
+
+    with pytest.raises(IntegrityError):
+        fail()
+    assert len(calls) == 1
+
+
+def test_commit_failures_are_only_retried_when_idempotent(
+    sqlite_db_config, fault_injector
+):
+    def work(session):
+        return _count(session)
+
+    fault_injector.fail_commits(1)
+    with pytest.raises(OperationalError):
+        run_in_transaction(sqlite_db_config, work, fast_retries)
+
+    fault_injector.fail_commits(1)
+    assert (
+        run_in_transaction(sqlite_db_config, work, fast_retries, idempotent=True) == 0
+    )
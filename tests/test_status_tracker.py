@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from cvtoolkit.database.status_tracker import (
+    DONE,
+    FAILED,
+    PROCESSING,
+    QUEUED,
+    ImageKey,
+    StatusTracker,
+)
+
+start = datetime(2024, 5, 1)
+
+
+def _images(n, customer="customer"):
+    return [
+        ImageKey(customer, start + timedelta(minutes=i), f"{i}.jpg") for i in range(n)
+    ]
+
+
+def test_set_status_follows_transitions(sqlite_db_config):
+    tracker = StatusTracker(sqlite_db_config, chunk_size=3)
+    images = _images(10)
+    assert tracker.set_status(images, QUEUED) == 10
+    assert tracker.count_by_status() == {QUEUED: 10}
+
+    # queued -> done is not allowed, queued -> processing is.
+    assert tracker.set_status(images[:4], DONE) == 0
+    assert tracker.set_status(images[:4], PROCESSING) == 4
+    assert tracker.set_status(images[:2], DONE) == 2
+    assert tracker.set_status(images[2:4], FAILED) == 2
+    # failed -> queued is allowed, done -> queued is not.
+    assert tracker.set_status(images[:4], QUEUED) == 2
+    assert tracker.count_by_status() == {QUEUED: 8, DONE: 2}
+
+    with pytest.raises(ValueError):
+        tracker.set_status(images, "unknown")
+
+
+def test_claim_next(sqlite_db_config):
+    tracker = StatusTracker(sqlite_db_config)
+    images = _images(5)
+    others = [image._replace(image_customer_name="other") for image in _images(7)[5:]]
+    tracker.set_status(images[::-1] + others, QUEUED)
+
+    assert sorted(tracker.claim_next(3)) == images[:3]
+    assert sorted(tracker.claim_next(10, image_customer_name="other")) == others
+    assert sorted(tracker.claim_next(10)) == images[3:]
+    assert tracker.claim_next(10) == []
+    assert tracker.count_by_status() == {PROCESSING: 7}
+
+
+def test_concurrent_claims_do_not_overlap(sqlite_file_db_config):
+    tracker = StatusTracker(sqlite_file_db_config)
+    tracker.set_status(_images(200), QUEUED)
+    claimed, lock = [], threading.Lock()
+
+    def worker():
+        while images := tracker.claim_next(7):
+            with lock:
+                claimed.extend(images)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(claimed) == len(set(claimed)) == 200
+    assert tracker.count_by_status() == {PROCESSING: 200}
+
+
+def test_unsupported_database_fails_early(sqlite_db_config, monkeypatch):
+    monkeypatch.setattr(sqlite_db_config.engine.dialect, "name", "mssql")
+    with pytest.raises(ValueError, match="postgresql"):
+        StatusTracker(sqlite_db_config)
+
+    monkeypatch.setattr(sqlite_db_config, "engine", None)
+    with pytest.raises(ValueError, match="open database connection"):
+        StatusTracker(sqlite_db_config)
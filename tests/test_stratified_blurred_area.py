@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from cvtoolkit.datasets.yolo_labels_dataset import YoloLabelsDataset
+from cvtoolkit.metrics.stratified_blurred_area import StratifiedBlurredArea
+from cvtoolkit.metrics.total_blurred_area import TotalBlurredArea
+
+img_shape = (320, 240)
+bucket_edges = [0, 0.005, 0.02, 1]
+class_ids = [0, 1]
+
+
+def _random_label_folder(folder, seed, with_confidence):
+    rng = np.random.default_rng(seed)
+    folder.mkdir()
+    for image_id in range(6):
+        boxes = rng.random((10, 6 if with_confidence else 5))
+        boxes[:, 0] = rng.integers(0, 3, len(boxes))
+        boxes[:, 3:5] *= 0.3
+        np.savetxt(folder / f"{image_id}.txt", boxes, fmt="%g")
+    return YoloLabelsDataset(str(folder), img_shape[0] * img_shape[1])
+
+
+def test_matches_filtered_total_blurred_area(tmp_path):
+    true_dataset = _random_label_folder(tmp_path / "true", 0, False)
+    predicted_dataset = _random_label_folder(tmp_path / "predicted", 1, True)
+
+    stratified = StratifiedBlurredArea(bucket_edges, class_ids)
+    for image_id, true_boxes in true_dataset.get_filtered_labels().items():
+        stratified.update_statistics_based_on_boxes(
+            true_boxes, predicted_dataset[image_id], img_shape
+        )
+
+    statistics = stratified.get_statistics()
+    assert len(statistics) == 6
+    for (bucket, class_id), stratum_statistics in statistics.items():
+        filtered = []
+        for dataset in (true_dataset, predicted_dataset):
+            dataset.reset_filter()
+            filtered.append(
+                dataset.filter_by_size_percentage(bucket)
+                .filter_by_class(class_id)
+                .get_filtered_labels()
+            )
+        expected = TotalBlurredArea()
+        for image_id in true_dataset.get_labels():
+            expected.update_statistics_based_on_boxes(
+                filtered[0].get(image_id, np.empty((0, 5))),
+                filtered[1].get(image_id, np.empty((0, 6))),
+                img_shape,
+            )
+        assert stratum_statistics == expected.get_statistics()
+
+
+def test_merge():
+    rng = np.random.default_rng(2)
+    boxes = [rng.random((5, 5)) * [1, 1, 1, 0.3, 0.3] for _ in range(4)]
+    single = StratifiedBlurredArea(bucket_edges)
+    partials = [StratifiedBlurredArea(bucket_edges) for _ in range(2)]
+    for i in range(2):
+        single.update_statistics_based_on_boxes(boxes[i], boxes[i + 2], img_shape)
+        partials[i].update_statistics_based_on_boxes(boxes[i], boxes[i + 2], img_shape)
+
+    assert sum(partials).get_statistics() == single.get_statistics()
+    with pytest.raises(ValueError):
+        single.merge(StratifiedBlurredArea(bucket_edges, class_ids))
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+
+import pytest
+from sqlalchemy import select
+
+from cvtoolkit.database.baas_tables import BatchRunStatistics
+from cvtoolkit.helpers.file_helpers import copy_file, copy_files
+from cvtoolkit.telemetry.sinks import DatabaseSink, JsonSidecarSink
+from cvtoolkit.telemetry.telemetry import (
+    Histogram,
+    NoOpTelemetry,
+    Telemetry,
+    TelemetrySink,
+    get_telemetry,
+    run_telemetry,
+)
+
+
+class FailingSink(TelemetrySink):
+    def export(self, run_id, statistics):
+        raise RuntimeError("unreachable")
+
+
+def test_histogram():
+    histogram = Histogram(bounds=(1, 10))
+    for value in (0.5, 1, 5, 20):
+        histogram.observe(value)
+    assert histogram.bucket_counts == [2, 1, 1]
+    assert (histogram.count, histogram.total) == (4, 26.5)
+    assert (histogram.minimum, histogram.maximum) == (0.5, 20)
+
+    other = Histogram(bounds=(1, 10))
+    other.observe(0.1)
+    histogram.merge(other)
+    assert histogram.bucket_counts == [3, 1, 1]
+    assert histogram.minimum == 0.1
+    with pytest.raises(ValueError):
+        histogram.merge(Histogram(bounds=(1,)))
+
+
+def test_telemetry_snapshot_and_merge():
+    telemetry = Telemetry("run")
+    telemetry.count("file_copy", "files")
+    telemetry.count("file_copy", "bytes", 100)
+    with telemetry.timer("file_copy"):
+        pass
+    with pytest.raises(KeyError):
+        with telemetry.timer("file_copy"):
+            raise KeyError()
+
+    stages = telemetry.snapshot()["stages"]
+    assert stages["file_copy"]["counters"] == {"files": 1, "bytes": 100}
+    assert stages["file_copy"]["histograms"]["seconds"]["count"] == 2
+
+    combined = Telemetry("run")
+    combined.merge(telemetry.snapshot())
+    combined.merge(telemetry.snapshot())
+    stages = combined.snapshot()["stages"]
+    assert stages["file_copy"]["counters"] == {"files": 2, "bytes": 200}
+    assert stages["file_copy"]["histograms"]["seconds"]["count"] == 4
+
+
+def test_run_telemetry_reports_helpers_to_sidecar(tmp_path):
+    input_path, output_path = f"{tmp_path}/in", f"{tmp_path}/out"
+    os.makedirs(f"{input_path}/folder")
+    with open(f"{input_path}/folder/image.jpg", "wb") as f:
+        f.write(b"x" * 10)
+
+    assert isinstance(get_telemetry(), NoOpTelemetry)
+    sink = JsonSidecarSink(str(tmp_path / "telemetry"))
+    with run_telemetry("run-1", sinks=[FailingSink(), sink]) as telemetry:
+        assert get_telemetry() is telemetry
+        copy_file("/folder/image.jpg", input_path, output_path)
+    assert isinstance(get_telemetry(), NoOpTelemetry)
+
+    with open(sink.path("run-1")) as f:
+        statistics = json.load(f)
+    file_copy = statistics["stages"]["file_copy"]
+    assert statistics["run_id"] == "run-1"
+    assert file_copy["counters"] == {"files": 1, "bytes": 10}
+    assert file_copy["histograms"]["seconds"]["count"] == 1
+
+
+def test_concurrent_runs_record_separately(tmp_path):
+    input_path = f"{tmp_path}/in"
+    os.makedirs(input_path)
+    for i in range(4):
+        with open(f"{input_path}/{i}.jpg", "wb") as f:
+            f.write(b"x" * 10)
+    # Both runs have started before either copies, so a run that was shared by
+    # the threads would count the files of both.
+    barrier = threading.Barrier(2)
+    statistics = {}
+
+    def run(run_id, relative_paths):
+        with run_telemetry(run_id) as telemetry:
+            barrier.wait()
+            copy_files(relative_paths, input_path, f"{tmp_path}/{run_id}", 2)
+            barrier.wait()
+            statistics[run_id] = telemetry.snapshot()["stages"]["file_copy"]
+
+    threads = [
+        threading.Thread(target=run, args=("run-1", ["/0.jpg"])),
+        threading.Thread(target=run, args=("run-2", ["/1.jpg", "/2.jpg", "/3.jpg"])),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert statistics["run-1"]["counters"] == {"files": 1, "bytes": 10}
+    assert statistics["run-2"]["counters"] == {"files": 3, "bytes": 30}
+    assert statistics["run-2"]["histograms"]["seconds"]["count"] == 3
+
+
+def test_database_sink_replaces_rows(sqlite_db_config):
+    telemetry = Telemetry("run-1", sinks=[DatabaseSink(sqlite_db_config)])
+    telemetry.count("db_write", "rows", 5)
+    telemetry.observe("db_write", "seconds", 0.2)
+    telemetry.export()
+    telemetry.count("db_write", "rows", 5)
+    telemetry.export()
+
+    with sqlite_db_config.managed_session() as session:
+        rows = {
+            row.metric: row
+            for row in session.execute(select(BatchRunStatistics.__table__))
+        }
+    assert set(rows) == {"rows", "seconds"}
+    assert rows["rows"].total == 10
+    assert (rows["seconds"].count, rows["seconds"].maximum) == (1, 0.2)
+    assert sum(json.loads(rows["seconds"].histogram)["bucket_counts"]) == 1
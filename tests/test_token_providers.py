@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import stat
+from datetime import datetime, timedelta
+
+from conftest import FakeTokenProvider
+
+from cvtoolkit.database.token_providers import (
+    AccessToken,
+    CachedTokenProvider,
+    ManagedIdentityTokenProvider,
+)
+
+
+def test_cached_token_provider_shares_tokens(tmp_path):
+    provider = FakeTokenProvider()
+    first = CachedTokenProvider(provider, cache_dir=str(tmp_path))
+    second = CachedTokenProvider(FakeTokenProvider(), cache_dir=str(tmp_path))
+    second.provider = provider
+
+    token = first.get_token()
+    assert second.get_token() == token
+    assert first.get_token() == token
+    assert provider.n_calls == 1
+
+
+def test_cached_token_provider_renews_expiring_tokens(tmp_path):
+    provider = FakeTokenProvider(lifetime=timedelta(minutes=5))
+    cached = CachedTokenProvider(
+        provider, cache_dir=str(tmp_path), min_validity=timedelta(minutes=10)
+    )
+    cached.get_token()
+    cached.get_token()
+    assert provider.n_calls == 2
+
+    in_memory = CachedTokenProvider(FakeTokenProvider(), cache_dir="")
+    assert in_memory.get_token() == in_memory.get_token()
+    assert in_memory.provider.n_calls == 1
+
+
+def test_cached_token_provider_files_are_private(tmp_path):
+    cache_dir = tmp_path / "tokens"
+    cached = CachedTokenProvider(FakeTokenProvider(), cache_dir=str(cache_dir))
+    cached.get_token()
+    assert stat.S_IMODE(os.stat(cache_dir).st_mode) == 0o700
+    for name in os.listdir(cache_dir):
+        assert stat.S_IMODE(os.stat(cache_dir / name).st_mode) == 0o600
+    assert str(os.getuid()) in CachedTokenProvider(FakeTokenProvider()).cache_path
+
+
+def test_cached_token_provider_rejects_shared_cache_dir(tmp_path):
+    cache_dir = tmp_path / "tokens"
+    cache_dir.mkdir(mode=0o755)
+    cache_dir.chmod(0o755)
+    cached = CachedTokenProvider(FakeTokenProvider(), cache_dir=str(cache_dir))
+    assert cached.get_token().token == "fake-token"  # nosec
+    assert os.listdir(cache_dir) == []
+
+
+def test_managed_identity_token_provider(monkeypatch):
+    expires_on = datetime.now().replace(microsecond=0) + timedelta(hours=1)
+    requests = []
+
+    def urlopen(request, timeout):
+        requests.append(request)
+        return io.BytesIO(
+            json.dumps(
+                {
+                    "access_token": "token",
+                    "expires_on": str(int(expires_on.timestamp())),
+                }
+            ).encode()
+        )
+
+    monkeypatch.setattr("urllib.request.urlopen", urlopen)
+    monkeypatch.delenv("IDENTITY_ENDPOINT", raising=False)
+    provider = ManagedIdentityTokenProvider("client")
+    assert provider.get_token() == AccessToken("token", expires_on)
+    assert requests[0].full_url.startswith("http://169.254.169.254/")
+    assert "client_id=client" in requests[0].full_url
+    assert requests[0].get_header("Metadata") == "true"
+
+    monkeypatch.setenv("IDENTITY_ENDPOINT", "http://localhost:42/token")
+    monkeypatch.setenv("IDENTITY_HEADER", "secret")
+    provider.get_token()
+    assert requests[1].full_url.startswith("http://localhost:42/token?")
+    assert requests[1].get_header("X-identity-header") == "secret"
+
+
+def test_db_config_uses_token_provider(sqlite_db_config):
+    sqlite_db_config._validate_token_status()
+    assert sqlite_db_config.access_token == "fake-token"  # nosec
+    assert sqlite_db_config.token_provider.n_calls == 1
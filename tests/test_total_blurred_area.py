@@ -0,0 +1,97 @@
+import pickle  # nosec
+
+import numpy as np
+import pytest
+
+from cvtoolkit.metrics.box_coverage import rasterize_boxes, yolo_boxes_to_pixels
+from cvtoolkit.metrics.total_blurred_area import TotalBlurredArea
+
+
+def _random_masks(shape, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.random(shape) > 0.7, rng.random(shape) > 0.6
+
+
+class TestTotalBlurredArea:
+    def test_update_statistics_based_on_masks(self):
+        true_mask, predicted_mask = _random_masks((50, 80))
+        metric = TotalBlurredArea()
+        metric.update_statistics_based_on_masks(true_mask, predicted_mask)
+
+        assert metric.tp == np.sum(true_mask & predicted_mask)
+        assert metric.fp == np.sum(~true_mask & predicted_mask)
+        assert metric.tn == np.sum(~true_mask & ~predicted_mask)
+        assert metric.fn == np.sum(true_mask & ~predicted_mask)
+
+    def test_get_statistics(self):
+        true_mask = np.zeros((10, 10), dtype=bool)
+        predicted_mask = np.zeros((10, 10), dtype=bool)
+        true_mask[:5] = True
+        predicted_mask[3:8] = True
+        metric = TotalBlurredArea()
+        metric.update_statistics_based_on_masks(true_mask, predicted_mask)
+
+        statistics = metric.get_statistics()
+        assert statistics["true_positives"] == 20
+        assert statistics["false_positives"] == 30
+        assert statistics["true_negatives"] == 20
+        assert statistics["precision"] == 0.4
+        assert statistics["recall"] == 0.4
+
+    def test_update_statistics_based_on_batch_of_masks(self):
+        true_masks, predicted_masks = _random_masks((4, 30, 40), seed=1)
+        batched = TotalBlurredArea()
+        batched.update_statistics_based_on_masks(true_masks, predicted_masks)
+        per_image = TotalBlurredArea()
+        for true_mask, predicted_mask in zip(true_masks, predicted_masks):
+            per_image.update_statistics_based_on_masks(true_mask, predicted_mask)
+
+        assert batched.get_statistics() == per_image.get_statistics()
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_update_statistics_based_on_boxes(self, seed):
+        rng = np.random.default_rng(seed)
+        image_shape = (97, 61)
+
+        def random_boxes(n, n_columns):
+            boxes = rng.random((n, n_columns))
+            boxes[:, 0] = rng.integers(0, 2, n)
+            boxes[:, 3:5] *= 0.5
+            return boxes
+
+        true_boxes, predicted_boxes = random_boxes(6, 5), random_boxes(8, 6)
+        from_boxes = TotalBlurredArea()
+        from_boxes.update_statistics_based_on_boxes(
+            true_boxes, predicted_boxes, image_shape
+        )
+        from_masks = TotalBlurredArea()
+        from_masks.update_statistics_based_on_masks(
+            rasterize_boxes(yolo_boxes_to_pixels(true_boxes, image_shape), image_shape),
+            rasterize_boxes(
+                yolo_boxes_to_pixels(predicted_boxes, image_shape), image_shape
+            ),
+        )
+
+        assert from_boxes.get_statistics() == from_masks.get_statistics()
+
+    def test_update_statistics_based_on_boxes_without_boxes(self):
+        metric = TotalBlurredArea()
+        metric.update_statistics_based_on_boxes(
+            np.empty((0, 5)), np.array([[0, 0.5, 0.5, 0.5, 0.5, 0.9]]), (10, 10)
+        )
+        assert (metric.tp, metric.fp, metric.tn, metric.fn) == (0, 25, 75, 0)
+
+    def test_merge(self):
+        metrics = []
+        for seed in range(3):
+            metric = TotalBlurredArea()
+            metric.update_statistics_based_on_masks(*_random_masks((20, 20), seed))
+            metrics.append(metric)
+        merged = TotalBlurredArea()
+        for metric in metrics:
+            merged.merge(metric)
+
+        assert sum(metrics).get_statistics() == merged.get_statistics()
+        assert (metrics[0] + metrics[1]).tp == metrics[0].tp + metrics[1].tp
+        restored = pickle.loads(pickle.dumps(merged))  # nosec
+        assert restored.get_statistics() == merged.get_statistics()
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from cvtoolkit.helpers.transfer_manager import TransferManager, TransferManifest
+
+
+def _write(path, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+@pytest.fixture
+def transfer(tmp_path):
+    input_path = str(tmp_path / "input")
+    relative_paths = [f"/folder_{i % 2}/image_{i}.jpg" for i in range(10)]
+    for i, relative_path in enumerate(relative_paths):
+        _write(input_path + relative_path, bytes([i]) * 100)
+    manager = TransferManager(
+        input_path,
+        str(tmp_path / "output"),
+        str(tmp_path / "manifest.sqlite"),
+        num_workers=2,
+        checksum="sha256",
+        commit_size=3,
+    )
+    return manager, relative_paths
+
+
+def test_transfer_skips_completed_files(transfer):
+    manager, relative_paths = transfer
+    report = manager.transfer(relative_paths + ["/missing.jpg"])
+    assert (report.n_copied, report.n_skipped, report.n_bytes) == (10, 0, 1000)
+    assert [result.relative_path for result in report.failed] == ["/missing.jpg"]
+
+    report = manager.transfer(relative_paths)
+    assert (report.n_copied, report.n_skipped) == (0, 10)
+
+    # Changed sources and deleted copies are transferred again.
+    _write(manager.input_path + relative_paths[0], b"changed")
+    os.remove(manager.output_path + relative_paths[1])
+    report = manager.transfer(relative_paths)
+    assert (report.n_copied, report.n_skipped) == (2, 8)
+    with open(manager.output_path + relative_paths[0], "rb") as f:
+        assert f.read() == b"changed"
+
+    with TransferManifest(
+        manager.manifest_path, manager.input_path, manager.output_path
+    ) as manifest:
+        entries = manifest.entries()
+    assert len(entries) == 10
+    assert entries[relative_paths[0]].size == len(b"changed")
+    assert all(entry.checksum for entry in entries.values())
+
+
+def test_transfer_resumes_after_crash(transfer):
+    manager, relative_paths = transfer
+    manager.progress_interval = 0
+    progress = []
+
+    def crash(report):
+        progress.append(report)
+        if report.n_copied == 4:
+            raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        manager.transfer(relative_paths, progress_callback=crash)
+    assert [report.n_done for report in progress] == [1, 2, 3, 4]
+
+    report = manager.transfer(relative_paths)
+    assert (report.n_copied, report.n_skipped) == (6, 4)
+
+
+def test_manifest_of_other_transfer(transfer, tmp_path):
+    manager, relative_paths = transfer
+    manager.transfer(relative_paths)
+    with pytest.raises(ValueError, match="belongs to a transfer"):
+        TransferManifest(manager.manifest_path, manager.input_path, str(tmp_path))
@@ -1,3 +1,11 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from cvtoolkit.datasets.label_loader import parse_labels
 from cvtoolkit.datasets.yolo_labels_dataset import YoloLabelsDataset
 
 test_label_folder = "tests/data/labels"
@@ -16,6 +24,13 @@ class TestYoloDataset:
         assert len(filtered_labels.keys()) == 2
         assert sum(len(labels) for labels in filtered_labels.values()) == 11
 
+    def test_unfiltered_labels_are_not_copied(self):
+        self.yolo_dataset.reset_filter()
+        labels = self.yolo_dataset.get_labels()
+        filtered_labels = self.yolo_dataset.get_filtered_labels()
+        for image_id in labels:
+            assert np.shares_memory(filtered_labels[image_id], labels[image_id])
+
     def test_filter_by_class(self):
         self.yolo_dataset.reset_filter()
         filtered_labels = self.yolo_dataset.filter_by_class(
@@ -56,3 +71,167 @@ class TestYoloDataset:
             conf_to_keep=0.8
         ).get_filtered_labels()
         assert sum(len(labels) for labels in filtered_labels.values()) == 6
+
+    def test_filter_cache(self):
+        self.yolo_dataset.reset_filter()
+        first = (
+            self.yolo_dataset.filter_by_class(class_to_keep=0)
+            .filter_by_confidence(conf_to_keep=0.8)
+            .get_filtered_labels()
+        )
+        self.yolo_dataset.reset_filter()
+        second = (
+            self.yolo_dataset.filter_by_confidence(conf_to_keep=0.8)
+            .filter_by_class(class_to_keep=[0])
+            .get_filtered_labels()
+        )
+        assert first is second
+        assert sum(len(labels) for labels in second.values()) == 4
+
+
+class TestColumnarYoloDataset(TestYoloDataset):
+
+    yolo_dataset: YoloLabelsDataset = YoloLabelsDataset(
+        folder_path=test_label_folder,
+        image_area=img_shape[0] * img_shape[1],
+        storage="columnar",
+    )
+
+    def test_labels_are_views(self):
+        self.yolo_dataset.reset_filter()
+        labels = self.yolo_dataset.get_labels()
+        assert np.shares_memory(labels["a"], labels.boxes)
+        filtered_labels = self.yolo_dataset.filter_by_class(
+            class_to_keep=0
+        ).get_filtered_labels()
+        assert set(filtered_labels.keys()) == {"a", "b"}
+        for image_id in ("a", "b"):
+            assert np.shares_memory(filtered_labels[image_id], filtered_labels.boxes)
+
+
+@pytest.mark.parametrize(
+    "num_workers, executor", [(0, "thread"), (2, "thread"), (2, "process")]
+)
+def test_parallel_loader_matches_line_parsing(num_workers, executor):
+    dataset = YoloLabelsDataset(
+        folder_path=test_label_folder,
+        image_area=img_shape[0] * img_shape[1],
+        num_workers=num_workers,
+        executor=executor,
+    )
+    labels = dataset.get_labels()
+    assert dataset.load_statistics.n_files == 2
+    for image_id in ("a", "b"):
+        with open(f"{test_label_folder}/{image_id}.txt") as f:
+            expected = np.array([line.strip().split() for line in f], dtype="f")
+        np.testing.assert_array_equal(labels[image_id], expected)
+
+
+def test_parse_labels_ignores_blank_lines():
+    labels = parse_labels(b"\n0 0.1 0.2 0.3 0.4 0.9\r\n\n  \n1 0.5 0.5 0.1 0.1 0.8\n\n")
+    np.testing.assert_array_equal(
+        labels,
+        np.array([[0, 0.1, 0.2, 0.3, 0.4, 0.9], [1, 0.5, 0.5, 0.1, 0.1, 0.8]], "f"),
+    )
+
+
+def test_parse_labels_rejects_mixed_widths():
+    with pytest.raises(ValueError):
+        parse_labels(b"0 0.1 0.2 0.3 0.4\n1 0.5 0.5 0.1 0.1 0.8 0.7\n")
+
+
+def test_label_cache(tmp_path):
+    label_folder = tmp_path / "labels"
+    shutil.copytree(test_label_folder, label_folder)
+    expected = YoloLabelsDataset(
+        folder_path=test_label_folder, image_area=img_shape[0] * img_shape[1]
+    ).get_labels()
+
+    def load():
+        return YoloLabelsDataset(
+            folder_path=str(label_folder),
+            image_area=img_shape[0] * img_shape[1],
+            storage="columnar",
+            cache=True,
+        )
+
+    cold = load()
+    assert os.path.isfile(f"{label_folder}.labelcache")
+    assert cold.load_statistics.n_files == 2
+
+    warm = load()
+    assert warm.load_statistics.n_files == 0
+    assert isinstance(warm.get_labels().boxes, np.memmap)
+    for image_id, labels in expected.items():
+        np.testing.assert_array_equal(warm[image_id], labels)
+
+    (label_folder / "c.txt").write_text("1 0.5 0.5 0.1 0.1 0.9 -1\n")
+    updated = load()
+    assert updated.load_statistics.n_files == 1
+    assert sorted(updated.get_labels().keys()) == ["a", "b", "c"]
+    np.testing.assert_array_equal(updated["a"], expected["a"])
+
+
+def test_label_cache_with_mixed_widths(tmp_path):
+    label_folder = tmp_path / "labels"
+    shutil.copytree(test_label_folder, label_folder)
+    (label_folder / "c.txt").write_text("1 0.5 0.5 0.1 0.1\n")
+    dataset = YoloLabelsDataset(
+        folder_path=str(label_folder),
+        image_area=img_shape[0] * img_shape[1],
+        confidence_threshold=0.5,
+        cache=True,
+    )
+    assert sorted(dataset.get_labels().keys()) == ["a", "b", "c"]
+    assert dataset["c"].shape == (1, 5)
+    assert not os.path.exists(f"{label_folder}.labelcache")
+
+
+def test_label_cache_that_cannot_be_written(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise PermissionError("read-only file system")
+
+    monkeypatch.setattr("cvtoolkit.datasets.label_cache.os.makedirs", fail)
+    dataset = YoloLabelsDataset(
+        folder_path=test_label_folder,
+        image_area=img_shape[0] * img_shape[1],
+        cache=str(tmp_path / "cache"),
+    )
+    assert sorted(dataset.get_labels().keys()) == ["a", "b"]
+    assert not os.path.exists(tmp_path / "cache")
+
+
+def test_from_yolo_validation_json(tmp_path):
+    annotations = [
+        {"image_id": "b", "category_id": 0, "bbox": [10, 20, 30, 40], "score": 0.9},
+        {"image_id": "a", "category_id": 1, "bbox": [0, 0, 64, 36], "score": 0.2},
+        {"image_id": "b", "category_id": 2, "bbox": [0, 0, 128, 72], "score": 0.5},
+    ]
+    json_path = tmp_path / "predictions.json"
+    json_path.write_text(json.dumps({"annotations": annotations}))
+
+    dataset = YoloLabelsDataset.from_yolo_validation_json(
+        str(json_path), image_shape=(1280, 720), confidence_threshold=0.3
+    )
+    labels = dataset.get_labels()
+    assert list(labels.keys()) == ["b"]
+    np.testing.assert_array_equal(
+        labels["b"],
+        np.array(
+            [
+                [0, 25 / 1280, 40 / 720, 30 / 1280, 40 / 720, 0.9],
+                [2, 64 / 1280, 36 / 720, 0.1, 0.1, 0.5],
+            ],
+            dtype="f",
+        ),
+    )
+
+
+def test_dict_filter_cache_is_small():
+    dataset = YoloLabelsDataset(
+        folder_path=test_label_folder, image_area=img_shape[0] * img_shape[1]
+    )
+    for conf in (0.1, 0.2, 0.3, 0.4):
+        dataset.reset_filter()
+        dataset.filter_by_confidence(conf_to_keep=conf).get_filtered_labels()
+    assert len(dataset._filter_cache) == YoloLabelsDataset.dict_filter_cache_size